@@ -1,223 +1,48 @@
 from __future__ import annotations
 
+import hashlib
+import hmac
 import json
 import os
 import re
 import time
 import uuid
-from typing import Any
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable
 
 import frappe
 import requests
 from frappe import _
-from frappe.utils import md_to_html
+from frappe.utils import get_system_timezone, md_to_html
+from frappe.utils.password import get_encryption_key
 
 from ai_powered_css.api.escalation import EscalationPolicy
+from ai_powered_css.api.message_features import (
+    _BOOKING_WORDS,
+    _PAYMENT_WORDS,
+    _REFUND_WORDS,
+    analyze,
+)
 
-_ROMAN_HI_FUNCTION_WORDS = {
-    "mujhe",
-    "muje",
-    "mera",
-    "meri",
-    "mere",
-    "tum",
-    "aap",
-    "kya",
-    "kaise",
-    "kyu",
-    "kyon",
-    "nahi",
-    "haan",
-    "haanji",
-    "bhai",
-    "kripya",
-    "kripa",
-    "ke",
-    "ki",
-    "ka",
-    "ko",
-    "se",
-    "par",
-    "mein",
-    "liye",
-    "madad",
-    "chahiye",
-    "sahiye",
-    "bana",
-    "do",
-    "hai",
-    "tha",
-    "thi",
-}
-
-_ENGLISH_HINT_WORDS = {
-    "refund",
-    "refunds",
-    "payment",
-    "payments",
-    "booking",
-    "ticket",
-    "status",
-    "issue",
-    "problem",
-    "help",
-    "confirmation",
-    "confirm",
-    "cancel",
-    "cancellation",
-    "show",
-    "movie",
-    "event",
-    "balance",
-    "account",
-    "amount",
-    "discount",
-    "price",
-}
+_EMAIL_RE = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
 
-_SUPPORT_REQUEST_WORDS = {
-    "ticket",
-    "agent",
-    "support",
-    "helpdesk",
-    "human",
+_BANNED_CHANNEL_TERMS = (
+    "live chat",
+    "email",
+    "whatsapp",
+    "call us",
     "call",
-    "representative",
-    "टिकट",
-    "एजेंट",
-    "सपोर्ट",
-    "मदद",
+    "helpline",
+    "लाइव चैट",
+    "ईमेल",
+    "व्हाट्सऐप",
+    "वॉट्सएप",
     "कॉल",
-}
-
-_EMAIL_RE = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
-
-
-_REFUND_WORDS = {
-    "refund",
-    "refunds",
-    "रिफंड",
-    "रिफन्ड",
-    "वापसी",
-    "paisa",
-    "paise",
-}
-
-_PAYMENT_WORDS = {
-    "payment",
-    "payments",
-    "pay",
-    "paid",
-    "paisa",
-    "paise",
-    "upi",
-    "card",
-    "debit",
-    "credit",
-    "netbanking",
-    "wallet",
-    "gpay",
-    "phonepe",
-    "paytm",
-    "bank",
-    "भुगतान",
-    "पेमेंट",
-    "कार्ड",
-    "यूपीआई",
-}
-
-_BOOKING_WORDS = {
-    "booking",
-    "बुकिंग",
-    "ticket",
-    "टिकट",
-    "show",
-}
-
-_DOMAIN_WORDS = set().union(
-    _REFUND_WORDS,
-    _PAYMENT_WORDS,
-    _BOOKING_WORDS,
-    _ENGLISH_HINT_WORDS,
-    {
-        "transaction",
-        "deducted",
-        "blocked",
-        "block",
-        "seat",
-        "seats",
-        "order",
-        "orders",
-    },
-)
-
-_CLOSING_PATTERNS_EN = (
-    r"\bthank you\b",
-    r"\bthanks\b",
-    r"\bthx\b",
-    r"\bappreciate\b",
-    r"\bthat helps\b",
-    r"\bthis helps\b",
-    r"\bissue resolved\b",
-    r"\bresolved\b",
-    r"\bsolved\b",
-    r"\ball good\b",
-    r"\bno further help\b",
-)
-_CLOSING_PATTERNS_HI = (
-    r"धन्यवाद",
-    r"थैंक यू",
-    r"हो गया",
-    r"समाधान हो गया",
-    r"मदद मिली",
-    r"सब ठीक",
-    r"ठीक है धन्यवाद",
-)
-_CLOSING_NEGATIVE_PATTERNS = (
-    r"\bbut\b",
-    r"\bstill\b",
-    r"\bnot\b",
-    r"\bneed help\b",
-    r"\bhelp me\b",
-    r"\bissue\b",
-    r"\bproblem\b",
-    r"\bpending\b",
-    r"नहीं",
-    r"लेकिन",
-    r"पर",
-    r"समस्या",
-    r"मदद चाहिए",
 )
+_BANNED_CHANNEL_RE = re.compile("|".join(re.escape(term) for term in _BANNED_CHANNEL_TERMS))
+_SENTENCE_SPLIT_RE = re.compile(r"(?<=[.!?।])\s+")
 
-_ISSUE_PATTERNS = [
-    {"amount", "deducted"},
-    {"amount", "confirmation"},
-    {"deducted", "confirmation"},
-    {"refund", "received"},
-    {"refund", "pending"},
-    {"show", "cancelled"},
-    {"show", "canceled"},
-    {"wrong", "amount"},
-    {"discount", "applied"},
-    {"discount", "not"},
-    {"confirmation", "not"},
-    {"payment", "failed"},
-    {"transaction", "failed"},
-    {"payment", "declined"},
-    {"पैसे", "कट"},
-    {"रिफंड", "नहीं"},
-    {"शो", "कैंसिल"},
-    {"गलत", "अमाउंट"},
-    {"डिस्काउंट", "नहीं"},
-    {"कन्फर्मेशन", "नहीं"},
-    {"पैसा", "कटा"},
-    {"paisa", "kata"},
-    {"paisa", "cut"},
-    {"refund", "nahi"},
-    {"confirmation", "nahi"},
-    {"show", "cancel"},
-    {"amount", "wrong"},
-]
 
 _QUICK_REPLY_OPTIONS = {
     "en": [
@@ -277,6 +102,13 @@ _QUICK_REPLY_OPTIONS = {
 RESOLUTION_ANSWERED = "ANSWERED"
 RESOLUTION_NEEDS_CLARIFICATION = "NEEDS_CLARIFICATION"
 RESOLUTION_UNRESOLVED = "UNRESOLVED"
+# Response-only markers (async turns, load shedding); never stored on the session.
+RESOLUTION_PENDING = "PENDING"
+RESOLUTION_BUSY = "BUSY"
+
+# Lazily created so forked web workers do not inherit idle threads.
+_RAG_EXECUTOR: ThreadPoolExecutor | None = None
+
 
 def _detect_language(text: str) -> str:
     for char in text:
@@ -285,29 +117,12 @@ def _detect_language(text: str) -> str:
     return "en"
 
 
-def _is_ascii(text: str) -> bool:
-    return all(ord(ch) < 128 for ch in text)
-
-
 def _tokenize(text: str) -> list[str]:
-    cleaned = re.sub(r"[^\w\s]", " ", text.lower())
-    return [tok for tok in cleaned.split() if tok]
+    return analyze(text).tokens
 
 
 def _roman_hindi_decision(text: str) -> str:
-    # High-precision Roman Hindi detection to avoid false positives on English-only queries.
-    if not _is_ascii(text):
-        return "en"
-    tokens = _tokenize(text)
-    if not tokens:
-        return "en"
-    hindi_hits = sum(1 for tok in tokens if tok in _ROMAN_HI_FUNCTION_WORDS)
-    english_hits = sum(1 for tok in tokens if tok in _ENGLISH_HINT_WORDS)
-    if hindi_hits >= 2 and hindi_hits >= english_hits + 1:
-        return "hi"
-    if hindi_hits >= 1 and english_hits <= 1:
-        return "ambiguous"
-    return "en"
+    return analyze(text).roman_hindi_decision
 
 
 def _detect_roman_hindi(text: str) -> bool:
@@ -315,65 +130,27 @@ def _detect_roman_hindi(text: str) -> bool:
 
 
 def _has_any(text: str, words: set[str]) -> bool:
-    tokens = _tokenize(text)
-    return any(tok in words for tok in tokens)
+    return analyze(text).has_any(words)
 
 
 def _detect_intent(text: str) -> str | None:
-    if _has_any(text, _REFUND_WORDS):
-        return "refund"
-    if _has_any(text, _PAYMENT_WORDS):
-        return "payment"
-    if _has_any(text, _BOOKING_WORDS):
-        return "booking"
-    return None
+    return analyze(text).intent
 
 
 def _explicit_support_request(text: str) -> bool:
-    return _has_any(text, _SUPPORT_REQUEST_WORDS)
+    return analyze(text).explicit_support
 
 
 def _is_closing_message(text: str) -> bool:
-    cleaned = text.strip().lower()
-    if not cleaned:
-        return False
-    if _explicit_support_request(text):
-        return False
-    if "?" in text:
-        return False
-    for pattern in _CLOSING_NEGATIVE_PATTERNS:
-        if re.search(pattern, cleaned, flags=re.IGNORECASE):
-            return False
-    for pattern in _CLOSING_PATTERNS_EN:
-        if re.search(pattern, cleaned, flags=re.IGNORECASE):
-            return True
-    for pattern in _CLOSING_PATTERNS_HI:
-        if re.search(pattern, text, flags=re.IGNORECASE):
-            return True
-    return False
+    return analyze(text).is_closing
 
 
 def _is_off_topic(text: str) -> bool:
-    """Detect queries outside the support domain to avoid random KB answers."""
-    if _detect_intent(text):
-        return False
-    if _matches_issue_pattern(text):
-        return False
-    if _explicit_support_request(text):
-        return False
-    if _has_any(text, _DOMAIN_WORDS):
-        return False
-    return True
+    return analyze(text).is_off_topic
 
 
 def _matches_issue_pattern(text: str) -> bool:
-    tokens = set(_tokenize(text))
-    if not tokens:
-        return False
-    for pattern in _ISSUE_PATTERNS:
-        if pattern.issubset(tokens):
-            return True
-    return False
+    return analyze(text).matches_issue_pattern
 
 
 def _is_high_risk_issue(text: str, intent: str | None) -> bool:
@@ -381,7 +158,7 @@ def _is_high_risk_issue(text: str, intent: str | None) -> bool:
         return False
     if _matches_issue_pattern(text):
         return True
-    tokens = set(_tokenize(text))
+    tokens = analyze(text).token_set
     if {"charged", "twice"}.issubset(tokens) or {"charged", "double"}.issubset(tokens):
         return True
     return False
@@ -414,6 +191,12 @@ def _short_reply(lang: str) -> str:
     return "Please share a bit more detail so I can help better."
 
 
+def _busy_reply(lang: str) -> str:
+    if lang == "hi":
+        return "अभी बहुत सारे अनुरोध आ रहे हैं। कृपया थोड़ी देर बाद अपना संदेश फिर से भेजें।"
+    return "We’re handling a lot of requests right now. Please send your message again in a moment."
+
+
 def _clarify_reply(lang: str) -> str:
     if lang == "hi":
         return "मैं पूरी तरह सुनिश्चित नहीं हूँ। कृपया थोड़ा और विवरण दें। चाहें तो आप टिकट भी बना सकते हैं।"
@@ -469,51 +252,7 @@ def _match_quick_reply(message: str) -> dict[str, str] | None:
 
 
 def _is_followup_query(text: str) -> bool:
-    tokens = set(_tokenize(text))
-    if not tokens:
-        return False
-    followup = {
-        "timeline",
-        "time",
-        "status",
-        "when",
-        "how",
-        "howlong",
-        "where",
-        "track",
-        "update",
-        "day",
-        "days",
-        "week",
-        "weeks",
-        "month",
-        "months",
-        "late",
-        "delayed",
-        "delay",
-        "pending",
-        "since",
-        "kab",
-        "kabtak",
-        "kabtak",
-        "kitna",
-        "kab",
-        "kabtak",
-        "kabtk",
-        "kabhi",
-        "कब",
-        "कबतक",
-        "स्थिति",
-        "टाइमलाइन",
-        "कहाँ",
-        "कैसे",
-        "कितना",
-    }
-    if any(tok in followup for tok in tokens):
-        return True
-    if any(tok.isdigit() for tok in tokens):
-        return True
-    return len(tokens) <= 3
+    return analyze(text).is_followup
 
 
 def _expand_query_with_subtype(subtype: str, message: str, lang: str) -> str:
@@ -539,25 +278,11 @@ def _is_vague_domain(message: str, intent: str | None) -> bool:
 
 def _sanitize_answer(answer: str, lang: str) -> str:
     # Remove out-of-scope channel suggestions unless explicitly present in KB content.
-    banned = [
-        "live chat",
-        "email",
-        "whatsapp",
-        "call us",
-        "call",
-        "helpline",
-        "लाइव चैट",
-        "ईमेल",
-        "व्हाट्सऐप",
-        "वॉट्सएप",
-        "कॉल",
-    ]
-    lowered = answer.lower()
-    if not any(term in lowered for term in banned):
+    if not _BANNED_CHANNEL_RE.search(answer.lower()):
         return answer
 
-    parts = re.split(r"(?<=[.!?।])\s+", answer.strip())
-    kept = [part for part in parts if not any(term in part.lower() for term in banned)]
+    parts = _SENTENCE_SPLIT_RE.split(answer.strip())
+    kept = [part for part in parts if not _BANNED_CHANNEL_RE.search(part.lower())]
     cleaned = " ".join(kept).strip()
     if cleaned:
         return cleaned
@@ -701,6 +426,13 @@ def _get_env_float(key: str, default: float) -> float:
         return default
 
 
+def _get_env_bool(key: str, default: bool = False) -> bool:
+    raw = os.getenv(key)
+    if raw is None or raw == "":
+        return default
+    return raw.strip().lower() in ("1", "true", "yes", "on")
+
+
 def _get_env_int(key: str, default: int) -> int:
     raw = os.getenv(key)
     if raw is None or raw == "":
@@ -731,19 +463,34 @@ def _policy_settings() -> dict[str, Any]:
     }
 
 
-def _get_session_doc(session_id: str | None):
+def _get_session_doc(session_id: str | None, restore: bool = False):
     if not session_id:
         return None
     existing = frappe.db.get_value("AI CSS Chat Session", {"session_id": session_id}, "name")
+    if not existing and restore and _get_env_bool("CHAT_ARCHIVE_RESTORE_ON_ACCESS", True):
+        existing = _restore_archived_session(session_id)
     if not existing:
         return None
     return frappe.get_doc("AI CSS Chat Session", existing)
 
 
+def _restore_archived_session(session_id: str) -> str | None:
+    # A returning visitor of an archived session gets its history back on their next write (send or ticket).
+    from ai_powered_css.api.chat_archive import restore_archived_session
+
+    frappe.db.savepoint("ai_css_restore_session")
+    try:
+        return restore_archived_session(session_id)
+    except Exception:
+        # A concurrent request restored it first.
+        frappe.db.rollback(save_point="ai_css_restore_session")
+        return frappe.db.get_value("AI CSS Chat Session", {"session_id": session_id}, "name")
+
+
 def _ensure_session(session_id: str | None, language: str, session_doc=None) -> tuple[str, str, Any]:
     # Create a session record on-demand; update preferred language if it changed.
     if session_doc is None:
-        session_doc = _get_session_doc(session_id)
+        session_doc = _get_session_doc(session_id, restore=True)
 
     if not session_doc:
         session_id = session_id or str(uuid.uuid4())
@@ -798,13 +545,23 @@ def _insert_message(
     return doc
 
 
+def _session_room(session_id: str) -> str:
+    # Signed per-session room key; clients only learn it from responses for their own session.
+    digest = hmac.new(
+        get_encryption_key().encode("utf-8"),
+        session_id.encode("utf-8"),
+        hashlib.sha256,
+    ).hexdigest()
+    return f"ai_css_chat:{digest[:32]}"
+
+
 def _publish_chat_message(
     session_id: str,
     message_doc,
     sources: list[dict] | None = None,
     extra: dict[str, Any] | None = None,
 ) -> None:
-    # Best-effort realtime publish; polling reads from DB via get_messages.
+    # Best-effort realtime publish to the session room only; polling reads from DB via get_messages.
     payload = {
         "session_id": session_id,
         "message": {
@@ -818,10 +575,11 @@ def _publish_chat_message(
     }
     if extra:
         payload["message"].update(extra)
+    # task_id maps to the socket.io "task_progress:<id>" room that guests can join via task_subscribe.
     frappe.publish_realtime(
         "ai_css_chat_message",
         payload,
-        room="website",
+        task_id=_session_room(session_id),
         after_commit=True,
     )
 
@@ -906,18 +664,19 @@ def _last_assistant_sources(session_name: str) -> list[dict]:
     return _last_assistant_entry(session_name).get("sources") or []
 
 
-def _last_user_message(session_name: str) -> str:
+def _last_user_message(session_name: str) -> tuple[str | None, str]:
+    # (message name, text) of the customer's latest turn.
     rows = frappe.get_all(
         "AI CSS Chat Message",
         filters={"session": session_name, "role": "user"},
-        fields=["content", "creation"],
+        fields=["name", "content", "creation"],
         order_by="creation desc",
         limit=1,
         ignore_permissions=True,
     )
     if not rows:
-        return ""
-    return (rows[0].get("content") or "").strip()
+        return None, ""
+    return rows[0].get("name"), (rows[0].get("content") or "").strip()
 
 
 def _top_score_from_sources(sources: list[dict]) -> float | None:
@@ -951,23 +710,230 @@ def _ticket_created_reply(lang: str, ticket_id: str | None) -> str:
     return "Unable to create a ticket right now. Please try again later."
 
 
+def _ticket_queued_reply(lang: str, ticket_ref: str) -> str:
+    if lang == "hi":
+        return f"🎫 आपका सपोर्ट अनुरोध दर्ज हो गया है (संदर्भ: {ticket_ref})। टिकट ID कुछ ही पलों में यहीं दिखाई देगी।"
+    return f"Your support request has been logged (reference {ticket_ref}). I'll share the ticket ID here in a moment."
+
+
+_TICKET_CAPABILITIES_KEY = "ai_css_ticket_capabilities"
+_KB_REVISION_KEY = "ai_css_kb_revision"
+_METRICS_KEY = "ai_css_metrics"
+# Status polls only; the description (customer contact details, issue text) is never cached.
+_TICKET_STATUS_FIELDS = {
+    "HD Ticket": ["subject", "status", "creation"],
+    "ToDo": ["status", "creation"],
+}
+_RAG_SLOTS_KEY = "ai_css_rag_inflight"
+# Prefetched answers not yet used, scored by expiry time.
+_PREFETCH_PENDING_KEY = "ai_css_prefetch_pending"
+_REDIS_SCRIPTS: dict[str, Any] = {}
+
+# "<requests>/<seconds>" per scope and dimension; override with CHAT_RATE_<SCOPE>_<DIM>.
+_RATE_LIMIT_DEFAULTS = {
+    "send": {"session": "12/60", "ip": "40/60", "global": "600/60"},
+    "poll": {"session": "60/60", "ip": "240/60", "global": "6000/60"},
+}
+
+# KEYS: bucket keys..., metrics hash. ARGV: now, scope, then (dim, capacity, rate) per bucket.
+# Tokens are only taken when every bucket has one, so a rejected call does not drain the others.
+_TOKEN_BUCKET_LUA = """
+local now = tonumber(ARGV[1])
+local scope = ARGV[2]
+local metrics = KEYS[#KEYS]
+local levels = {}
+for i = 1, #KEYS - 1 do
+    local capacity = tonumber(ARGV[3 * i + 1])
+    local rate = tonumber(ARGV[3 * i + 2])
+    local state = redis.call("HMGET", KEYS[i], "tokens", "ts")
+    local tokens = tonumber(state[1]) or capacity
+    local ts = tonumber(state[2]) or now
+    tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+    if tokens < 1 then
+        redis.call("HINCRBY", metrics, "rate_rejected:" .. scope .. ":" .. ARGV[3 * i], 1)
+        return i
+    end
+    levels[i] = tokens
+end
+for i = 1, #KEYS - 1 do
+    local capacity = tonumber(ARGV[3 * i + 1])
+    local rate = tonumber(ARGV[3 * i + 2])
+    redis.call("HSET", KEYS[i], "tokens", tostring(levels[i] - 1), "ts", tostring(now))
+    redis.call("EXPIRE", KEYS[i], math.ceil(capacity / rate) + 1)
+end
+redis.call("HINCRBY", metrics, "rate_allowed:" .. scope, 1)
+return 0
+"""
+
+# KEYS: slot zset. ARGV: now, stale_after, limit, token.
+_ACQUIRE_SLOT_LUA = """
+local now = tonumber(ARGV[1])
+redis.call("ZREMRANGEBYSCORE", KEYS[1], "-inf", now - tonumber(ARGV[2]))
+if redis.call("ZCARD", KEYS[1]) < tonumber(ARGV[3]) then
+    redis.call("ZADD", KEYS[1], now, ARGV[4])
+    redis.call("EXPIRE", KEYS[1], tonumber(ARGV[2]))
+    return 1
+end
+return 0
+"""
+
+
+def _load_ticket_capabilities() -> dict[str, Any]:
+    has_hd_ticket = bool(frappe.db.exists("DocType", "HD Ticket"))
+    priority = None
+    # Helpdesk priority doctype can vary; choose a safe default if present.
+    if has_hd_ticket and frappe.db.exists("DocType", "HD Ticket Priority"):
+        if frappe.db.exists("HD Ticket Priority", "Medium"):
+            priority = "Medium"
+        else:
+            names = frappe.get_all("HD Ticket Priority", pluck="name", limit=1) or []
+            priority = names[0] if names else None
+    return {"hd_ticket": has_hd_ticket, "hd_ticket_priority": priority}
+
+
+def _ticket_capabilities() -> dict[str, Any]:
+    # Installed doctypes only change on migrate; cache instead of probing on every escalation.
+    return frappe.cache().get_value(_TICKET_CAPABILITIES_KEY, generator=_load_ticket_capabilities)
+
+
+def clear_ticket_capabilities(doc=None, method=None) -> None:
+    """Hook target (after_migrate, HD Ticket Priority changes) that drops the cached capabilities."""
+    frappe.cache().delete_value(_TICKET_CAPABILITIES_KEY)
+
+
+def _ticket_status_key(ticket_id: str) -> str:
+    return f"ai_css_ticket_status:{ticket_id}"
+
+
+def clear_ticket_status(doc=None, method=None) -> None:
+    """Hook target (HD Ticket / ToDo on_update, on_trash) that drops the cached guest status."""
+    if doc is not None:
+        frappe.cache().delete_value(_ticket_status_key(str(doc.name)))
+
+
+def _ticket_doctype() -> str | None:
+    # Prefer HD Ticket; allow ToDo fallback only when explicitly enabled.
+    if _ticket_capabilities()["hd_ticket"]:
+        return "HD Ticket"
+    if os.getenv("ESCALATION_FALLBACK", "").lower() == "todo":
+        return "ToDo"
+    return None
+
+
+def _ticket_request_key(session_id: str, message_id: str | None) -> str:
+    # One escalation is one customer turn: a resubmit of the same turn reuses its ticket, a later turn gets a new one.
+    return frappe.cache().make_key(f"ai_css_ticket_request:{session_id}:{message_id or ''}")
+
+
+def _enqueue_ticket(
+    doctype: str,
+    subject: str,
+    history: list[dict[str, str]],
+    sources: list[dict],
+    user_text: str,
+    metadata: dict[str, Any],
+    message_id: str | None = None,
+) -> tuple[str, str | None]:
+    # Session plus triggering message is the idempotency key: repeats inside the TTL reuse the same reference/ticket.
+    cache = frappe.cache()
+    key = _ticket_request_key(metadata.get("session_id") or "", message_id)
+    ttl = _get_env_int("TICKET_IDEMPOTENCY_TTL", 900)
+    ticket_ref = f"REQ-{uuid.uuid4().hex[:8].upper()}"
+    claimed = cache.set(key, json.dumps({"ticket_ref": ticket_ref, "ticket_id": None}), nx=True, ex=ttl)
+    if not claimed:
+        existing = json.loads(cache.get(key) or "{}")
+        return existing.get("ticket_ref") or ticket_ref, existing.get("ticket_id")
+
+    # The job only runs after commit; a request that rolls back or fails to enqueue must not hold the key.
+    frappe.db.after_rollback.add(lambda: cache.delete(key))
+    try:
+        frappe.enqueue(
+            "ai_powered_css.api.chat.create_ticket_job",
+            queue="short",
+            job_id=key,
+            deduplicate=True,
+            enqueue_after_commit=True,
+            ticket_ref=ticket_ref,
+            doctype=doctype,
+            subject=subject,
+            history=history,
+            sources=sources,
+            user_text=user_text,
+            metadata=metadata,
+            request_key=key,
+        )
+    except Exception:
+        cache.delete(key)
+        raise
+    return ticket_ref, None
+
+
+def create_ticket_job(
+    ticket_ref: str,
+    doctype: str,
+    subject: str,
+    history: list[dict[str, str]],
+    sources: list[dict],
+    user_text: str,
+    metadata: dict[str, Any],
+    request_key: str | None = None,
+) -> None:
+    """Background ticket creation for CHAT_ASYNC_TICKETS; the final ticket ID is pushed to the session room."""
+    session_id = metadata.get("session_id") or ""
+    language = metadata.get("language") or "en"
+    ticket_type, ticket_id = None, None
+    try:
+        ticket_type, ticket_id = _create_ticket(doctype, subject, history, sources, user_text, metadata=metadata)
+    except Exception:
+        frappe.db.rollback()
+        frappe.log_error(title="AI CSS ticket creation failed")
+
+    if request_key and ticket_id:
+        payload = {"ticket_ref": ticket_ref, "ticket_id": ticket_id}
+        frappe.cache().set(request_key, json.dumps(payload), ex=_get_env_int("TICKET_IDEMPOTENCY_TTL", 900))
+    elif request_key:
+        # Release the key so the customer can retry.
+        frappe.cache().delete(request_key)
+
+    session_doc = _get_session_doc(session_id)
+    if not session_doc:
+        return
+    answer = _ticket_created_reply(language, ticket_id)
+    assistant_doc = _insert_message(session_doc.name, "assistant", answer, confidence=0.0, sources=sources)
+    _publish_chat_message(
+        session_id,
+        assistant_doc,
+        sources=sources,
+        extra={
+            "language": language,
+            "resolution_state": RESOLUTION_UNRESOLVED,
+            "escalation_offered": False,
+            "contact_required": False,
+            "ticket_id": ticket_id,
+            "ticket_type": ticket_type,
+            "ticket_ref": ticket_ref,
+        },
+    )
+
+
 def _create_ticket_for_session(
     history: list[dict[str, str]],
     message: str,
     sources: list[dict],
     metadata: dict[str, Any] | None = None,
-) -> tuple[str | None, str | None]:
-    # Prefer HD Ticket; allow ToDo fallback only when explicitly enabled.
-    allow_todo = os.getenv("ESCALATION_FALLBACK", "").lower() == "todo"
-    if frappe.db.exists("DocType", "HD Ticket"):
-        doctype = "HD Ticket"
-    elif allow_todo:
-        doctype = "ToDo"
-    else:
-        return None, None
+    message_id: str | None = None,
+) -> tuple[str | None, str | None, str | None]:
+    doctype = _ticket_doctype()
+    if not doctype:
+        return None, None, None
     subject = _build_ticket_subject(message)
+    if _get_env_bool("CHAT_ASYNC_TICKETS", False):
+        ticket_ref, ticket_id = _enqueue_ticket(
+            doctype, subject, history, sources, message, metadata or {}, message_id=message_id
+        )
+        return doctype, ticket_id, ticket_ref
     ticket_type, ticket_id = _create_ticket(doctype, subject, history, sources, message, metadata=metadata)
-    return ticket_type, ticket_id
+    return ticket_type, ticket_id, None
 
 
 def _handle_unresolved(
@@ -1163,6 +1129,76 @@ def _ticket_description(
     return "\n".join(summary_lines)
 
 
+@contextmanager
+def _privileged_writes():
+    # Permission-free reads/writes on our own doctypes for guests, without set_user (which resets
+    # the session's roles and permission caches on every call). Helpdesk tickets still switch users.
+    # Rows written here are owned by Guest and jobs enqueued here run as Guest; nothing reads `owner`
+    # (System Manager-only doctypes, no if_owner or permission query hooks). Set owner explicitly if that changes.
+    previous_ignore = getattr(frappe.flags, "ignore_permissions", False)
+    frappe.flags.ignore_permissions = True
+    try:
+        yield
+    finally:
+        frappe.flags.ignore_permissions = previous_ignore
+
+
+def _replica_is_fresh(cursor: str | None = None) -> bool:
+    # Runs on the replica. Fresh when it has replayed the primary's current WAL position, or lags within bounds;
+    # in both cases it must have replayed past the poll cursor.
+    if frappe.db.db_type != "postgres":
+        return True
+    # Compared with the primary: a standby whose WAL receiver stalled reports receive LSN == replay LSN forever.
+    primary_lsn = frappe.local.primary_db.sql("select pg_current_wal_lsn()")[0][0]
+    in_recovery, caught_up, lag, replayed_at = frappe.db.sql(
+        """
+        select pg_is_in_recovery(),
+               pg_last_wal_replay_lsn() >= %s::pg_lsn,
+               extract(epoch from now() - pg_last_xact_replay_timestamp()),
+               pg_last_xact_replay_timestamp() at time zone %s
+        """,
+        (primary_lsn, get_system_timezone()),
+    )[0]
+    if not in_recovery:
+        # Not a standby: the configured replica is the primary itself, or was promoted.
+        return True
+    if cursor and replayed_at and frappe.utils.get_datetime(cursor) > replayed_at:
+        return False
+    if caught_up:
+        return True
+    return lag is not None and float(lag) <= _get_env_float("CHAT_REPLICA_MAX_LAG", 2.0)
+
+
+def _use_primary() -> None:
+    frappe.local.db.close()
+    frappe.local.db = frappe.local.primary_db
+    del frappe.local.primary_db
+    del frappe.local.replica_db
+
+
+@contextmanager
+def _replica_reads(cursor: str | None = None):
+    # Read-only block on the site's read replica (site_config read_from_replica); yields whether it switched.
+    switched = False
+    if frappe.conf.read_from_replica and not hasattr(frappe.local, "primary_db"):
+        switched = frappe.connect_replica()
+        if switched:
+            try:
+                fresh = _replica_is_fresh(cursor)
+            except Exception:
+                frappe.log_error(title="AI CSS replica check failed", message=frappe.get_traceback())
+                fresh = False
+            if not fresh:
+                _use_primary()
+                switched = False
+            _incr_metric("replica_reads" if fresh else "replica_fallback_lag")
+    try:
+        yield switched
+    finally:
+        if switched:
+            _use_primary()
+
+
 def _create_ticket(
     doctype: str,
     subject: str,
@@ -1171,7 +1207,8 @@ def _create_ticket(
     user_text: str,
     metadata: dict[str, Any] | None = None,
 ) -> tuple[str, str]:
-    # Escalate privileges for guest ticket creation while preserving the original user context.
+    # Escalate privileges for guest ticket creation while preserving the original user context;
+    # Helpdesk's HD Ticket hooks (SLA, assignment, contact linking) expect an agent-capable user.
     # Ensure we never restore to a None user; Frappe expects a real session user.
     current_user = frappe.session.user or "Guest"
     previous_ignore = getattr(frappe.flags, "ignore_permissions", False)
@@ -1185,16 +1222,9 @@ def _create_ticket(
         description_html = md_to_html(description_md)
 
         def resolve_priority() -> str | None:
-            # Helpdesk priority doctype can vary; choose a safe default if present.
             if doctype != "HD Ticket":
                 return "Medium"
-            if frappe.db.exists("DocType", "HD Ticket Priority"):
-                if frappe.db.exists("HD Ticket Priority", "Medium"):
-                    return "Medium"
-                names = frappe.get_all("HD Ticket Priority", pluck="name", limit=1) or []
-                if names:
-                    return names[0]
-            return None
+            return _ticket_capabilities()["hd_ticket_priority"]
 
         def build_payload(doctype: str) -> dict[str, Any]:
             # Keep payload minimal and compatible across HD Ticket and ToDo.
@@ -1242,251 +1272,415 @@ def _create_ticket(
         frappe.flags.ignore_permissions = previous_ignore
 
 
-@frappe.whitelist(allow_guest=True)
-def send_message(session_id: str | None = None, message: str | None = None, lang_hint: str | None = None):
-    previous_ignore = getattr(frappe.flags, "ignore_permissions", False)
-    previous_user = frappe.session.user or "Guest"
-    frappe.flags.ignore_permissions = True
-    frappe.set_user("Administrator")
-    try:
-        if not message or not message.strip():
-            frappe.throw(_("message is required"))
-
-        message = message.strip()
-        if lang_hint in ("auto", ""):
-            lang_hint = None
-
-        existing_doc = _get_session_doc(session_id)
-        preferred_lang = getattr(existing_doc, "preferred_lang", None) if existing_doc else None
-        forced_lang = lang_hint if lang_hint in ("en", "hi") else None
-
-        # Language selection: forced mode overrides, then Devanagari, then Roman Hindi, then default EN.
-        has_devanagari = _detect_language(message) == "hi"
-        roman_decision = _roman_hindi_decision(message) if not forced_lang else "en"
-        roman_hindi = roman_decision == "hi"
-        ambiguous_language = roman_decision == "ambiguous" and not has_devanagari and not preferred_lang
-
-        if forced_lang:
-            language = forced_lang
-        elif has_devanagari or roman_decision == "hi":
-            language = "hi"
-        elif preferred_lang:
-            language = preferred_lang
-        else:
-            language = "en"
+def _process_message(session_id: str | None, message: str | None, lang_hint: str | None) -> dict[str, Any]:
+    # Body of send_message, which wraps it (rate limit, privileged writes) and adds realtime_room to every
+    # reply in one place instead of at each of the early returns below.
+    if not message or not message.strip():
+        frappe.throw(_("message is required"))
+
+    message = message.strip()
+    if lang_hint in ("auto", ""):
+        lang_hint = None
+
+    existing_doc = _get_session_doc(session_id, restore=True)
+    preferred_lang = getattr(existing_doc, "preferred_lang", None) if existing_doc else None
+    forced_lang = lang_hint if lang_hint in ("en", "hi") else None
+
+    # Language selection: forced mode overrides, then Devanagari, then Roman Hindi, then default EN.
+    has_devanagari = _detect_language(message) == "hi"
+    roman_decision = _roman_hindi_decision(message) if not forced_lang else "en"
+    roman_hindi = roman_decision == "hi"
+    ambiguous_language = roman_decision == "ambiguous" and not has_devanagari and not preferred_lang
+
+    if forced_lang:
+        language = forced_lang
+    elif has_devanagari or roman_decision == "hi":
+        language = "hi"
+    elif preferred_lang:
+        language = preferred_lang
+    else:
+        language = "en"
 
-        session_id, session_name, session_doc = _ensure_session(session_id, language, existing_doc)
-        user_doc = _insert_message(session_name, "user", message)
-        _publish_chat_message(
-            session_id,
-            user_doc,
-            sources=[],
-            extra={"language": language},
-        )
+    policy_settings = _policy_settings()
+    policy = EscalationPolicy(
+        conf_threshold=policy_settings["conf_threshold"],
+        very_low_threshold=policy_settings["very_low_threshold"],
+        min_len=6,
+    )
+    plan = _plan_rag_query(message, existing_doc, language)
 
-        # If we previously asked for contact details, try to create the ticket from chat input.
-        last_state = getattr(session_doc, "last_resolution_state", None)
-        if last_state == RESOLUTION_UNRESOLVED:
-            name, email, phone = _extract_contact_from_text(message)
-            if email or phone:
-                prev_user = frappe.session.user
-                prev_ignore = getattr(frappe.flags, "ignore_permissions", False)
-                prev_local_ignore = getattr(frappe.local.flags, "ignore_permissions", False)
-                frappe.flags.ignore_permissions = True
-                frappe.local.flags.ignore_permissions = True
-                frappe.set_user("Administrator")
-                frappe.local.session.user = "Administrator"
-                frappe.session.user = "Administrator"
-                try:
-                    last_entry = _last_assistant_entry(session_name)
-                    sources = last_entry.get("sources") or []
-                    confidence = last_entry.get("confidence")
-                    top_score = _top_score_from_sources(sources)
-                    history = _fetch_history(session_name, limit=20)
-                    if not name:
-                        name = _extract_name_from_history(history)
-                    name, email, phone = _normalize_contact(name, email, phone)
-                    metadata = {
-                        "session_id": session_id,
-                        "language": language,
-                        "resolution_state": RESOLUTION_UNRESOLVED,
-                        "confidence": confidence,
-                        "top_score": top_score,
-                        "customer_name": name,
-                        "customer_email": email,
-                        "customer_phone": phone,
-                    }
-                    ticket_type, ticket_id = _create_ticket_for_session(history, message, sources, metadata=metadata)
-                finally:
-                    frappe.flags.ignore_permissions = prev_ignore
-                    frappe.local.flags.ignore_permissions = prev_local_ignore
-                    frappe.set_user(prev_user)
-                    frappe.local.session.user = prev_user
-                    frappe.session.user = prev_user
+    rag_join = None
+    prefetched_history = None
+    if _is_rag_bound(message, existing_doc, ambiguous_language, policy, plan):
+        session_id = session_id or str(uuid.uuid4())
+        stored_answer = (
+            _stored_quick_reply_answer(plan["query_for_rag"], forced_lang or language) if plan["quick_reply"] else None
+        )
+        if not stored_answer and plan["quick_reply"]:
+            stored_answer = _take_prefetched_answer(session_id, plan["quick_reply"], forced_lang or language)
+        if stored_answer:
+            # Quick-reply answer computed ahead of time (KB revision store or session prefetch): no RAG round-trip.
+            rag_join = stored_answer.copy
+        elif not _get_env_bool("CHAT_ASYNC_RAG", False) and _get_env_bool("CHAT_CONCURRENT_RAG", True):
+            # Start the RAG call now so it overlaps the session/message writes below.
+            # Same window as reading 20 rows after the insert: 19 prior turns plus this message.
+            prior_history = _fetch_history(existing_doc.name, limit=19) if existing_doc else []
+            prefetched_history = prior_history + [{"role": "user", "content": message}]
+            rag_join = _start_rag(session_id, plan["query_for_rag"], forced_lang or language, prefetched_history)
+
+    session_id, session_name, session_doc = _ensure_session(session_id, language, existing_doc)
+    user_doc = _insert_message(session_name, "user", message)
+    _publish_chat_message(
+        session_id,
+        user_doc,
+        sources=[],
+        extra={"language": language},
+    )
 
-                answer = _ticket_created_reply(language, ticket_id)
-                assistant_doc = _insert_message(session_name, "assistant", answer, confidence=0.0, sources=sources)
-                _update_session_state(
-                    session_doc,
-                    low_conf_count=0,
-                    clarification_count=0,
-                    last_resolution_state=RESOLUTION_UNRESOLVED,
-                    last_escalation_offered=False,
-                    preferred_lang=language,
-                )
-                _publish_chat_message(
-                    session_id,
-                    assistant_doc,
-                    sources=sources,
-                    extra={
-                        "language": language,
-                        "resolution_state": RESOLUTION_UNRESOLVED,
-                        "escalation_offered": False,
-                        "contact_required": False,
-                        "ticket_id": ticket_id,
-                        "ticket_type": ticket_type,
-                    },
-                )
-                return {
-                    "session_id": session_id,
-                    "answer": answer,
-                    "confidence": 0.0,
-                    "language": language,
-                    "sources": sources,
-                    "resolution_state": RESOLUTION_UNRESOLVED,
-                    "quick_replies": [],
-                    "escalated": True,
-                    "escalation_offered": False,
-                    "contact_required": False,
-                    "ticket_id": ticket_id,
-                    "ticket_type": ticket_type,
-                }
-            # No contact detected: prompt again and skip RAG.
-            answer = _contact_request_prompt(language)
-            assistant_doc = _insert_message(session_name, "assistant", answer, confidence=0.0, sources=[])
-            _publish_chat_message(
-                session_id,
-                assistant_doc,
-                sources=[],
-                extra={
-                    "language": language,
-                    "resolution_state": RESOLUTION_UNRESOLVED,
-                    "escalation_offered": False,
-                    "contact_required": True,
-                },
-            )
-            return {
+    # If we previously asked for contact details, try to create the ticket from chat input.
+    last_state = getattr(session_doc, "last_resolution_state", None)
+    if last_state == RESOLUTION_UNRESOLVED:
+        name, email, phone = _extract_contact_from_text(message)
+        if email or phone:
+            last_entry = _last_assistant_entry(session_name)
+            sources = last_entry.get("sources") or []
+            confidence = last_entry.get("confidence")
+            top_score = _top_score_from_sources(sources)
+            history = _fetch_history(session_name, limit=20)
+            if not name:
+                name = _extract_name_from_history(history)
+            name, email, phone = _normalize_contact(name, email, phone)
+            metadata = {
                 "session_id": session_id,
-                "answer": answer,
-                "confidence": 0.0,
                 "language": language,
-                "sources": [],
                 "resolution_state": RESOLUTION_UNRESOLVED,
-                "quick_replies": [],
-                "escalated": False,
-                "escalation_offered": True,
-                "contact_required": True,
-                "ticket_id": None,
-                "ticket_type": None,
+                "confidence": confidence,
+                "top_score": top_score,
+                "customer_name": name,
+                "customer_email": email,
+                "customer_phone": phone,
             }
+            ticket_type, ticket_id, ticket_ref = _create_ticket_for_session(
+                history, message, sources, metadata=metadata, message_id=user_doc.name
+            )
 
-        language_choice = _is_language_choice(message)
-        if language_choice:
-            # Explicit language toggle by user.
-            answer = _language_ack("hi" if language_choice == "hi" else "en")
-            assistant_doc = _insert_message(session_name, "assistant", answer, confidence=None, sources=[])
+            if ticket_ref and not ticket_id:
+                # Async ticket: reply with the provisional reference; the job pushes the final ID.
+                answer = _ticket_queued_reply(language, ticket_ref)
+            else:
+                answer = _ticket_created_reply(language, ticket_id)
+            assistant_doc = _insert_message(session_name, "assistant", answer, confidence=0.0, sources=sources)
             _update_session_state(
                 session_doc,
                 low_conf_count=0,
                 clarification_count=0,
-                last_resolution_state=RESOLUTION_ANSWERED,
+                last_resolution_state=RESOLUTION_UNRESOLVED,
                 last_escalation_offered=False,
-                preferred_lang=language_choice,
+                preferred_lang=language,
             )
             _publish_chat_message(
                 session_id,
                 assistant_doc,
-                sources=[],
+                sources=sources,
                 extra={
-                    "language": language_choice,
-                    "resolution_state": RESOLUTION_ANSWERED,
+                    "language": language,
+                    "resolution_state": RESOLUTION_UNRESOLVED,
                     "escalation_offered": False,
-                    "quick_replies": [],
+                    "contact_required": False,
+                    "ticket_id": ticket_id,
+                    "ticket_type": ticket_type,
+                    "ticket_ref": ticket_ref,
                 },
             )
             return {
                 "session_id": session_id,
                 "answer": answer,
-                "confidence": 1.0,
-                "language": language_choice,
-                "sources": [],
-                "resolution_state": RESOLUTION_ANSWERED,
+                "confidence": 0.0,
+                "language": language,
+                "sources": sources,
+                "resolution_state": RESOLUTION_UNRESOLVED,
                 "quick_replies": [],
-                "escalated": False,
+                "escalated": True,
                 "escalation_offered": False,
-                "ticket_id": None,
-                "ticket_type": None,
+                "contact_required": False,
+                "ticket_id": ticket_id,
+                "ticket_type": ticket_type,
+                "ticket_ref": ticket_ref,
             }
-
-        if ambiguous_language:
-            # Ask user to choose language instead of guessing.
-            prompt, quick_replies = _language_preference_prompt("en")
-            assistant_doc = _insert_message(session_name, "assistant", prompt, confidence=None, sources=[])
-            _update_session_state(
-                session_doc,
-                low_conf_count=0,
-                clarification_count=0,
-                last_resolution_state=RESOLUTION_NEEDS_CLARIFICATION,
-                last_escalation_offered=False,
-            )
-            _publish_chat_message(
-                session_id,
-                assistant_doc,
-                sources=[],
-                extra={
-                    "language": "en",
-                    "resolution_state": RESOLUTION_NEEDS_CLARIFICATION,
-                    "escalation_offered": False,
-                    "quick_replies": quick_replies,
-                },
-            )
-            return {
-                "session_id": session_id,
-                "answer": prompt,
-                "confidence": 0.0,
-                "language": "en",
-                "sources": [],
-                "resolution_state": RESOLUTION_NEEDS_CLARIFICATION,
-                "quick_replies": quick_replies,
-                "escalated": False,
+        # No contact detected: prompt again and skip RAG.
+        answer = _contact_request_prompt(language)
+        assistant_doc = _insert_message(session_name, "assistant", answer, confidence=0.0, sources=[])
+        _publish_chat_message(
+            session_id,
+            assistant_doc,
+            sources=[],
+            extra={
+                "language": language,
+                "resolution_state": RESOLUTION_UNRESOLVED,
                 "escalation_offered": False,
-                "ticket_id": None,
-                "ticket_type": None,
-            }
-
-        policy_settings = _policy_settings()
-        policy = EscalationPolicy(
-            conf_threshold=policy_settings["conf_threshold"],
-            very_low_threshold=policy_settings["very_low_threshold"],
-            min_len=6,
+                "contact_required": True,
+            },
         )
+        return {
+            "session_id": session_id,
+            "answer": answer,
+            "confidence": 0.0,
+            "language": language,
+            "sources": [],
+            "resolution_state": RESOLUTION_UNRESOLVED,
+            "quick_replies": [],
+            "escalated": False,
+            "escalation_offered": True,
+            "contact_required": True,
+            "ticket_id": None,
+            "ticket_type": None,
+        }
 
-        history = _fetch_history(session_name, limit=20)
-        clarification_attempts = _count_clarification_prompts(history)
-        clarification_count = int(getattr(session_doc, "clarification_count", 0) or 0)
-        prior_low_conf = int(getattr(session_doc, "low_conf_count", 0) or 0)
-        user_turns = sum(1 for item in history if item.get("role") == "user")
+    language_choice = _is_language_choice(message)
+    if language_choice:
+        # Explicit language toggle by user.
+        answer = _language_ack("hi" if language_choice == "hi" else "en")
+        assistant_doc = _insert_message(session_name, "assistant", answer, confidence=None, sources=[])
+        _update_session_state(
+            session_doc,
+            low_conf_count=0,
+            clarification_count=0,
+            last_resolution_state=RESOLUTION_ANSWERED,
+            last_escalation_offered=False,
+            preferred_lang=language_choice,
+        )
+        _publish_chat_message(
+            session_id,
+            assistant_doc,
+            sources=[],
+            extra={
+                "language": language_choice,
+                "resolution_state": RESOLUTION_ANSWERED,
+                "escalation_offered": False,
+                "quick_replies": [],
+            },
+        )
+        return {
+            "session_id": session_id,
+            "answer": answer,
+            "confidence": 1.0,
+            "language": language_choice,
+            "sources": [],
+            "resolution_state": RESOLUTION_ANSWERED,
+            "quick_replies": [],
+            "escalated": False,
+            "escalation_offered": False,
+            "ticket_id": None,
+            "ticket_type": None,
+        }
 
-        if _explicit_support_request(message):
-            # Honor explicit ticket request and move directly to contact collection.
-            last_entry = _last_assistant_entry(session_name)
-            sources = last_entry.get("sources") or []
+    if ambiguous_language:
+        # Ask user to choose language instead of guessing.
+        prompt, quick_replies = _language_preference_prompt("en")
+        assistant_doc = _insert_message(session_name, "assistant", prompt, confidence=None, sources=[])
+        _update_session_state(
+            session_doc,
+            low_conf_count=0,
+            clarification_count=0,
+            last_resolution_state=RESOLUTION_NEEDS_CLARIFICATION,
+            last_escalation_offered=False,
+        )
+        _publish_chat_message(
+            session_id,
+            assistant_doc,
+            sources=[],
+            extra={
+                "language": "en",
+                "resolution_state": RESOLUTION_NEEDS_CLARIFICATION,
+                "escalation_offered": False,
+                "quick_replies": quick_replies,
+            },
+        )
+        return {
+            "session_id": session_id,
+            "answer": prompt,
+            "confidence": 0.0,
+            "language": "en",
+            "sources": [],
+            "resolution_state": RESOLUTION_NEEDS_CLARIFICATION,
+            "quick_replies": quick_replies,
+            "escalated": False,
+            "escalation_offered": False,
+            "ticket_id": None,
+            "ticket_type": None,
+        }
+
+    history = prefetched_history if prefetched_history is not None else _fetch_history(session_name, limit=20)
+    clarification_attempts = _count_clarification_prompts(history)
+    clarification_count = int(getattr(session_doc, "clarification_count", 0) or 0)
+    prior_low_conf = int(getattr(session_doc, "low_conf_count", 0) or 0)
+    user_turns = sum(1 for item in history if item.get("role") == "user")
+
+    if _explicit_support_request(message):
+        # Honor explicit ticket request and move directly to contact collection.
+        last_entry = _last_assistant_entry(session_name)
+        sources = last_entry.get("sources") or []
+        metadata = {
+            "session_id": session_id,
+            "language": language,
+            "resolution_state": RESOLUTION_UNRESOLVED,
+            "confidence": last_entry.get("confidence"),
+            "top_score": _top_score_from_sources(sources),
+        }
+        return _handle_unresolved(
+            session_id,
+            session_name,
+            session_doc,
+            history,
+            message,
+            language,
+            sources=sources,
+            metadata=metadata,
+        )
+
+    if _is_closing_message(message):
+        # Closing acknowledgements end the conversation without RAG or escalation.
+        answer = _closing_reply(language)
+        assistant_doc = _insert_message(session_name, "assistant", answer, confidence=None, sources=[])
+        _update_session_state(
+            session_doc,
+            low_conf_count=0,
+            clarification_count=0,
+            last_resolution_state=RESOLUTION_ANSWERED,
+            last_escalation_offered=False,
+            preferred_lang=language,
+        )
+        _publish_chat_message(
+            session_id,
+            assistant_doc,
+            sources=[],
+            extra={
+                "language": language,
+                "resolution_state": RESOLUTION_ANSWERED,
+                "escalation_offered": False,
+                "quick_replies": [],
+            },
+        )
+        return {
+            "session_id": session_id,
+            "answer": answer,
+            "confidence": 1.0,
+            "language": language,
+            "sources": [],
+            "resolution_state": RESOLUTION_ANSWERED,
+            "quick_replies": [],
+            "escalated": False,
+            "escalation_offered": False,
+            "ticket_id": None,
+            "ticket_type": None,
+        }
+
+    if analyze(message).is_greeting:
+        # Greetings are handled without RAG or escalation.
+        answer = _greeting_reply(language)
+        assistant_doc = _insert_message(session_name, "assistant", answer, confidence=None, sources=[])
+        _update_session_state(
+            session_doc,
+            low_conf_count=0,
+            clarification_count=0,
+            last_resolution_state=RESOLUTION_ANSWERED,
+            last_escalation_offered=False,
+            preferred_lang=language,
+        )
+        _publish_chat_message(
+            session_id,
+            assistant_doc,
+            sources=[],
+            extra={
+                "language": language,
+                "resolution_state": RESOLUTION_ANSWERED,
+                "escalation_offered": False,
+                "quick_replies": [],
+            },
+        )
+        return {
+            "session_id": session_id,
+            "answer": answer,
+            "confidence": 1.0,
+            "language": language,
+            "sources": [],
+            "resolution_state": RESOLUTION_ANSWERED,
+            "quick_replies": [],
+            "escalated": False,
+            "escalation_offered": False,
+            "ticket_id": None,
+            "ticket_type": None,
+        }
+
+    if policy.is_too_short(message):
+        # Very short messages need clarification before retrieval.
+        answer = _short_reply(language)
+        assistant_doc = _insert_message(session_name, "assistant", answer, confidence=None, sources=[])
+        clarification_count = int(getattr(session_doc, "clarification_count", 0) or 0) + 1
+        _update_session_state(
+            session_doc,
+            low_conf_count=0,
+            clarification_count=clarification_count,
+            last_resolution_state=RESOLUTION_NEEDS_CLARIFICATION,
+            last_escalation_offered=False,
+            preferred_lang=language,
+        )
+        _publish_chat_message(
+            session_id,
+            assistant_doc,
+            sources=[],
+            extra={
+                "language": language,
+                "resolution_state": RESOLUTION_NEEDS_CLARIFICATION,
+                "escalation_offered": False,
+                "quick_replies": [],
+            },
+        )
+        return {
+            "session_id": session_id,
+            "answer": answer,
+            "confidence": 0.0,
+            "language": language,
+            "sources": [],
+            "resolution_state": RESOLUTION_NEEDS_CLARIFICATION,
+            "quick_replies": [],
+            "escalated": False,
+            "escalation_offered": False,
+            "ticket_id": None,
+            "ticket_type": None,
+        }
+
+    quick_reply = plan["quick_reply"]
+    issue_category = plan["issue_category"]
+    issue_subtype = plan["issue_subtype"]
+    query_for_rag = plan["query_for_rag"]
+    intent = plan["intent"]
+
+    if quick_reply:
+        _update_session_state(
+            session_doc,
+            issue_category=issue_category,
+            issue_subtype=issue_subtype,
+            last_escalation_offered=False,
+            preferred_lang=language,
+        )
+    elif plan["category_changed"]:
+        _update_session_state(
+            session_doc,
+            issue_category=issue_category,
+            issue_subtype="",
+            last_escalation_offered=False,
+        )
+
+    if plan["needs_clarification"]:
+        # Vague intent: ask for clarification before running RAG.
+        if clarification_count >= policy_settings["max_attempts"]:
             metadata = {
                 "session_id": session_id,
                 "language": language,
                 "resolution_state": RESOLUTION_UNRESOLVED,
-                "confidence": last_entry.get("confidence"),
-                "top_score": _top_score_from_sources(sources),
+                "confidence": None,
+                "top_score": None,
             }
             return _handle_unresolved(
                 session_id,
@@ -1495,474 +1689,835 @@ def send_message(session_id: str | None = None, message: str | None = None, lang
                 history,
                 message,
                 language,
-                sources=sources,
-                metadata=metadata,
-            )
-
-        if _is_closing_message(message):
-            # Closing acknowledgements end the conversation without RAG or escalation.
-            answer = _closing_reply(language)
-            assistant_doc = _insert_message(session_name, "assistant", answer, confidence=None, sources=[])
-            _update_session_state(
-                session_doc,
-                low_conf_count=0,
-                clarification_count=0,
-                last_resolution_state=RESOLUTION_ANSWERED,
-                last_escalation_offered=False,
-                preferred_lang=language,
-            )
-            _publish_chat_message(
-                session_id,
-                assistant_doc,
                 sources=[],
-                extra={
-                    "language": language,
-                    "resolution_state": RESOLUTION_ANSWERED,
-                    "escalation_offered": False,
-                    "quick_replies": [],
-                },
+                metadata=metadata,
             )
-            return {
-                "session_id": session_id,
-                "answer": answer,
-                "confidence": 1.0,
+        question, quick_replies = _clarify_refund_payment(language) if intent in ("refund", "payment") else (
+            _clarify_reply(language),
+            [],
+        )
+        previous_clarifications = clarification_count
+        clarification_count = previous_clarifications + 1
+        offer_allowed = previous_clarifications >= 1
+        escalation_offered = bool(offer_allowed)
+        assistant_doc = _insert_message(session_name, "assistant", question, confidence=0.0, sources=[])
+        _update_session_state(
+            session_doc,
+            low_conf_count=prior_low_conf,
+            clarification_count=clarification_count,
+            last_resolution_state=RESOLUTION_NEEDS_CLARIFICATION,
+            issue_category=intent or issue_category,
+            last_escalation_offered=escalation_offered,
+            preferred_lang=language,
+        )
+        _publish_chat_message(
+            session_id,
+            assistant_doc,
+            sources=[],
+            extra={
                 "language": language,
-                "sources": [],
-                "resolution_state": RESOLUTION_ANSWERED,
-                "quick_replies": [],
-                "escalated": False,
-                "escalation_offered": False,
-                "ticket_id": None,
-                "ticket_type": None,
-            }
+                "resolution_state": RESOLUTION_NEEDS_CLARIFICATION,
+                "escalation_offered": escalation_offered,
+                "quick_replies": quick_replies,
+            },
+        )
+        _prefetch_quick_replies(
+            session_id,
+            quick_replies,
+            forced_lang or language,
+            history + [{"role": "assistant", "content": question}],
+        )
+        return {
+            "session_id": session_id,
+            "answer": question,
+            "confidence": 0.0,
+            "language": language,
+            "sources": [],
+            "resolution_state": RESOLUTION_NEEDS_CLARIFICATION,
+            "quick_replies": quick_replies,
+            "escalated": False,
+            "escalation_offered": escalation_offered,
+            "ticket_id": None,
+            "ticket_type": None,
+        }
 
-        if policy.is_greeting(message):
-            # Greetings are handled without RAG or escalation.
-            answer = _greeting_reply(language)
-            assistant_doc = _insert_message(session_name, "assistant", answer, confidence=None, sources=[])
-            _update_session_state(
-                session_doc,
-                low_conf_count=0,
-                clarification_count=0,
-                last_resolution_state=RESOLUTION_ANSWERED,
-                last_escalation_offered=False,
-                preferred_lang=language,
-            )
-            _publish_chat_message(
-                session_id,
-                assistant_doc,
-                sources=[],
-                extra={
-                    "language": language,
-                    "resolution_state": RESOLUTION_ANSWERED,
-                    "escalation_offered": False,
-                    "quick_replies": [],
-                },
-            )
-            return {
-                "session_id": session_id,
-                "answer": answer,
-                "confidence": 1.0,
-                "language": language,
-                "sources": [],
-                "resolution_state": RESOLUTION_ANSWERED,
-                "quick_replies": [],
-                "escalated": False,
-                "escalation_offered": False,
-                "ticket_id": None,
-                "ticket_type": None,
-            }
+    turn = {
+        "session_id": session_id,
+        "session_name": session_name,
+        "message": message,
+        "query_for_rag": query_for_rag,
+        "language": language,
+        "forced_lang": forced_lang,
+        "roman_hindi": roman_hindi,
+        "history": history,
+        "intent": intent,
+        "issue_category": issue_category,
+        "issue_subtype": issue_subtype,
+        "clarification_count": clarification_count,
+        "clarification_attempts": clarification_attempts,
+        "prior_low_conf": prior_low_conf,
+    }
+    if rag_join is None and _get_env_bool("CHAT_ASYNC_RAG", False):
+        # Release the web worker now; the answer is delivered over realtime (get_messages as fallback).
+        frappe.enqueue(
+            "ai_powered_css.api.chat.run_rag_turn",
+            queue=os.getenv("CHAT_RAG_QUEUE") or "ai_css_rag",
+            timeout=_get_env_int("CHAT_RAG_JOB_TIMEOUT", 120),
+            enqueue_after_commit=True,
+            turn=turn,
+        )
+        return _pending_response(session_id, language)
+    return _run_rag_turn(turn, session_doc, rag_join=rag_join)
+
+
+def _plan_rag_query(message: str, session_doc, language: str) -> dict[str, Any]:
+    # Pure query planning (no DB writes) so the RAG call can start before the turn is persisted.
+    quick_reply = _match_quick_reply(message)
+    issue_category = getattr(session_doc, "issue_category", "") or ""
+    issue_subtype = getattr(session_doc, "issue_subtype", "") or ""
+    query_for_rag = message
+    skip_pre_clarify = False
+    category_changed = False
+
+    if quick_reply:
+        # Quick replies map to canonical queries to improve retrieval quality.
+        issue_category = quick_reply["category"]
+        issue_subtype = quick_reply["subtype"]
+        query_for_rag = quick_reply["canonical"]
+        skip_pre_clarify = True
+    elif issue_subtype and _is_followup_query(message):
+        query_for_rag = _expand_query_with_subtype(issue_subtype, message, language)
+        skip_pre_clarify = True
+    else:
+        current_intent = _detect_intent(message)
+        if current_intent and issue_category and current_intent != issue_category:
+            issue_category = current_intent
+            issue_subtype = ""
+            category_changed = True
 
-        if policy.is_too_short(message):
-            # Very short messages need clarification before retrieval.
-            answer = _short_reply(language)
-            assistant_doc = _insert_message(session_name, "assistant", answer, confidence=None, sources=[])
-            clarification_count = int(getattr(session_doc, "clarification_count", 0) or 0) + 1
-            _update_session_state(
-                session_doc,
-                low_conf_count=0,
-                clarification_count=clarification_count,
-                last_resolution_state=RESOLUTION_NEEDS_CLARIFICATION,
-                last_escalation_offered=False,
-                preferred_lang=language,
-            )
-            _publish_chat_message(
-                session_id,
-                assistant_doc,
-                sources=[],
-                extra={
-                    "language": language,
-                    "resolution_state": RESOLUTION_NEEDS_CLARIFICATION,
-                    "escalation_offered": False,
-                    "quick_replies": [],
-                },
+    intent = issue_category or _detect_intent(query_for_rag) or _detect_intent(message)
+    needs_clarification = False
+    if not skip_pre_clarify:
+        needs_clarification, intent = _needs_clarification(message)
+
+    return {
+        "quick_reply": quick_reply,
+        "issue_category": issue_category,
+        "issue_subtype": issue_subtype,
+        "query_for_rag": query_for_rag,
+        "category_changed": category_changed,
+        "intent": intent,
+        "needs_clarification": needs_clarification,
+    }
+
+
+def _is_rag_bound(
+    message: str,
+    session_doc,
+    ambiguous_language: bool,
+    policy: EscalationPolicy,
+    plan: dict[str, Any],
+) -> bool:
+    # Mirrors the short-circuit order in _process_message; any early reply means no RAG call.
+    if getattr(session_doc, "last_resolution_state", None) == RESOLUTION_UNRESOLVED:
+        return False
+    if _is_language_choice(message) or ambiguous_language:
+        return False
+    if _explicit_support_request(message) or _is_closing_message(message):
+        return False
+    if analyze(message).is_greeting or policy.is_too_short(message):
+        return False
+    return not plan["needs_clarification"]
+
+
+def _rag_executor() -> ThreadPoolExecutor:
+    global _RAG_EXECUTOR
+    if _RAG_EXECUTOR is None:
+        _RAG_EXECUTOR = ThreadPoolExecutor(
+            max_workers=max(_get_env_int("CHAT_RAG_THREADS", 4), 1),
+            thread_name_prefix="ai_css_rag",
+        )
+    return _RAG_EXECUTOR
+
+
+def _rag_request(
+    settings: dict[str, Any],
+    rag_payload: dict[str, Any],
+) -> tuple[dict[str, Any] | None, Exception | None]:
+    # HTTP only: no frappe.local access, so this is safe to run on a helper thread.
+    headers = {"Content-Type": "application/json"}
+    if settings["rag_api_key"]:
+        headers["x-api-key"] = settings["rag_api_key"]
+
+    # Retry RAG briefly to smooth transient network errors.
+    error = None
+    for attempt in range(3):
+        try:
+            rag_response = requests.post(
+                f"{settings['rag_url'].rstrip('/')}/query",
+                headers=headers,
+                json=rag_payload,
+                timeout=30,
             )
-            return {
-                "session_id": session_id,
-                "answer": answer,
-                "confidence": 0.0,
-                "language": language,
-                "sources": [],
-                "resolution_state": RESOLUTION_NEEDS_CLARIFICATION,
-                "quick_replies": [],
-                "escalated": False,
-                "escalation_offered": False,
-                "ticket_id": None,
-                "ticket_type": None,
-            }
+            rag_response.raise_for_status()
+            return rag_response.json(), None
+        except Exception as exc:
+            error = exc
+            if attempt < 2:
+                time.sleep(1)
+    return None, error
+
+
+def _start_rag(
+    session_id: str,
+    query: str,
+    lang_hint: str,
+    history: list[dict[str, str]],
+    concurrent: bool = True,
+) -> Callable[[], dict[str, Any]]:
+    settings = _rag_settings()
+    rag_payload = {
+        "session_id": session_id,
+        "user_query": query,
+        "lang_hint": lang_hint,
+        "top_k": settings["top_k"],
+        "history": history,
+    }
+    release = _acquire_rag_slot()
+    if release is None:
+        busy = {"answer": "", "confidence": 0.0, "language": lang_hint, "sources": [], "busy": True}
+        return busy.copy
+    if concurrent:
+        future = _rag_executor().submit(_rag_request, settings, rag_payload)
+        future.add_done_callback(lambda _: release())
+        fetch = future.result
+    else:
+        try:
+            result = _rag_request(settings, rag_payload)
+        finally:
+            release()
+
+        def fetch():
+            return result
+
+    def join() -> dict[str, Any]:
+        rag_data, error = fetch()
+        if rag_data is not None:
+            return rag_data
+        frappe.logger("ai_powered_css").warning("RAG query failed after retries: %s", error)
+        return {
+            "answer": "",
+            "confidence": 0.0,
+            "language": lang_hint,
+            "sources": [],
+        }
+
+    return join
+
+
+def _call_rag(
+    session_id: str,
+    query: str,
+    lang_hint: str,
+    history: list[dict[str, str]],
+) -> dict[str, Any]:
+    return _start_rag(session_id, query, lang_hint, history, concurrent=False)()
+
+
+def _quick_answer_key(kb_revision: str, lang_hint: str, canonical: str) -> str:
+    digest = hashlib.sha1(canonical.encode("utf-8")).hexdigest()[:16]
+    return f"ai_css_quick_answer:{kb_revision}:{lang_hint}:{digest}"
+
+
+def _quick_reply_queries() -> list[tuple[str, str]]:
+    # Every canonical query in both option languages, for either response language.
+    return [
+        (lang_hint, option["canonical"])
+        for lang_hint in ("en", "hi")
+        for options in _QUICK_REPLY_OPTIONS.values()
+        for option in options
+    ]
+
+
+def _stored_quick_reply_answer(canonical: str, lang_hint: str) -> dict[str, Any] | None:
+    kb_revision = frappe.cache().get_value(_KB_REVISION_KEY)
+    if not kb_revision:
+        return None
+    return frappe.cache().get_value(_quick_answer_key(kb_revision, lang_hint, canonical))
+
+
+@frappe.whitelist()
+def warm_quick_reply_answers(kb_revision: str | None = None) -> dict[str, Any]:
+    """Queue a rebuild of the quick-reply answer store; called by scripts/init_kb.py after ingest."""
+    frappe.only_for("System Manager")
+    kb_revision = (kb_revision or "").strip() or frappe.generate_hash(length=12)
+    frappe.enqueue(
+        "ai_powered_css.api.chat.build_quick_reply_answers",
+        queue="long",
+        job_id=f"ai_css_quick_answers:{kb_revision}",
+        deduplicate=True,
+        kb_revision=kb_revision,
+    )
+    return {"kb_revision": kb_revision, "queued": True}
+
+
+def build_quick_reply_answers(kb_revision: str) -> dict[str, Any]:
+    # Answers are written under the new revision first; the pointer flips only once all are stored.
+    cache = frappe.cache()
+    stored = 0
+    for lang_hint, canonical in _quick_reply_queries():
+        # Distinct session ids keep the RAG service's per-session retrieval cache from mixing canonicals.
+        warm_session = f"quick-reply-warm:{lang_hint}:{hashlib.sha1(canonical.encode('utf-8')).hexdigest()[:8]}"
+        rag_data = _call_rag(warm_session, canonical, lang_hint, [{"role": "user", "content": canonical}])
+        if not rag_data.get("answer") or not rag_data.get("sources"):
+            continue
+        cache.set_value(_quick_answer_key(kb_revision, lang_hint, canonical), rag_data)
+        stored += 1
+
+    previous = cache.get_value(_KB_REVISION_KEY)
+    cache.set_value(_KB_REVISION_KEY, kb_revision)
+    if previous and previous != kb_revision:
+        for lang_hint, canonical in _quick_reply_queries():
+            cache.delete_value(_quick_answer_key(previous, lang_hint, canonical))
+    frappe.logger("ai_powered_css").info(
+        "Quick-reply answers stored for KB revision %s: %s/%s", kb_revision, stored, len(_quick_reply_queries())
+    )
+    return {"kb_revision": kb_revision, "stored": stored}
+
+
+def _incr_metric(name: str, amount: int = 1) -> None:
+    # Best-effort counters for tuning; never fail a chat turn over metrics.
+    try:
+        frappe.cache().hincrby(frappe.cache().make_key(_METRICS_KEY), name, amount)
+    except Exception:
+        pass
+
+
+def _read_metrics() -> dict[str, int]:
+    raw = frappe.cache().hgetall(frappe.cache().make_key(_METRICS_KEY)) or {}
+    return {frappe.safe_decode(name): int(value) for name, value in raw.items()}
+
+
+def _redis_script(source: str):
+    script = _REDIS_SCRIPTS.get(source)
+    if script is None:
+        script = _REDIS_SCRIPTS[source] = frappe.cache().register_script(source)
+    return script
+
+
+def _rate_spec(scope: str, dim: str) -> tuple[float, float]:
+    # "<requests>/<seconds>": bucket capacity and refill rate per second.
+    default = _RATE_LIMIT_DEFAULTS[scope][dim]
+    raw = os.getenv(f"CHAT_RATE_{scope.upper()}_{dim.upper()}") or default
+    try:
+        count, seconds = (float(part) for part in raw.split("/", 1))
+    except ValueError:
+        count, seconds = (float(part) for part in default.split("/", 1))
+    return count, count / seconds
+
+
+def _check_rate_limit(scope: str, session_id: str | None = None) -> None:
+    # Token buckets per session, per IP and global; runs before any DB work so rejected calls stay cheap.
+    if not _get_env_bool("CHAT_RATE_LIMIT", False):
+        return
+    cache = frappe.cache()
+    subjects = (("session", session_id), ("ip", getattr(frappe.local, "request_ip", None)), ("global", "all"))
+    keys = []
+    args = [time.time(), scope]
+    for dim, ident in subjects:
+        if not ident:
+            continue
+        capacity, rate = _rate_spec(scope, dim)
+        keys.append(cache.make_key(f"ai_css_rate:{scope}:{dim}:{ident}"))
+        args.extend([dim, capacity, rate])
+    keys.append(cache.make_key(_METRICS_KEY))
+    try:
+        rejected = _redis_script(_TOKEN_BUCKET_LUA)(keys=keys, args=args)
+    except Exception:
+        # Fail open: a Redis hiccup should not take the chat down.
+        frappe.logger("ai_powered_css").warning("Rate limit check failed", exc_info=True)
+        return
+    if rejected:
+        frappe.throw(
+            _("Too many requests. Please wait a moment and try again."),
+            frappe.TooManyRequestsError,
+        )
+
+
+def _acquire_rag_slot() -> Callable[[], None] | None:
+    # Global cap on in-flight RAG calls across workers: wait briefly for a slot, then shed.
+    limit = _get_env_int("CHAT_RAG_MAX_INFLIGHT", 0)
+    if limit <= 0:
+        return lambda: None
+    cache = frappe.cache()
+    key = cache.make_key(_RAG_SLOTS_KEY)
+    token = uuid.uuid4().hex
+    # Slots held longer than the worst-case RAG call (3 x 30s + retries) belong to dead workers.
+    stale_after = 120
+    deadline = time.monotonic() + _get_env_float("CHAT_RAG_SLOT_WAIT", 2.0)
+    waited = False
+    while True:
+        if _redis_script(_ACQUIRE_SLOT_LUA)(keys=[key], args=[time.time(), stale_after, limit, token]):
+            break
+        if time.monotonic() >= deadline:
+            _incr_metric("rag_slot_shed")
+            return None
+        waited = True
+        time.sleep(0.1)
+    _incr_metric("rag_slot_waited" if waited else "rag_slot_acquired")
+
+    def release() -> None:
+        # May run on the RAG helper thread; only touches the already-resolved key.
+        try:
+            cache.zrem(key, token)
+        except Exception:
+            pass
+
+    return release
+
+
+def _prefetch_key(session_id: str, lang_hint: str, subtype: str) -> str:
+    return frappe.cache().make_key(f"ai_css_prefetch:{session_id}:{lang_hint}:{subtype}")
+
+
+def _sweep_prefetch_waste() -> None:
+    # Prefetched answers that expired unused: RAG/OpenAI spend with no benefit.
+    try:
+        cache = frappe.cache()
+        expired = cache.zremrangebyscore(cache.make_key(_PREFETCH_PENDING_KEY), "-inf", time.time())
+    except Exception:
+        return
+    if expired:
+        _incr_metric("prefetch_wasted", expired)
+
+
+def _prefetch_quick_replies(
+    session_id: str,
+    quick_replies: list[str],
+    lang_hint: str,
+    history: list[dict[str, str]],
+) -> None:
+    # The next turn is very likely one of the offered options; answer them speculatively in the background.
+    if not quick_replies or not _get_env_bool("CHAT_PREFETCH_QUICK_REPLIES", False):
+        return
+    subtypes = []
+    for label in quick_replies:
+        option = _match_quick_reply(label)
+        if option and not _stored_quick_reply_answer(option["canonical"], lang_hint):
+            subtypes.append(option["subtype"])
+    if not subtypes:
+        return
+    frappe.enqueue(
+        "ai_powered_css.api.chat.prefetch_quick_reply_answers",
+        queue=os.getenv("CHAT_PREFETCH_QUEUE") or "long",
+        enqueue_after_commit=True,
+        session_id=session_id,
+        lang_hint=lang_hint,
+        history=history[-19:],
+        subtypes=subtypes,
+    )
+    _incr_metric("prefetch_queued", len(subtypes))
 
-        quick_reply = _match_quick_reply(message)
-        issue_category = getattr(session_doc, "issue_category", "") or ""
-        issue_subtype = getattr(session_doc, "issue_subtype", "") or ""
-        query_for_rag = message
-        skip_pre_clarify = False
-
-        if quick_reply:
-            # Quick replies map to canonical queries to improve retrieval quality.
-            issue_category = quick_reply["category"]
-            issue_subtype = quick_reply["subtype"]
-            query_for_rag = quick_reply["canonical"]
-            skip_pre_clarify = True
-            _update_session_state(
-                session_doc,
-                issue_category=issue_category,
-                issue_subtype=issue_subtype,
-                last_escalation_offered=False,
-                preferred_lang=language,
-            )
-        elif issue_subtype and _is_followup_query(message):
-            query_for_rag = _expand_query_with_subtype(issue_subtype, message, language)
-            skip_pre_clarify = True
-        else:
-            current_intent = _detect_intent(message)
-            if current_intent and issue_category and current_intent != issue_category:
-                issue_category = current_intent
-                issue_subtype = ""
-                _update_session_state(
-                    session_doc,
-                    issue_category=issue_category,
-                    issue_subtype="",
-                    last_escalation_offered=False,
-                )
-
-        intent = issue_category or _detect_intent(query_for_rag) or _detect_intent(message)
-        if not skip_pre_clarify:
-            # Vague intent: ask for clarification before running RAG.
-            needs_clarification, intent = _needs_clarification(message)
-            if needs_clarification:
-                if clarification_count >= policy_settings["max_attempts"]:
-                    metadata = {
-                        "session_id": session_id,
-                        "language": language,
-                        "resolution_state": RESOLUTION_UNRESOLVED,
-                        "confidence": None,
-                        "top_score": None,
-                    }
-                    return _handle_unresolved(
-                        session_id,
-                        session_name,
-                        session_doc,
-                        history,
-                        message,
-                        language,
-                        sources=[],
-                        metadata=metadata,
-                    )
-                question, quick_replies = _clarify_refund_payment(language) if intent in ("refund", "payment") else (
-                    _clarify_reply(language),
-                    [],
-                )
-                previous_clarifications = clarification_count
-                clarification_count = previous_clarifications + 1
-                offer_allowed = previous_clarifications >= 1
-                escalation_offered = bool(offer_allowed)
-                assistant_doc = _insert_message(session_name, "assistant", question, confidence=0.0, sources=[])
-                _update_session_state(
-                    session_doc,
-                    low_conf_count=prior_low_conf,
-                    clarification_count=clarification_count,
-                    last_resolution_state=RESOLUTION_NEEDS_CLARIFICATION,
-                    issue_category=intent or issue_category,
-                    last_escalation_offered=escalation_offered,
-                    preferred_lang=language,
-                )
-                _publish_chat_message(
-                    session_id,
-                    assistant_doc,
-                    sources=[],
-                    extra={
-                        "language": language,
-                        "resolution_state": RESOLUTION_NEEDS_CLARIFICATION,
-                        "escalation_offered": escalation_offered,
-                        "quick_replies": quick_replies,
-                    },
-                )
-                return {
-                    "session_id": session_id,
-                    "answer": question,
-                    "confidence": 0.0,
-                    "language": language,
-                    "sources": [],
-                    "resolution_state": RESOLUTION_NEEDS_CLARIFICATION,
-                    "quick_replies": quick_replies,
-                    "escalated": False,
-                    "escalation_offered": escalation_offered,
-                    "ticket_id": None,
-                    "ticket_type": None,
-                }
 
-        settings = _rag_settings()
-        rag_lang_hint = forced_lang or language
-        rag_payload = {
-            "session_id": session_id,
-            "user_query": query_for_rag,
-            "lang_hint": rag_lang_hint,
-            "top_k": settings["top_k"],
-            "history": history,
-        }
+def prefetch_quick_reply_answers(
+    session_id: str,
+    lang_hint: str,
+    history: list[dict[str, str]],
+    subtypes: list[str],
+) -> None:
+    """Background job: run RAG for offered quick replies and keep the answers for a short per-session TTL."""
+    cache = frappe.cache()
+    ttl = _get_env_int("CHAT_PREFETCH_TTL", 180)
+    options = {opt["subtype"]: opt for opt in _QUICK_REPLY_OPTIONS.get(lang_hint, _QUICK_REPLY_OPTIONS["en"])}
+    for subtype in subtypes:
+        option = options.get(subtype)
+        if not option:
+            continue
+        # Same inputs the real turn would send: the clicked label as the last user message, canonical as the query.
+        rag_data = _call_rag(
+            f"{session_id}:prefetch:{subtype}",
+            option["canonical"],
+            lang_hint,
+            history + [{"role": "user", "content": option["label"]}],
+        )
+        _incr_metric("prefetch_rag_calls")
+        if not rag_data.get("answer"):
+            continue
+        key = _prefetch_key(session_id, lang_hint, subtype)
+        cache.set(key, json.dumps(rag_data), ex=ttl)
+        _incr_metric("prefetch_stored")
+        # zadd adds nothing when the key was already pending: the answer it overwrote was never used.
+        if not cache.zadd(cache.make_key(_PREFETCH_PENDING_KEY), {key: time.time() + ttl}):
+            _incr_metric("prefetch_wasted")
+    _sweep_prefetch_waste()
 
-        headers = {"Content-Type": "application/json"}
-        if settings["rag_api_key"]:
-            headers["x-api-key"] = settings["rag_api_key"]
 
-        rag_data = None
-        # Retry RAG briefly to smooth transient network errors.
-        for attempt in range(3):
-            try:
-                rag_response = requests.post(
-                    f"{settings['rag_url'].rstrip('/')}/query",
-                    headers=headers,
-                    json=rag_payload,
-                    timeout=30,
-                )
-                rag_response.raise_for_status()
-                rag_data = rag_response.json()
-                break
-            except Exception as exc:
-                if attempt < 2:
-                    time.sleep(1)
-                    continue
-                frappe.logger("ai_powered_css").warning("RAG query failed after retries: %s", exc)
-                rag_data = {
-                    "answer": "",
-                    "confidence": 0.0,
-                    "language": language,
-                    "sources": [],
-                }
+def _take_prefetched_answer(session_id: str, quick_reply: dict[str, str], lang_hint: str) -> dict[str, Any] | None:
+    if not _get_env_bool("CHAT_PREFETCH_QUICK_REPLIES", False):
+        return None
+    cache = frappe.cache()
+    key = _prefetch_key(session_id, lang_hint, quick_reply["subtype"])
+    raw = cache.get(key)
+    if raw is None:
+        _incr_metric("prefetch_miss")
+        return None
+    cache.delete(key)
+    cache.zrem(cache.make_key(_PREFETCH_PENDING_KEY), key)
+    _incr_metric("prefetch_hit")
+    return json.loads(raw)
+
+
+@frappe.whitelist()
+def get_chat_metrics() -> dict[str, Any]:
+    """Counters for tuning the chat fast paths and admission control (System Manager only)."""
+    frappe.only_for("System Manager")
+    _sweep_prefetch_waste()
+    metrics: dict[str, Any] = _read_metrics()
+    hits = metrics.get("prefetch_hit", 0)
+    chosen = hits + metrics.get("prefetch_miss", 0)
+    metrics["prefetch_hit_rate"] = round(hits / chosen, 3) if chosen else None
+    try:
+        metrics["prefetch_pending"] = frappe.cache().zcard(frappe.cache().make_key(_PREFETCH_PENDING_KEY))
+    except Exception:
+        metrics["prefetch_pending"] = None
+    return metrics
 
-        answer = rag_data.get("answer") or ""
-        confidence = float(rag_data.get("confidence") or 0.0)
-        sources = rag_data.get("sources") or []
-        response_lang = rag_data.get("language") or language
-        if forced_lang:
-            response_lang = forced_lang
-        elif language == "hi" or roman_hindi:
-            response_lang = "hi"
-        else:
-            response_lang = "en"
 
-        if not answer:
-            # Avoid blank answers if the upstream RAG call failed or returned empty content.
-            answer = _clarify_reply(response_lang)
+def _busy_turn(session_id: str, session_name: str, language: str) -> dict[str, Any]:
+    # Load shed: reply without touching the session's resolution state so a retry proceeds normally.
+    answer = _busy_reply(language)
+    assistant_doc = _insert_message(session_name, "assistant", answer, confidence=None, sources=[])
+    _publish_chat_message(
+        session_id,
+        assistant_doc,
+        sources=[],
+        extra={
+            "language": language,
+            "resolution_state": RESOLUTION_BUSY,
+            "escalation_offered": False,
+            "quick_replies": [],
+        },
+    )
+    return {
+        "session_id": session_id,
+        "answer": answer,
+        "confidence": None,
+        "language": language,
+        "sources": [],
+        "resolution_state": RESOLUTION_BUSY,
+        "quick_replies": [],
+        "escalated": False,
+        "escalation_offered": False,
+        "ticket_id": None,
+        "ticket_type": None,
+    }
 
-        answer = _sanitize_answer(answer, response_lang)
-        sources, top_score, sources_usable = _evaluate_sources(sources, policy_settings["min_top_score"])
-        if not sources_usable:
-            sources = []
-        elif sources:
-            confidence = max(confidence, top_score)
 
-        if _is_off_topic(message) and not issue_subtype and not issue_category:
-            # Off-topic queries should not be answered with unrelated KB sources.
-            sources = []
-            top_score = 0.0
-
-        # Allow strong KB evidence to answer even if model self-confidence is slightly below threshold.
-        answer_ready = bool(sources) and top_score >= policy_settings["answer_top_score"]
-        if answer_ready and confidence < policy_settings["conf_threshold"]:
-            confidence = max(confidence, top_score)
-        if not answer_ready and issue_subtype and sources and top_score >= policy_settings["answer_top_score"]:
-            answer_ready = True
-
-        resolution_state = RESOLUTION_ANSWERED
-        quick_replies: list[str] = []
-        escalated = False
-        escalation_offered = False
-        ticket_id = None
-        ticket_type = None
-
-        if answer_ready:
-            assistant_doc = _insert_message(session_name, "assistant", answer, confidence=confidence, sources=sources)
-            _update_session_state(
-                session_doc,
-                low_conf_count=0,
-                clarification_count=0,
-                last_resolution_state=RESOLUTION_ANSWERED,
-                issue_category=intent or issue_category,
-                issue_subtype=issue_subtype,
-                last_escalation_offered=False,
-                preferred_lang=response_lang,
-            )
-            _publish_chat_message(
-                session_id,
-                assistant_doc,
-                sources=sources,
-                extra={
-                    "language": response_lang,
-                    "resolution_state": RESOLUTION_ANSWERED,
-                    "escalation_offered": False,
-                    "quick_replies": [],
-                },
-            )
-            return {
-                "session_id": session_id,
-                "answer": answer,
-                "confidence": confidence,
-                "language": response_lang,
-                "sources": sources,
-                "resolution_state": RESOLUTION_ANSWERED,
-                "quick_replies": [],
-                "escalated": False,
-                "escalation_offered": False,
-                "ticket_id": None,
-                "ticket_type": None,
-            }
+def _pending_response(session_id: str, language: str) -> dict[str, Any]:
+    return {
+        "session_id": session_id,
+        "answer": "",
+        "confidence": None,
+        "language": language,
+        "sources": [],
+        "resolution_state": RESOLUTION_PENDING,
+        "pending": True,
+        "quick_replies": [],
+        "escalated": False,
+        "escalation_offered": False,
+        "ticket_id": None,
+        "ticket_type": None,
+    }
 
-        low_conf_count = prior_low_conf + 1
-        very_low = confidence <= policy_settings["very_low_threshold"]
-        high_risk = _is_high_risk_issue(message, intent)
-        attempts = max(clarification_count, clarification_attempts)
 
-        # Escalate only after repeated low-confidence or high-risk + no sources.
-        if (very_low and not sources and high_risk) or attempts >= policy_settings["max_attempts"]:
-            metadata = {
-                "session_id": session_id,
-                "language": response_lang,
-                "resolution_state": RESOLUTION_UNRESOLVED,
-                "confidence": confidence,
-                "top_score": top_score if sources else None,
-            }
-            return _handle_unresolved(
-                session_id,
-                session_name,
-                session_doc,
-                history + [{"role": "assistant", "content": answer}],
-                message,
-                response_lang,
-                sources=sources,
-                metadata=metadata,
-            )
+def _run_rag_turn(
+    turn: dict[str, Any],
+    session_doc=None,
+    rag_join: Callable[[], dict[str, Any]] | None = None,
+) -> dict[str, Any]:
+    # RAG round-trip + resolution decision for one turn; runs inline or from the background queue.
+    session_id = turn["session_id"]
+    session_name = turn["session_name"]
+    message = turn["message"]
+    language = turn["language"]
+    forced_lang = turn["forced_lang"]
+    roman_hindi = turn["roman_hindi"]
+    history = turn["history"]
+    intent = turn["intent"]
+    issue_category = turn["issue_category"]
+    issue_subtype = turn["issue_subtype"]
+    clarification_count = turn["clarification_count"]
+    clarification_attempts = turn["clarification_attempts"]
+    prior_low_conf = turn["prior_low_conf"]
+    if session_doc is None:
+        session_doc = frappe.get_doc("AI CSS Chat Session", session_name)
+    policy_settings = _policy_settings()
 
-        if intent in ("refund", "payment") and not issue_subtype:
-            # Offer targeted quick replies for common refund/payment issues.
-            question, quick_replies = _clarify_refund_payment(response_lang)
-        elif intent in ("refund", "payment"):
-            question, quick_replies = _detail_prompt(response_lang), []
-        else:
-            question, quick_replies = _clarify_reply(response_lang), []
+    if rag_join is not None:
+        # Started before the turn's DB writes; only the remaining latency is paid here.
+        rag_data = rag_join()
+    else:
+        rag_data = _call_rag(session_id, turn["query_for_rag"], forced_lang or language, history)
+
+    if rag_data.get("busy"):
+        return _busy_turn(session_id, session_name, forced_lang or language)
+
+    answer = rag_data.get("answer") or ""
+    confidence = float(rag_data.get("confidence") or 0.0)
+    sources = rag_data.get("sources") or []
+    response_lang = rag_data.get("language") or language
+    if forced_lang:
+        response_lang = forced_lang
+    elif language == "hi" or roman_hindi:
+        response_lang = "hi"
+    else:
+        response_lang = "en"
 
-        previous_clarifications = clarification_count
-        clarification_count = previous_clarifications + 1
-        offer_allowed = previous_clarifications >= 1 or very_low
-        escalation_offered = bool(offer_allowed)
-        confidence = min(confidence, 0.6)
+    if not answer:
+        # Avoid blank answers if the upstream RAG call failed or returned empty content.
+        answer = _clarify_reply(response_lang)
+
+    answer = _sanitize_answer(answer, response_lang)
+    sources, top_score, sources_usable = _evaluate_sources(sources, policy_settings["min_top_score"])
+    if not sources_usable:
+        sources = []
+    elif sources:
+        confidence = max(confidence, top_score)
+
+    if _is_off_topic(message) and not issue_subtype and not issue_category:
+        # Off-topic queries should not be answered with unrelated KB sources.
+        sources = []
+        top_score = 0.0
+
+    # Allow strong KB evidence to answer even if model self-confidence is slightly below threshold.
+    answer_ready = bool(sources) and top_score >= policy_settings["answer_top_score"]
+    if answer_ready and confidence < policy_settings["conf_threshold"]:
+        confidence = max(confidence, top_score)
+    if not answer_ready and issue_subtype and sources and top_score >= policy_settings["answer_top_score"]:
+        answer_ready = True
+
+    resolution_state = RESOLUTION_ANSWERED
+    quick_replies: list[str] = []
+    escalated = False
+    escalation_offered = False
+    ticket_id = None
+    ticket_type = None
 
-        assistant_doc = _insert_message(session_name, "assistant", question, confidence=confidence, sources=[])
+    if answer_ready:
+        assistant_doc = _insert_message(session_name, "assistant", answer, confidence=confidence, sources=sources)
         _update_session_state(
             session_doc,
-            low_conf_count=low_conf_count,
-            clarification_count=clarification_count,
-            last_resolution_state=RESOLUTION_NEEDS_CLARIFICATION,
+            low_conf_count=0,
+            clarification_count=0,
+            last_resolution_state=RESOLUTION_ANSWERED,
             issue_category=intent or issue_category,
             issue_subtype=issue_subtype,
-            last_escalation_offered=escalation_offered,
+            last_escalation_offered=False,
             preferred_lang=response_lang,
         )
         _publish_chat_message(
             session_id,
             assistant_doc,
-            sources=[],
+            sources=sources,
             extra={
                 "language": response_lang,
-                "resolution_state": RESOLUTION_NEEDS_CLARIFICATION,
-                "escalation_offered": escalation_offered,
-                "quick_replies": quick_replies,
+                "resolution_state": RESOLUTION_ANSWERED,
+                "escalation_offered": False,
+                "quick_replies": [],
             },
         )
-
         return {
             "session_id": session_id,
-            "answer": question,
+            "answer": answer,
             "confidence": confidence,
             "language": response_lang,
-            "sources": [],
+            "sources": sources,
+            "resolution_state": RESOLUTION_ANSWERED,
+            "quick_replies": [],
+            "escalated": False,
+            "escalation_offered": False,
+            "ticket_id": None,
+            "ticket_type": None,
+        }
+
+    low_conf_count = prior_low_conf + 1
+    very_low = confidence <= policy_settings["very_low_threshold"]
+    high_risk = _is_high_risk_issue(message, intent)
+    attempts = max(clarification_count, clarification_attempts)
+
+    # Escalate only after repeated low-confidence or high-risk + no sources.
+    if (very_low and not sources and high_risk) or attempts >= policy_settings["max_attempts"]:
+        metadata = {
+            "session_id": session_id,
+            "language": response_lang,
+            "resolution_state": RESOLUTION_UNRESOLVED,
+            "confidence": confidence,
+            "top_score": top_score if sources else None,
+        }
+        return _handle_unresolved(
+            session_id,
+            session_name,
+            session_doc,
+            history + [{"role": "assistant", "content": answer}],
+            message,
+            response_lang,
+            sources=sources,
+            metadata=metadata,
+        )
+
+    if intent in ("refund", "payment") and not issue_subtype:
+        # Offer targeted quick replies for common refund/payment issues.
+        question, quick_replies = _clarify_refund_payment(response_lang)
+    elif intent in ("refund", "payment"):
+        question, quick_replies = _detail_prompt(response_lang), []
+    else:
+        question, quick_replies = _clarify_reply(response_lang), []
+
+    previous_clarifications = clarification_count
+    clarification_count = previous_clarifications + 1
+    offer_allowed = previous_clarifications >= 1 or very_low
+    escalation_offered = bool(offer_allowed)
+    confidence = min(confidence, 0.6)
+
+    assistant_doc = _insert_message(session_name, "assistant", question, confidence=confidence, sources=[])
+    _update_session_state(
+        session_doc,
+        low_conf_count=low_conf_count,
+        clarification_count=clarification_count,
+        last_resolution_state=RESOLUTION_NEEDS_CLARIFICATION,
+        issue_category=intent or issue_category,
+        issue_subtype=issue_subtype,
+        last_escalation_offered=escalation_offered,
+        preferred_lang=response_lang,
+    )
+    _publish_chat_message(
+        session_id,
+        assistant_doc,
+        sources=[],
+        extra={
+            "language": response_lang,
             "resolution_state": RESOLUTION_NEEDS_CLARIFICATION,
-            "quick_replies": quick_replies,
-            "escalated": escalated,
             "escalation_offered": escalation_offered,
-            "ticket_id": ticket_id,
-            "ticket_type": ticket_type,
-        }
-    finally:
-        frappe.flags.ignore_permissions = previous_ignore
-        frappe.set_user(previous_user)
+            "quick_replies": quick_replies,
+        },
+    )
+    _prefetch_quick_replies(
+        session_id,
+        quick_replies,
+        forced_lang or response_lang,
+        history + [{"role": "assistant", "content": question}],
+    )
+
+    return {
+        "session_id": session_id,
+        "answer": question,
+        "confidence": confidence,
+        "language": response_lang,
+        "sources": [],
+        "resolution_state": RESOLUTION_NEEDS_CLARIFICATION,
+        "quick_replies": quick_replies,
+        "escalated": escalated,
+        "escalation_offered": escalation_offered,
+        "ticket_id": ticket_id,
+        "ticket_type": ticket_type,
+    }
+
+
+def run_rag_turn(turn: dict[str, Any]) -> None:
+    """Background job for CHAT_ASYNC_RAG turns; every outcome is published to the session room."""
+    try:
+        _run_rag_turn(turn)
+    except Exception:
+        frappe.db.rollback()
+        frappe.log_error(title="AI CSS async RAG turn failed")
+        # Never leave the client waiting on a pending turn.
+        answer = _clarify_reply(turn["language"])
+        assistant_doc = _insert_message(turn["session_name"], "assistant", answer, confidence=0.0, sources=[])
+        _publish_chat_message(
+            turn["session_id"],
+            assistant_doc,
+            sources=[],
+            extra={
+                "language": turn["language"],
+                "resolution_state": RESOLUTION_NEEDS_CLARIFICATION,
+                "escalation_offered": False,
+                "quick_replies": [],
+            },
+        )
+
+
+@frappe.whitelist(allow_guest=True)
+def send_message(session_id: str | None = None, message: str | None = None, lang_hint: str | None = None):
+    _check_rate_limit("send", session_id)
+    with _privileged_writes():
+        response = _process_message(session_id, message, lang_hint)
+        response["realtime_room"] = _session_room(response["session_id"])
+        return response
 
 
 @frappe.whitelist(allow_guest=True)
 def get_messages(session_id: str | None = None, since: str | None = None, limit: int | str = 20):
-    previous_ignore = getattr(frappe.flags, "ignore_permissions", False)
-    previous_user = frappe.session.user or "Guest"
-    frappe.flags.ignore_permissions = True
-    frappe.set_user("Administrator")
-    try:
+    _check_rate_limit("poll", session_id)
+    with _privileged_writes():
         if not session_id:
             frappe.throw(_("session_id is required"))
-        session_doc = _get_session_doc(session_id)
-        if not session_doc:
-            return {"session_id": session_id, "messages": []}
+        with _replica_reads(since) as on_replica:
+            messages = _list_messages(session_id, since, limit)
+        if messages is None and on_replica:
+            # Sessions newer than the replica are resolved on the primary.
+            _incr_metric("replica_fallback_missing")
+            messages = _list_messages(session_id, since, limit)
+        response = {"session_id": session_id, "messages": messages or [], "realtime_room": _session_room(session_id)}
+        # Polls are read-only: an archived session is only reported here and comes back on the next send_message.
+        if messages is None and frappe.db.exists("AI CSS Chat Archive", {"session_id": session_id}):
+            response["archived"] = True
+        return response
 
+
+def _list_messages(session_id: str, since: str | None, limit: int | str) -> list[dict[str, Any]] | None:
+    session_doc = _get_session_doc(session_id)
+    if not session_doc:
+        return None
+
+    try:
+        limit = int(limit)
+    except Exception:
+        limit = 20
+    limit = max(1, min(limit, 50))
+
+    filters = {"session": session_doc.name}
+    if since:
         try:
-            limit = int(limit)
+            since_dt = frappe.utils.get_datetime(since)
+            filters["creation"] = (">", since_dt)
         except Exception:
-            limit = 20
-        limit = max(1, min(limit, 50))
-
-        filters = {"session": session_doc.name}
-        if since:
-            try:
-                since_dt = frappe.utils.get_datetime(since)
-                filters["creation"] = (">", since_dt)
-            except Exception:
-                pass
+            pass
 
-        rows = frappe.get_all(
-            "AI CSS Chat Message",
-            filters=filters,
-            fields=["name", "role", "content", "confidence", "sources_json", "creation"],
-            order_by="creation asc",
-            limit=limit,
-            ignore_permissions=True,
+    rows = frappe.get_all(
+        "AI CSS Chat Message",
+        filters=filters,
+        fields=["name", "role", "content", "confidence", "sources_json", "creation"],
+        order_by="creation asc",
+        limit=limit,
+        ignore_permissions=True,
+    )
+    messages = []
+    for row in rows:
+        try:
+            sources = json.loads(row.get("sources_json") or "[]")
+        except Exception:
+            sources = []
+        messages.append(
+            {
+                "id": row.get("name"),
+                "role": row.get("role"),
+                "content": row.get("content"),
+                "confidence": row.get("confidence"),
+                "sources": sources,
+                "created_at": row.get("creation"),
+            }
         )
-        messages = []
-        for row in rows:
-            try:
-                sources = json.loads(row.get("sources_json") or "[]")
-            except Exception:
-                sources = []
-            messages.append(
-                {
-                    "id": row.get("name"),
-                    "role": row.get("role"),
-                    "content": row.get("content"),
-                    "confidence": row.get("confidence"),
-                    "sources": sources,
-                    "created_at": row.get("creation"),
-                }
-            )
-        return {"session_id": session_id, "messages": messages}
-    finally:
-        frappe.flags.ignore_permissions = previous_ignore
-        frappe.set_user(previous_user)
+    return messages
 
 
 @frappe.whitelist(allow_guest=True)
@@ -1972,32 +2527,28 @@ def create_ticket(
     customer_email: str | None = None,
     customer_phone: str | None = None,
 ):
-    previous_ignore = getattr(frappe.flags, "ignore_permissions", False)
-    previous_user = frappe.session.user or "Guest"
-    frappe.flags.ignore_permissions = True
-    frappe.set_user("Administrator")
-    try:
+    _check_rate_limit("send", session_id)
+    with _privileged_writes():
         if not session_id:
             frappe.throw(_("session_id is required"))
         name, email, phone = _normalize_contact(customer_name, customer_email, customer_phone)
-        session_doc = _get_session_doc(session_id)
+        session_doc = _get_session_doc(session_id, restore=True)
         if not session_doc:
             frappe.throw(_("session not found"))
 
-        allow_todo = os.getenv("ESCALATION_FALLBACK", "").lower() == "todo"
-        if frappe.db.exists("DocType", "HD Ticket"):
-            doctype = "HD Ticket"
-        elif allow_todo:
-            doctype = "ToDo"
-        else:
+        doctype = _ticket_doctype()
+        if not doctype:
             frappe.throw(_("Ticketing is not enabled. Ensure Helpdesk is running."))
 
-        history = _fetch_history(session_doc.name, limit=20)
+        # Summary reads only; the ticket write below runs on the primary.
+        with _replica_reads():
+            history = _fetch_history(session_doc.name, limit=20)
+            message_id, subject_text = _last_user_message(session_doc.name)
+            last_entry = _last_assistant_entry(session_doc.name)
         if not name:
             name = _extract_name_from_history(history)
-        subject_text = _last_user_message(session_doc.name) or "Support request"
+        subject_text = subject_text or "Support request"
         ticket_subject = _build_ticket_subject(subject_text)
-        last_entry = _last_assistant_entry(session_doc.name)
         sources = last_entry.get("sources") or []
         confidence = last_entry.get("confidence")
         top_score = _top_score_from_sources(sources)
@@ -2012,58 +2563,152 @@ def create_ticket(
             "customer_phone": phone,
         }
 
-        ticket_type, ticket_id = _create_ticket(
-            doctype, ticket_subject, history, sources, subject_text, metadata=metadata
-        )
+        ticket_ref = None
+        if _get_env_bool("CHAT_ASYNC_TICKETS", False):
+            ticket_type = doctype
+            ticket_ref, ticket_id = _enqueue_ticket(
+                doctype, ticket_subject, history, sources, subject_text, metadata, message_id=message_id
+            )
+        else:
+            ticket_type, ticket_id = _create_ticket(
+                doctype, ticket_subject, history, sources, subject_text, metadata=metadata
+            )
         _update_session_state(session_doc, low_conf_count=0, last_escalation_offered=False)
 
         return {
             "ticket_id": ticket_id,
             "ticket_type": ticket_type,
+            "ticket_ref": ticket_ref,
+            "pending": ticket_id is None,
             "customer_name": name,
             "customer_email": email,
             "customer_phone": phone,
         }
-    finally:
-        frappe.flags.ignore_permissions = previous_ignore
-        frappe.set_user(previous_user)
 
 
 @frappe.whitelist(allow_guest=True)
 def get_ticket_status(ticket_id: str | None = None, include_description: str | None = None):
-    previous_ignore = getattr(frappe.flags, "ignore_permissions", False)
-    previous_user = frappe.session.user or "Guest"
-    frappe.flags.ignore_permissions = True
-    frappe.set_user("Administrator")
-    try:
+    _check_rate_limit("poll")
+    with _privileged_writes():
+        ticket_id = str(ticket_id or "").strip()
         if not ticket_id:
             frappe.throw(_("ticket_id is required"))
-
-        allow_todo = os.getenv("ESCALATION_FALLBACK", "").lower() == "todo"
-        if frappe.db.exists("HD Ticket", ticket_id):
-            doctype = "HD Ticket"
-        elif allow_todo and frappe.db.exists("ToDo", ticket_id):
-            doctype = "ToDo"
-        else:
+        found = _load_ticket_statuses([ticket_id]).get(ticket_id)
+        if found is None:
             frappe.throw(_("ticket not found"))
+        doctype, data = found
+        response = _ticket_status_response(ticket_id, doctype, data)
+        if _is_truthy(include_description):
+            response["description"] = frappe.db.get_value(doctype, ticket_id, "description")
+        return None if _not_modified(response) else response
 
-        fields = ["subject", "status", "creation"]
-        if include_description and include_description.lower() in ("1", "true", "yes"):
-            fields.append("description")
-        data = frappe.db.get_value(doctype, ticket_id, fields, as_dict=True) or {}
-        subject = data.get("subject") or ""
-        if doctype == "ToDo":
-            subject = subject or "ToDo"
 
+@frappe.whitelist(allow_guest=True)
+def get_ticket_statuses(ticket_ids: str | list[str] | None = None):
+    _check_rate_limit("poll")
+    with _privileged_writes():
+        if isinstance(ticket_ids, str):
+            ticket_ids = json.loads(ticket_ids) if ticket_ids.strip().startswith("[") else ticket_ids.split(",")
+        ticket_ids = list(dict.fromkeys(str(t).strip() for t in ticket_ids or [] if str(t).strip()))
+        if not ticket_ids:
+            frappe.throw(_("ticket_ids is required"))
+        # Guests get a smaller batch so the endpoint is not a cheap way to walk sequential ticket ids.
+        if frappe.session.user == "Guest":
+            max_ids = _get_env_int("CHAT_TICKET_STATUS_GUEST_BATCH_MAX", 10)
+        else:
+            max_ids = _get_env_int("CHAT_TICKET_STATUS_BATCH_MAX", 50)
+        if len(ticket_ids) > max_ids:
+            frappe.throw(_("At most {0} ticket_ids per request").format(max_ids))
+
+        found = _load_ticket_statuses(ticket_ids)
         response = {
-            "ticket_id": ticket_id,
-            "subject": subject,
-            "status": data.get("status"),
-            "created_at": data.get("creation"),
+            "tickets": [
+                _ticket_status_response(ticket_id, *found[ticket_id])
+                for ticket_id in ticket_ids
+                if ticket_id in found
+            ],
+            "missing": [ticket_id for ticket_id in ticket_ids if ticket_id not in found],
         }
-        if "description" in data:
-            response["description"] = data.get("description")
-        return response
-    finally:
-        frappe.flags.ignore_permissions = previous_ignore
-        frappe.set_user(previous_user)
+        return None if _not_modified(response) else response
+
+
+def _is_truthy(value: str | None) -> bool:
+    return bool(value) and str(value).lower() in ("1", "true", "yes")
+
+
+def _query_ticket_statuses(ticket_ids: list[str]) -> dict[str, tuple[str, dict[str, Any]]]:
+    allow_todo = os.getenv("ESCALATION_FALLBACK", "").lower() == "todo"
+    found: dict[str, tuple[str, dict[str, Any]]] = {}
+    for doctype in ("HD Ticket", "ToDo") if allow_todo else ("HD Ticket",):
+        pending = [ticket_id for ticket_id in ticket_ids if ticket_id not in found]
+        if frappe.get_meta(doctype).autoname == "autoincrement":
+            # Integer primary key: a non-numeric id would make Postgres reject the whole IN list.
+            pending = [ticket_id for ticket_id in pending if ticket_id.isdigit()]
+        if not pending:
+            continue
+        rows = frappe.get_all(
+            doctype,
+            filters={"name": ("in", pending)},
+            fields=["name", *_TICKET_STATUS_FIELDS[doctype]],
+            ignore_permissions=True,
+        )
+        for row in rows:
+            found[str(row.pop("name"))] = (doctype, row)
+    return found
+
+
+def _load_ticket_statuses(ticket_ids: list[str]) -> dict[str, tuple[str, dict[str, Any]]]:
+    # Short-TTL cache in front of one IN query per doctype; HD Ticket/ToDo hooks invalidate on change.
+    cache = frappe.cache()
+    ttl = _get_env_int("CHAT_TICKET_STATUS_TTL", 30)
+    found: dict[str, tuple[str, dict[str, Any]]] = {}
+    if ttl > 0:
+        for ticket_id in ticket_ids:
+            cached = cache.get_value(_ticket_status_key(ticket_id))
+            if cached:
+                found[ticket_id] = tuple(cached)
+    misses = [ticket_id for ticket_id in ticket_ids if ticket_id not in found]
+    if found:
+        _incr_metric("ticket_status_cache_hit", len(found))
+    if not misses:
+        return found
+
+    _incr_metric("ticket_status_cache_miss", len(misses))
+    with _replica_reads() as on_replica:
+        loaded = _query_ticket_statuses(misses)
+    remaining = [ticket_id for ticket_id in misses if ticket_id not in loaded]
+    if remaining and on_replica:
+        # Tickets created moments ago may not have reached the replica yet.
+        _incr_metric("replica_fallback_missing")
+        loaded.update(_query_ticket_statuses(remaining))
+    if ttl > 0:
+        for ticket_id, entry in loaded.items():
+            cache.set_value(_ticket_status_key(ticket_id), list(entry), expires_in_sec=ttl)
+    found.update(loaded)
+    return found
+
+
+def _ticket_status_response(ticket_id: str, doctype: str, data: dict[str, Any]) -> dict[str, Any]:
+    return {
+        "ticket_id": ticket_id,
+        "subject": data.get("subject") or ("ToDo" if doctype == "ToDo" else ""),
+        "status": data.get("status"),
+        "created_at": data.get("creation"),
+    }
+
+
+def _not_modified(payload: dict[str, Any]) -> bool:
+    # Sets a weak ETag for the payload; True when If-None-Match already has it (the reply becomes a bodiless 304).
+    headers = getattr(frappe.local, "response_headers", None)
+    if headers is None:
+        return False
+    digest = hashlib.sha1(json.dumps(payload, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:24]
+    etag = f'W/"{digest}"'
+    headers["ETag"] = etag
+    headers["Cache-Control"] = "private, no-cache"
+    client_tags = {tag.strip() for tag in (frappe.get_request_header("If-None-Match") or "").split(",")}
+    if etag not in client_tags and "*" not in client_tags:
+        return False
+    frappe.local.response.http_status_code = 304
+    _incr_metric("ticket_status_not_modified")
+    return True
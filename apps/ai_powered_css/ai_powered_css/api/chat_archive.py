@@ -0,0 +1,199 @@
+from __future__ import annotations
+
+import base64
+import json
+import zlib
+from typing import Any
+
+import frappe
+from frappe.utils import add_days, add_months, get_first_day, now_datetime
+
+from ai_powered_css.api.chat import RESOLUTION_ANSWERED, _get_env_int, _incr_metric
+
+_MESSAGE_TABLE = "tabAI CSS Chat Message"
+_MESSAGE_FIELDS = ["name", "role", "content", "confidence", "sources_json", "creation", "modified", "owner", "modified_by"]
+_SESSION_FIELDS = [
+    "name",
+    "session_id",
+    "language",
+    "preferred_lang",
+    "issue_category",
+    "issue_subtype",
+    "low_conf_count",
+    "clarification_count",
+    "last_resolution_state",
+    "last_escalation_offered",
+    "creation",
+    "modified",
+    "owner",
+    "modified_by",
+]
+
+
+def _is_partitioned() -> bool:
+    if frappe.db.db_type != "postgres":
+        return False
+    return bool(
+        frappe.db.sql(
+            """
+            select 1 from pg_partitioned_table pt
+            join pg_class c on c.oid = pt.partrelid
+            where c.relname = %s
+            """,
+            (_MESSAGE_TABLE,),
+        )
+    )
+
+
+def _partition_name(month_start) -> str:
+    return f"{_MESSAGE_TABLE}_p{month_start:%Y_%m}"
+
+
+def _create_month_partition(month_start) -> bool:
+    name = _partition_name(month_start)
+    if frappe.db.sql("select 1 from pg_class where relname = %s", (name,)):
+        return False
+    lower = f"{month_start:%Y-%m-%d}"
+    upper = f"{add_months(month_start, 1):%Y-%m-%d}"
+    # Rows already routed to the default partition for this month would violate the new bound; leave them there.
+    if frappe.db.sql(
+        f'select 1 from "{_MESSAGE_TABLE}_default" where creation >= %s and creation < %s limit 1', (lower, upper)
+    ):
+        frappe.logger("ai_powered_css").warning("Chat message partition %s skipped: rows in default partition", name)
+        return False
+    frappe.db.sql(f'create table "{name}" partition of "{_MESSAGE_TABLE}" for values from (\'{lower}\') to (\'{upper}\')')
+    return True
+
+
+def ensure_message_partitions(first_month=None) -> list[str]:
+    """Create monthly chat message partitions up to CHAT_MESSAGE_PARTITIONS_AHEAD months ahead (daily job)."""
+    if not _is_partitioned():
+        return []
+    month = get_first_day(first_month or now_datetime())
+    last = add_months(get_first_day(now_datetime()), max(_get_env_int("CHAT_MESSAGE_PARTITIONS_AHEAD", 2), 0))
+    created = []
+    while month <= last:
+        if _create_month_partition(month):
+            created.append(_partition_name(month))
+        month = add_months(month, 1)
+    return created
+
+
+def _pack(records: list[dict[str, Any]]) -> str:
+    jsonl = "\n".join(json.dumps(record, ensure_ascii=False, default=str) for record in records)
+    return base64.b64encode(zlib.compress(jsonl.encode("utf-8"), 9)).decode("ascii")
+
+
+def _unpack(payload: str) -> list[dict[str, Any]]:
+    jsonl = zlib.decompress(base64.b64decode(payload)).decode("utf-8")
+    return [json.loads(line) for line in jsonl.splitlines() if line]
+
+
+def _archive_session(session_name: str) -> int:
+    session = frappe.db.get_value("AI CSS Chat Session", session_name, _SESSION_FIELDS, as_dict=True)
+    if not session:
+        return 0
+    messages = frappe.get_all(
+        "AI CSS Chat Message",
+        filters={"session": session_name},
+        fields=_MESSAGE_FIELDS,
+        order_by="creation asc",
+        ignore_permissions=True,
+    )
+    last_activity = messages[-1]["creation"] if messages else session["modified"]
+    frappe.get_doc(
+        {
+            "doctype": "AI CSS Chat Archive",
+            "session_id": session["session_id"],
+            "last_activity": last_activity,
+            "message_count": len(messages),
+            # First record is the session row, the rest are its messages in order.
+            "payload": _pack([session, *messages]),
+        }
+    ).insert(ignore_permissions=True)
+    frappe.db.delete("AI CSS Chat Message", {"session": session_name})
+    frappe.db.delete("AI CSS Chat Session", {"name": session_name})
+    return len(messages)
+
+
+def archive_idle_sessions() -> dict[str, int]:
+    """Move answered sessions idle for CHAT_ARCHIVE_AFTER_DAYS into AI CSS Chat Archive (daily job).
+
+    Sessions still waiting on a clarification or an escalation are kept live for CHAT_ARCHIVE_OPEN_AFTER_DAYS
+    (0 keeps them indefinitely).
+    """
+    days = _get_env_int("CHAT_ARCHIVE_AFTER_DAYS", 90)
+    if days <= 0:
+        return {"sessions": 0, "messages": 0}
+    open_days = _get_env_int("CHAT_ARCHIVE_OPEN_AFTER_DAYS", 365)
+    params = {
+        "answered": RESOLUTION_ANSWERED,
+        "cutoff": add_days(now_datetime(), -days),
+        "open_cutoff": add_days(now_datetime(), -max(open_days, days)),
+        "batch": max(_get_env_int("CHAT_ARCHIVE_BATCH", 200), 1),
+    }
+    if open_days > 0:
+        threshold = "case when s.last_resolution_state = %(answered)s then %(cutoff)s else %(open_cutoff)s end"
+        state_filter = ""
+    else:
+        threshold = "%(cutoff)s"
+        state_filter = "and s.last_resolution_state = %(answered)s"
+    # A session is idle once neither it nor any of its messages changed since its state's cutoff.
+    names = frappe.db.sql_list(
+        f"""
+        select s.name from `tabAI CSS Chat Session` s
+        where s.modified < {threshold}
+          {state_filter}
+          and not exists (
+            select 1 from `tabAI CSS Chat Message` m
+            where m.session = s.name and m.creation >= {threshold}
+          )
+        order by s.modified
+        limit %(batch)s
+        """,
+        params,
+    )
+    sessions = archived_messages = 0
+    for name in names:
+        try:
+            archived_messages += _archive_session(name)
+            frappe.db.commit()
+            sessions += 1
+        except Exception:
+            frappe.db.rollback()
+            frappe.log_error(title="AI CSS chat archive failed", message=frappe.get_traceback())
+    if sessions:
+        _incr_metric("archived_sessions", sessions)
+        _incr_metric("archived_messages", archived_messages)
+    return {"sessions": sessions, "messages": archived_messages}
+
+
+def restore_archived_session(session_id: str) -> str | None:
+    # Re-hydrates the original session and message rows (names and timestamps preserved); returns the session name.
+    archive = frappe.db.get_value("AI CSS Chat Archive", {"session_id": session_id}, ["name", "payload"], as_dict=True)
+    if not archive:
+        return None
+    session, *messages = _unpack(archive.payload)
+    frappe.get_doc({"doctype": "AI CSS Chat Session", **session}).db_insert()
+    if messages:
+        fields = [*_MESSAGE_FIELDS, "session"]
+        frappe.db.bulk_insert(
+            "AI CSS Chat Message",
+            fields,
+            [[message.get(field) for field in _MESSAGE_FIELDS] + [session["name"]] for message in messages],
+        )
+    frappe.db.delete("AI CSS Chat Archive", {"name": archive.name})
+    _incr_metric("restored_sessions")
+    return session["name"]
+
+
+@frappe.whitelist()
+def restore_chat_session(session_id: str | None = None) -> dict[str, Any]:
+    """Restore an archived chat session and its messages (System Manager only)."""
+    frappe.only_for("System Manager")
+    if not session_id:
+        frappe.throw(frappe._("session_id is required"))
+    if frappe.db.exists("AI CSS Chat Session", {"session_id": session_id}):
+        return {"session_id": session_id, "restored": False, "active": True}
+    session_name = restore_archived_session(session_id)
+    return {"session_id": session_id, "restored": bool(session_name), "active": bool(session_name)}
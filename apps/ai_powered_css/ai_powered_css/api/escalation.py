@@ -35,6 +35,23 @@ def _normalize(text: str) -> list[str]:
     return [tok for tok in cleaned.split() if tok]
 
 
+def _is_greeting_tokens(tokens: list[str]) -> bool:
+    if not tokens:
+        return True
+    if len(tokens) <= 2:
+        joined = "".join(tokens)
+        if joined in _EN_GREETINGS or joined in _HI_GREETINGS:
+            return True
+    non_greeting = [tok for tok in tokens if tok not in _EN_GREETINGS and tok not in _HI_GREETINGS]
+    if len(tokens) > 2 and non_greeting:
+        # Avoid treating longer, meaningful queries that include a greeting word as pure greetings.
+        return False
+    for tok in tokens:
+        if tok in _EN_GREETINGS or tok in _HI_GREETINGS:
+            return True
+    return False
+
+
 class EscalationPolicy:
     def __init__(self, conf_threshold: float, very_low_threshold: float = 0.2, min_len: int = 6):
         self.conf_threshold = conf_threshold
@@ -42,21 +59,7 @@ class EscalationPolicy:
         self.min_len = min_len
 
     def is_greeting(self, message: str) -> bool:
-        tokens = _normalize(message)
-        if not tokens:
-            return True
-        if len(tokens) <= 2:
-            joined = "".join(tokens)
-            if joined in _EN_GREETINGS or joined in _HI_GREETINGS:
-                return True
-        non_greeting = [tok for tok in tokens if tok not in _EN_GREETINGS and tok not in _HI_GREETINGS]
-        if len(tokens) > 2 and non_greeting:
-            # Avoid treating longer, meaningful queries that include a greeting word as pure greetings.
-            return False
-        for tok in tokens:
-            if tok in _EN_GREETINGS or tok in _HI_GREETINGS:
-                return True
-        return False
+        return _is_greeting_tokens(_normalize(message))
 
     def is_too_short(self, message: str) -> bool:
         return len(message.strip()) < self.min_len
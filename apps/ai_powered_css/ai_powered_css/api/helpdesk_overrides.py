@@ -1,5 +1,4 @@
 import frappe
-from frappe.utils.caching import redis_cache
 from pypika import Criterion
 
 from helpdesk.api.doc import get_visible_custom_fields
@@ -9,6 +8,14 @@ from helpdesk.helpdesk.doctype.hd_form_script.hd_form_script import (
 from helpdesk.helpdesk.doctype.hd_ticket import api as hd_ticket_api
 from helpdesk.utils import agent_only, check_permissions
 
+from ai_powered_css.api import ticket_search
+
+
+# Agent UI metadata (filterable fields, ticket customizations, form scripts) is cached under a version
+# number; any change to the source doctypes bumps it after commit, so stale keys are simply never read again.
+_UI_CACHE_VERSION_KEY = "ai_css_helpdesk_ui_version"
+_UI_CACHE_TTL = 24 * 60 * 60
+
 
 def _is_postgres() -> bool:
     return frappe.db.db_type == "postgres"
@@ -20,13 +27,51 @@ def _bool_literal(value: bool) -> int | bool:
     return int(bool(value)) if _is_postgres() else value
 
 
+def _ui_cache_version() -> int:
+    cache = frappe.cache()
+    return int(cache.get(cache.make_key(_UI_CACHE_VERSION_KEY)) or 0)
+
+
+def _ui_cached(kind: str, parts: tuple, loader):
+    cache = frappe.cache()
+    key = f"ai_css_helpdesk_ui:{_ui_cache_version()}:{kind}:" + ":".join(str(part) for part in parts)
+    # Wrapped so that a legitimately empty result (no form scripts) is cached too.
+    entry = cache.get_value(key)
+    if entry is None:
+        entry = {"value": loader()}
+        cache.set_value(key, entry, expires_in_sec=_UI_CACHE_TTL)
+    return entry["value"]
+
+
+def _bump_ui_cache_version() -> None:
+    cache = frappe.cache()
+    cache.incr(cache.make_key(_UI_CACHE_VERSION_KEY))
+
+
+def clear_helpdesk_ui_cache(doc=None, method=None) -> None:
+    """Hook target (form scripts, ticket templates, custom fields, HD Settings, migrate) for the UI caches."""
+    # After commit: a reader between the hook and the commit would otherwise cache the old rows under the new version.
+    if doc is not None:
+        frappe.db.after_commit.add(_bump_ui_cache_version)
+    else:
+        _bump_ui_cache_version()
+
+
 @frappe.whitelist()
-@redis_cache()
 def get_filterable_fields(
     doctype: str, show_customer_portal_fields: bool = False, ignore_team_restrictions: bool = False
 ):
     """Postgres-safe wrapper for Helpdesk filterable fields query."""
     check_permissions(doctype, None)
+    restrict_by_team = frappe.get_cached_value("HD Settings", "HD Settings", "restrict_tickets_by_agent_group")
+    return _ui_cached(
+        "filterable_fields",
+        (doctype, bool(show_customer_portal_fields), bool(ignore_team_restrictions), bool(restrict_by_team)),
+        lambda: _load_filterable_fields(doctype, show_customer_portal_fields, ignore_team_restrictions),
+    )
+
+
+def _load_filterable_fields(doctype: str, show_customer_portal_fields: bool, ignore_team_restrictions: bool):
     QBDocField = frappe.qb.DocType("DocField")
     QBCustomField = frappe.qb.DocType("Custom Field")
     allowed_fieldtypes = [
@@ -141,6 +186,14 @@ def get_form_script(
     apply_on_new_page: bool = False,
 ):
     """Postgres-safe wrapper for Helpdesk form scripts query."""
+    return _ui_cached(
+        "form_script",
+        (dt, apply_to, bool(is_customer_portal), bool(apply_on_new_page)),
+        lambda: _load_form_script(dt, apply_to, is_customer_portal, apply_on_new_page),
+    )
+
+
+def _load_form_script(dt: str, apply_to: str, is_customer_portal: bool, apply_on_new_page: bool):
     if not _is_postgres():
         return _core_get_form_script(
             dt,
@@ -170,6 +223,10 @@ def get_form_script(
 @agent_only
 def get_ticket_customizations():
     """Postgres-safe ticket customization fetch for the Helpdesk UI."""
+    return _ui_cached("ticket_customizations", ("HD Ticket", "Default"), _load_ticket_customizations)
+
+
+def _load_ticket_customizations():
     custom_fields = frappe.get_all(
         "HD Ticket Template Field",
         filters={"parent": "Default"},
@@ -180,15 +237,31 @@ def get_ticket_customizations():
     return {"custom_fields": custom_fields, "_form_script": form_scripts}
 
 
+def _similar_tickets_postgres(ticket: str) -> list[dict]:
+    # Ranked full-text match on the generated tsvector column (see patches/v1_0/add_ticket_search_vector.py).
+    if not frappe.db.has_column("HD Ticket", ticket_search.SEARCH_COLUMN):
+        return []
+    subject = frappe.db.get_value("HD Ticket", ticket, "subject")
+    if not subject:
+        return []
+    terms = frappe.db.sql_list(
+        ticket_search.SUBJECT_TERMS_SQL, {"subject": subject, "max_terms": ticket_search.MAX_TERMS}
+    )
+    window_days = frappe.utils.cint(frappe.conf.get("similar_tickets_window_days") or 365)
+    return ticket_search.find_similar(
+        lambda sql, params: frappe.db.sql(sql, params, as_dict=True), terms, ticket, window_days
+    )
+
+
 @frappe.whitelist()
 def get_recent_similar_tickets(ticket: str):
-    """Avoid MySQL fulltext SQL on Postgres; return recent-only matches."""
+    """Postgres: ranked tsvector search instead of the MySQL FULLTEXT query."""
     if _is_postgres():
         if not frappe.db.exists("HD Ticket", ticket):
             return {"recent_tickets": [], "similar_tickets": []}
         return {
             "recent_tickets": hd_ticket_api.get_recent_tickets(ticket),
-            "similar_tickets": [],
+            "similar_tickets": _similar_tickets_postgres(ticket),
         }
     return {
         "recent_tickets": hd_ticket_api.get_recent_tickets(ticket),
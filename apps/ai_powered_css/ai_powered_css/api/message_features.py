@@ -0,0 +1,386 @@
+from __future__ import annotations
+
+import re
+from functools import cached_property, lru_cache
+
+from ai_powered_css.api.escalation import _is_greeting_tokens, _normalize
+
+_ROMAN_HI_FUNCTION_WORDS = {
+    "mujhe",
+    "muje",
+    "mera",
+    "meri",
+    "mere",
+    "tum",
+    "aap",
+    "kya",
+    "kaise",
+    "kyu",
+    "kyon",
+    "nahi",
+    "haan",
+    "haanji",
+    "bhai",
+    "kripya",
+    "kripa",
+    "ke",
+    "ki",
+    "ka",
+    "ko",
+    "se",
+    "par",
+    "mein",
+    "liye",
+    "madad",
+    "chahiye",
+    "sahiye",
+    "bana",
+    "do",
+    "hai",
+    "tha",
+    "thi",
+}
+
+_ENGLISH_HINT_WORDS = {
+    "refund",
+    "refunds",
+    "payment",
+    "payments",
+    "booking",
+    "ticket",
+    "status",
+    "issue",
+    "problem",
+    "help",
+    "confirmation",
+    "confirm",
+    "cancel",
+    "cancellation",
+    "show",
+    "movie",
+    "event",
+    "balance",
+    "account",
+    "amount",
+    "discount",
+    "price",
+}
+
+_SUPPORT_REQUEST_WORDS = {
+    "ticket",
+    "agent",
+    "support",
+    "helpdesk",
+    "human",
+    "call",
+    "representative",
+    "टिकट",
+    "एजेंट",
+    "सपोर्ट",
+    "मदद",
+    "कॉल",
+}
+
+_REFUND_WORDS = {
+    "refund",
+    "refunds",
+    "रिफंड",
+    "रिफन्ड",
+    "वापसी",
+    "paisa",
+    "paise",
+}
+
+_PAYMENT_WORDS = {
+    "payment",
+    "payments",
+    "pay",
+    "paid",
+    "paisa",
+    "paise",
+    "upi",
+    "card",
+    "debit",
+    "credit",
+    "netbanking",
+    "wallet",
+    "gpay",
+    "phonepe",
+    "paytm",
+    "bank",
+    "भुगतान",
+    "पेमेंट",
+    "कार्ड",
+    "यूपीआई",
+}
+
+_BOOKING_WORDS = {
+    "booking",
+    "बुकिंग",
+    "ticket",
+    "टिकट",
+    "show",
+}
+
+_DOMAIN_WORDS = set().union(
+    _REFUND_WORDS,
+    _PAYMENT_WORDS,
+    _BOOKING_WORDS,
+    _ENGLISH_HINT_WORDS,
+    {
+        "transaction",
+        "deducted",
+        "blocked",
+        "block",
+        "seat",
+        "seats",
+        "order",
+        "orders",
+    },
+)
+
+_CLOSING_PATTERNS_EN = (
+    r"\bthank you\b",
+    r"\bthanks\b",
+    r"\bthx\b",
+    r"\bappreciate\b",
+    r"\bthat helps\b",
+    r"\bthis helps\b",
+    r"\bissue resolved\b",
+    r"\bresolved\b",
+    r"\bsolved\b",
+    r"\ball good\b",
+    r"\bno further help\b",
+)
+_CLOSING_PATTERNS_HI = (
+    r"धन्यवाद",
+    r"थैंक यू",
+    r"हो गया",
+    r"समाधान हो गया",
+    r"मदद मिली",
+    r"सब ठीक",
+    r"ठीक है धन्यवाद",
+)
+_CLOSING_NEGATIVE_PATTERNS = (
+    r"\bbut\b",
+    r"\bstill\b",
+    r"\bnot\b",
+    r"\bneed help\b",
+    r"\bhelp me\b",
+    r"\bissue\b",
+    r"\bproblem\b",
+    r"\bpending\b",
+    r"नहीं",
+    r"लेकिन",
+    r"पर",
+    r"समस्या",
+    r"मदद चाहिए",
+)
+
+_ISSUE_PATTERNS = [
+    {"amount", "deducted"},
+    {"amount", "confirmation"},
+    {"deducted", "confirmation"},
+    {"refund", "received"},
+    {"refund", "pending"},
+    {"show", "cancelled"},
+    {"show", "canceled"},
+    {"wrong", "amount"},
+    {"discount", "applied"},
+    {"discount", "not"},
+    {"confirmation", "not"},
+    {"payment", "failed"},
+    {"transaction", "failed"},
+    {"payment", "declined"},
+    {"पैसे", "कट"},
+    {"रिफंड", "नहीं"},
+    {"शो", "कैंसिल"},
+    {"गलत", "अमाउंट"},
+    {"डिस्काउंट", "नहीं"},
+    {"कन्फर्मेशन", "नहीं"},
+    {"पैसा", "कटा"},
+    {"paisa", "kata"},
+    {"paisa", "cut"},
+    {"refund", "nahi"},
+    {"confirmation", "nahi"},
+    {"show", "cancel"},
+    {"amount", "wrong"},
+]
+
+_FOLLOWUP_WORDS = {
+    "timeline",
+    "time",
+    "status",
+    "when",
+    "how",
+    "howlong",
+    "where",
+    "track",
+    "update",
+    "day",
+    "days",
+    "week",
+    "weeks",
+    "month",
+    "months",
+    "late",
+    "delayed",
+    "delay",
+    "pending",
+    "since",
+    "kab",
+    "kabtak",
+    "kitna",
+    "kabtk",
+    "kabhi",
+    "कब",
+    "कबतक",
+    "स्थिति",
+    "टाइमलाइन",
+    "कहाँ",
+    "कैसे",
+    "कितना",
+}
+
+# One alternation per pattern group instead of a re.search per pattern.
+_CLOSING_EN_RE = re.compile("|".join(_CLOSING_PATTERNS_EN), re.IGNORECASE)
+_CLOSING_HI_RE = re.compile("|".join(_CLOSING_PATTERNS_HI), re.IGNORECASE)
+_CLOSING_NEGATIVE_RE = re.compile("|".join(_CLOSING_NEGATIVE_PATTERNS), re.IGNORECASE)
+_TOKEN_STRIP_RE = re.compile(r"[^\w\s]")
+
+_ROMAN_HI = 1 << 0
+_ENGLISH_HINT = 1 << 1
+_SUPPORT = 1 << 2
+_REFUND = 1 << 3
+_PAYMENT = 1 << 4
+_BOOKING = 1 << 5
+_DOMAIN = 1 << 6
+_FOLLOWUP = 1 << 7
+_ISSUE = 1 << 8
+
+
+def _build_lexicon() -> dict[str, int]:
+    lexicon: dict[str, int] = {}
+    groups = (
+        (_ROMAN_HI_FUNCTION_WORDS, _ROMAN_HI),
+        (_ENGLISH_HINT_WORDS, _ENGLISH_HINT),
+        (_SUPPORT_REQUEST_WORDS, _SUPPORT),
+        (_REFUND_WORDS, _REFUND),
+        (_PAYMENT_WORDS, _PAYMENT),
+        (_BOOKING_WORDS, _BOOKING),
+        (_DOMAIN_WORDS, _DOMAIN),
+        (_FOLLOWUP_WORDS, _FOLLOWUP),
+        (set().union(*_ISSUE_PATTERNS), _ISSUE),
+    )
+    for words, bit in groups:
+        for word in words:
+            lexicon[word] = lexicon.get(word, 0) | bit
+    return lexicon
+
+
+# Token -> bitmask of every word list it belongs to, so one lookup per token covers all lists.
+_LEXICON = _build_lexicon()
+
+
+def tokenize(text: str) -> list[str]:
+    return _TOKEN_STRIP_RE.sub(" ", text.lower()).split()
+
+
+class MessageFeatures:
+    """Tokenize a message once and derive the chat heuristics from that single pass."""
+
+    def __init__(self, text: str):
+        self.text = text
+        self.lowered = text.lower()
+        self.tokens = tokenize(self.lowered)
+        self.token_set = frozenset(self.tokens)
+        flags = 0
+        roman_hits = 0
+        english_hits = 0
+        for tok in self.tokens:
+            mask = _LEXICON.get(tok, 0)
+            if not mask:
+                continue
+            flags |= mask
+            if mask & _ROMAN_HI:
+                roman_hits += 1
+            if mask & _ENGLISH_HINT:
+                english_hits += 1
+        self.flags = flags
+        self.roman_hits = roman_hits
+        self.english_hits = english_hits
+
+    def has_any(self, words: set[str] | frozenset[str]) -> bool:
+        return not self.token_set.isdisjoint(words)
+
+    @cached_property
+    def is_ascii(self) -> bool:
+        return self.text.isascii()
+
+    @cached_property
+    def roman_hindi_decision(self) -> str:
+        # High-precision Roman Hindi detection to avoid false positives on English-only queries.
+        if not self.is_ascii or not self.tokens:
+            return "en"
+        if self.roman_hits >= 2 and self.roman_hits >= self.english_hits + 1:
+            return "hi"
+        if self.roman_hits >= 1 and self.english_hits <= 1:
+            return "ambiguous"
+        return "en"
+
+    @cached_property
+    def intent(self) -> str | None:
+        if self.flags & _REFUND:
+            return "refund"
+        if self.flags & _PAYMENT:
+            return "payment"
+        if self.flags & _BOOKING:
+            return "booking"
+        return None
+
+    @property
+    def explicit_support(self) -> bool:
+        return bool(self.flags & _SUPPORT)
+
+    @cached_property
+    def is_closing(self) -> bool:
+        cleaned = self.lowered.strip()
+        if not cleaned or self.explicit_support or "?" in self.text:
+            return False
+        if _CLOSING_NEGATIVE_RE.search(cleaned):
+            return False
+        return bool(_CLOSING_EN_RE.search(cleaned) or _CLOSING_HI_RE.search(self.text))
+
+    @cached_property
+    def matches_issue_pattern(self) -> bool:
+        if not self.flags & _ISSUE:
+            return False
+        return any(pattern <= self.token_set for pattern in _ISSUE_PATTERNS)
+
+    @cached_property
+    def is_off_topic(self) -> bool:
+        """Detect queries outside the support domain to avoid random KB answers."""
+        if self.intent or self.matches_issue_pattern or self.explicit_support:
+            return False
+        return not self.flags & _DOMAIN
+
+    @cached_property
+    def is_followup(self) -> bool:
+        if not self.token_set:
+            return False
+        if self.flags & _FOLLOWUP:
+            return True
+        if any(tok.isdigit() for tok in self.token_set):
+            return True
+        return len(self.token_set) <= 3
+
+    @cached_property
+    def is_greeting(self) -> bool:
+        # Greeting lists keep the Devanagari-aware normalization used by EscalationPolicy.
+        return _is_greeting_tokens(_normalize(self.text))
+
+
+@lru_cache(maxsize=256)
+def analyze(text: str) -> MessageFeatures:
+    # Every heuristic for a turn sees the same text, so repeat lookups reuse one analysis.
+    return MessageFeatures(text)
@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+from collections.abc import Callable
+from itertools import combinations
+from typing import Any
+
+# Postgres similar-ticket search. Kept free of Frappe so scripts/bench_similar_tickets.py runs the same SQL.
+
+SEARCH_COLUMN = "ai_css_search"
+SIMILAR_TICKETS_LIMIT = 5
+# Subject terms in the order they appear in the subject (not tsvector order, which is alphabetical).
+MAX_TERMS = 8
+# Matching drops at most this many subject terms when the full set finds too few tickets.
+MAX_MISSING_TERMS = 1
+
+SUBJECT_TERMS_SQL = """
+    select lexeme
+    from unnest(to_tsvector('english'::regconfig, %(subject)s))
+    order by positions[1]
+    limit %(max_terms)s
+"""
+
+SIMILAR_TICKETS_SQL = f"""
+    select t.name, t.subject, t.status, t.priority, t.creation, t.modified,
+           ts_rank_cd(t.{SEARCH_COLUMN}, q.query, 32) as score
+    from "tabHD Ticket" t, (select %(query)s::tsquery as query) q
+    where t.{SEARCH_COLUMN} @@ q.query
+      and t.name != %(ticket)s
+      and (%(window_days)s <= 0 or t.creation >= now() - make_interval(days => %(window_days)s))
+    order by score desc, t.modified desc
+    limit %(limit)s
+"""
+
+
+def _quote(lexeme: str) -> str:
+    return "'" + lexeme.replace("\\", "\\\\").replace("'", "''") + "'"
+
+
+def similar_tsqueries(terms: list[str], max_missing: int = MAX_MISSING_TERMS) -> list[str]:
+    """tsquery texts to try in order: every term, then every term but one, and so on until max_missing are dropped.
+
+    Each is an AND (or an OR of AND-groups), so the GIN scan only yields tickets sharing most of the subject
+    rather than every ticket containing one common word. Never relaxes below two terms.
+    """
+    queries: list[str] = []
+    if not terms:
+        return queries
+    for need in range(len(terms), max(len(terms) - max_missing, min(2, len(terms))) - 1, -1):
+        queries.append(" | ".join("(" + " & ".join(map(_quote, group)) + ")" for group in combinations(terms, need)))
+    return queries
+
+
+def find_similar(
+    fetch: Callable[[str, dict[str, Any]], list[dict[str, Any]]],
+    terms: list[str],
+    ticket: str,
+    window_days: int,
+    limit: int = SIMILAR_TICKETS_LIMIT,
+) -> list[dict[str, Any]]:
+    """Run SIMILAR_TICKETS_SQL through fetch, strictest query first, until limit tickets are found."""
+    found: list[dict[str, Any]] = []
+    for query in similar_tsqueries(terms):
+        seen = {row["name"] for row in found}
+        # A looser query ranks the stricter hits again, so ask for enough rows to get past them.
+        rows = fetch(
+            SIMILAR_TICKETS_SQL,
+            {"query": query, "ticket": ticket, "window_days": window_days, "limit": limit + len(found)},
+        )
+        found.extend(row for row in rows if row["name"] not in seen)
+        if len(found) >= limit:
+            break
+    return found[:limit]
@@ -1,5 +1,8 @@
 from frappe.model.document import Document
 
+from ai_powered_css.chat.doctype.ai_css_session_event.ai_css_session_event import record_session_audit
+
 
 class AICSSChatSession(Document):
-    pass
+    def on_update(self):
+        record_session_audit(self)
@@ -0,0 +1,71 @@
+import hashlib
+import json
+import os
+
+import frappe
+from frappe.model.document import Document
+
+_AUDITED_FIELDS = (
+    "language",
+    "preferred_lang",
+    "issue_category",
+    "issue_subtype",
+    "low_conf_count",
+    "clarification_count",
+    "last_resolution_state",
+    "last_escalation_offered",
+)
+
+
+class AICSSSessionEvent(Document):
+    pass
+
+
+def _audit_mode() -> str:
+    mode = (os.getenv("CHAT_AUDIT_MODE") or "off").strip().lower()
+    return mode if mode in ("off", "sampled", "compact") else "off"
+
+
+def _is_sampled(session_id: str) -> bool:
+    # Sample whole sessions (stable hash), so a sampled session has its complete version trail.
+    try:
+        rate = float(os.getenv("CHAT_AUDIT_SAMPLE_RATE") or 0.05)
+    except ValueError:
+        rate = 0.05
+    bucket = int(hashlib.sha1(session_id.encode("utf-8")).hexdigest()[:8], 16) / 0xFFFFFFFF
+    return bucket < rate
+
+
+def record_session_audit(session) -> None:
+    """Audit a chat session save according to CHAT_AUDIT_MODE (off | sampled | compact)."""
+    mode = _audit_mode()
+    if mode == "off":
+        return
+
+    before = session.get_doc_before_save()
+    if mode == "sampled":
+        if before is not None and _is_sampled(session.session_id):
+            version = frappe.new_doc("Version")
+            if version.update_version_info(before, session):
+                version.insert(ignore_permissions=True)
+        return
+
+    changes = {
+        field: session.get(field)
+        for field in _AUDITED_FIELDS
+        if before is None or before.get(field) != session.get(field)
+    }
+    if not changes:
+        return
+    # Append-only row written with a single INSERT (no validation/hooks); this runs on most chat turns.
+    event = frappe.get_doc(
+        {
+            "doctype": "AI CSS Session Event",
+            "name": frappe.generate_hash(length=12),
+            "session_id": session.session_id,
+            "from_state": before.get("last_resolution_state") if before is not None else None,
+            "to_state": session.get("last_resolution_state"),
+            "changes": json.dumps(changes, ensure_ascii=False, default=str),
+        }
+    )
+    event.db_insert()
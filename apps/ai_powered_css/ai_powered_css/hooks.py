@@ -13,3 +13,57 @@ override_whitelisted_methods = {
     "helpdesk.helpdesk.doctype.hd_ticket.api.get_ticket_customizations": "ai_powered_css.api.helpdesk_overrides.get_ticket_customizations",
     "helpdesk.helpdesk.doctype.hd_ticket.api.get_recent_similar_tickets": "ai_powered_css.api.helpdesk_overrides.get_recent_similar_tickets",
 }
+
+after_migrate = [
+    "ai_powered_css.api.chat.clear_ticket_capabilities",
+    "ai_powered_css.api.helpdesk_overrides.clear_helpdesk_ui_cache",
+]
+
+# Patches are marked done on install-app without running; the schema ones are idempotent, so run them here too.
+after_install = [
+    "ai_powered_css.patches.v1_0.partition_chat_messages.execute",
+    "ai_powered_css.patches.v1_0.add_ticket_search_vector.execute",
+]
+
+doc_events = {
+    "HD Ticket Priority": {
+        "after_insert": "ai_powered_css.api.chat.clear_ticket_capabilities",
+        "on_trash": "ai_powered_css.api.chat.clear_ticket_capabilities",
+    },
+    "HD Ticket": {
+        "on_update": "ai_powered_css.api.chat.clear_ticket_status",
+        "on_trash": "ai_powered_css.api.chat.clear_ticket_status",
+    },
+    "ToDo": {
+        "on_update": "ai_powered_css.api.chat.clear_ticket_status",
+        "on_trash": "ai_powered_css.api.chat.clear_ticket_status",
+    },
+    # Sources of the cached agent UI metadata in helpdesk_overrides.
+    "HD Form Script": {
+        "on_update": "ai_powered_css.api.helpdesk_overrides.clear_helpdesk_ui_cache",
+        "on_trash": "ai_powered_css.api.helpdesk_overrides.clear_helpdesk_ui_cache",
+    },
+    "HD Ticket Template": {
+        "on_update": "ai_powered_css.api.helpdesk_overrides.clear_helpdesk_ui_cache",
+        "on_trash": "ai_powered_css.api.helpdesk_overrides.clear_helpdesk_ui_cache",
+    },
+    "Custom Field": {
+        "on_update": "ai_powered_css.api.helpdesk_overrides.clear_helpdesk_ui_cache",
+        "on_trash": "ai_powered_css.api.helpdesk_overrides.clear_helpdesk_ui_cache",
+    },
+    "Property Setter": {
+        "on_update": "ai_powered_css.api.helpdesk_overrides.clear_helpdesk_ui_cache",
+        "on_trash": "ai_powered_css.api.helpdesk_overrides.clear_helpdesk_ui_cache",
+    },
+    "HD Settings": {
+        "on_update": "ai_powered_css.api.helpdesk_overrides.clear_helpdesk_ui_cache",
+        "on_trash": "ai_powered_css.api.helpdesk_overrides.clear_helpdesk_ui_cache",
+    },
+}
+
+scheduler_events = {
+    "daily": [
+        "ai_powered_css.api.chat_archive.ensure_message_partitions",
+        "ai_powered_css.api.chat_archive.archive_idle_sessions",
+    ],
+}
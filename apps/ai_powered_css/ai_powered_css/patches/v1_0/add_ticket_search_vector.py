@@ -0,0 +1,34 @@
+import frappe
+
+from ai_powered_css.api.ticket_search import SEARCH_COLUMN as _TICKET_SEARCH_COLUMN
+
+
+def execute():
+    # Postgres only: stored tsvector over subject (weight A) + description text (weight B), GIN-indexed.
+    if frappe.db.db_type != "postgres" or not frappe.db.table_exists("HD Ticket"):
+        return
+    if frappe.db.has_column("HD Ticket", _TICKET_SEARCH_COLUMN):
+        return
+    # A generated column keeps itself current on every insert/update; Frappe only writes meta fields, so
+    # document saves never touch it. Descriptions are HTML, so tags are stripped and the text capped.
+    frappe.db.sql(
+        f"""
+        alter table "tabHD Ticket" add column {_TICKET_SEARCH_COLUMN} tsvector
+        generated always as (
+            setweight(to_tsvector('english'::regconfig, coalesce(subject, '')), 'A')
+            || setweight(
+                to_tsvector(
+                    'english'::regconfig,
+                    left(regexp_replace(coalesce(description, ''), '<[^>]*>', ' ', 'g'), 20000)
+                ),
+                'B'
+            )
+        ) stored
+        """
+    )
+    frappe.db.sql(
+        f'create index if not exists "tabHD Ticket_{_TICKET_SEARCH_COLUMN}" '
+        f'on "tabHD Ticket" using gin ({_TICKET_SEARCH_COLUMN})'
+    )
+    frappe.db.commit()
+    frappe.clear_cache(doctype="HD Ticket")
@@ -0,0 +1,27 @@
+import frappe
+
+from ai_powered_css.api.chat_archive import _MESSAGE_TABLE, _is_partitioned, ensure_message_partitions
+
+
+def execute():
+    # Postgres only: rebuild the message table as RANGE(creation) with monthly partitions plus a default one.
+    if frappe.db.db_type != "postgres" or _is_partitioned():
+        return
+
+    legacy = f"{_MESSAGE_TABLE}_unpartitioned"
+    frappe.db.sql(f'alter table "{_MESSAGE_TABLE}" rename to "{legacy}"')
+    frappe.db.sql(f'update "{legacy}" set creation = coalesce(modified, now()) where creation is null')
+    frappe.db.sql(f'create table "{_MESSAGE_TABLE}" (like "{legacy}" including defaults) partition by range (creation)')
+    # The partition key has to be part of the primary key; names are random hashes so stay unique on their own.
+    frappe.db.sql(
+        f'alter table "{_MESSAGE_TABLE}" alter column creation set not null, '
+        f'add constraint "{_MESSAGE_TABLE}_part_pkey" primary key (name, creation)'
+    )
+    frappe.db.sql(f'create index "{_MESSAGE_TABLE}_session_creation" on "{_MESSAGE_TABLE}" (session, creation)')
+    frappe.db.sql(f'create table "{_MESSAGE_TABLE}_default" partition of "{_MESSAGE_TABLE}" default')
+
+    first = frappe.db.sql(f'select min(creation) from "{legacy}"')[0][0]
+    ensure_message_partitions(first_month=first)
+    frappe.db.sql(f'insert into "{_MESSAGE_TABLE}" select * from "{legacy}"')
+    frappe.db.sql(f'drop table "{legacy}"')
+    frappe.db.commit()
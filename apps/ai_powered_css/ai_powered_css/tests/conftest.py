@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# Only Frappe-free modules are tested here, imported straight from the app directory (no bench needed).
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
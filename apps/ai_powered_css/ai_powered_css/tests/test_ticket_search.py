@@ -0,0 +1,65 @@
+from ai_powered_css.api.ticket_search import SIMILAR_TICKETS_SQL, find_similar, similar_tsqueries
+
+
+def test_no_terms_no_query():
+    assert similar_tsqueries([]) == []
+
+
+def test_one_and_two_terms_are_never_relaxed():
+    assert similar_tsqueries(["refund"]) == ["('refund')"]
+    assert similar_tsqueries(["refund", "pend"]) == ["('refund' & 'pend')"]
+
+
+def test_all_terms_then_all_but_one():
+    assert similar_tsqueries(["book", "refund", "fail"]) == [
+        "('book' & 'refund' & 'fail')",
+        "('book' & 'refund') | ('book' & 'fail') | ('refund' & 'fail')",
+    ]
+    terms = [f"t{i}" for i in range(8)]
+    strict, relaxed = similar_tsqueries(terms)
+    assert strict.count("&") == 7
+    groups = relaxed.split(" | ")
+    assert len(groups) == 8 and all(group.count("&") == 6 for group in groups)
+
+
+def test_relaxing_further_stops_at_two_terms():
+    queries = similar_tsqueries(["a", "b", "c"], max_missing=5)
+    assert len(queries) == 2
+    assert queries[-1] == "('a' & 'b') | ('a' & 'c') | ('b' & 'c')"
+
+
+def test_lexemes_are_quoted():
+    assert similar_tsqueries(["o'neil", "c:\\x"]) == ["('o''neil' & 'c:\\\\x')"]
+
+
+def _fake_fetch(results):
+    calls = []
+
+    def fetch(sql, params):
+        calls.append(params)
+        assert sql == SIMILAR_TICKETS_SQL
+        return [{"name": name} for name in results[len(calls) - 1]][: params["limit"]]
+
+    return fetch, calls
+
+
+def test_find_similar_stops_once_the_strict_query_fills_the_list():
+    fetch, calls = _fake_fetch([["1", "2", "3", "4", "5"]])
+    rows = find_similar(fetch, ["book", "refund", "fail"], "9", 365)
+    assert [row["name"] for row in rows] == ["1", "2", "3", "4", "5"]
+    assert calls == [{"query": "('book' & 'refund' & 'fail')", "ticket": "9", "window_days": 365, "limit": 5}]
+
+
+def test_find_similar_tops_up_without_repeating_rows():
+    # The looser query ranks the strict hits again, among new ones.
+    fetch, calls = _fake_fetch([["1", "2"], ["1", "7", "2", "8", "9", "10", "11"]])
+    rows = find_similar(fetch, ["book", "refund", "fail"], "9", 0)
+    assert [row["name"] for row in rows] == ["1", "2", "7", "8", "9"]
+    assert [call["limit"] for call in calls] == [5, 7]
+
+
+def test_find_similar_returns_what_it_found_when_short():
+    fetch, calls = _fake_fetch([["1"]])
+    assert [row["name"] for row in find_similar(fetch, ["refund", "pend"], "9", 365)] == ["1"]
+    assert len(calls) == 1
+    assert find_similar(fetch, [], "9", 365) == []
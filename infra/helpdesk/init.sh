@@ -81,6 +81,23 @@ PY
 sed -i '/redis/d' "${BENCH_DIR}/Procfile" || true
 sed -i '/watch/d' "${BENCH_DIR}/Procfile" || true
 
+# Dedicated RQ queue for async chat RAG turns (CHAT_ASYNC_RAG=1).
+python - <<'PY'
+import json
+from pathlib import Path
+
+config_path = Path("/home/frappe/frappe-bench/sites/common_site_config.json")
+config = json.loads(config_path.read_text() or "{}")
+workers = config.setdefault("workers", {})
+if "ai_css_rag" not in workers:
+    workers["ai_css_rag"] = {"timeout": 300}
+    config_path.write_text(json.dumps(config, indent=1))
+    print("Registered ai_css_rag worker queue.")
+PY
+if ! grep -q "^worker_ai_css_rag:" "${BENCH_DIR}/Procfile"; then
+  echo "worker_ai_css_rag: bench worker --queue ai_css_rag 1>> logs/worker.log 2>> logs/worker.error.log" >> "${BENCH_DIR}/Procfile"
+fi
+
 if [ ! -d "${BENCH_DIR}/apps/telephony" ]; then
   bench_exec "bench get-app telephony"
 fi
@@ -239,6 +256,14 @@ bench_exec "bench --site ${SITE_NAME} migrate"
 bench_exec "bench --site ${SITE_NAME} set-config developer_mode 0"
 bench_exec "bench --site ${SITE_NAME} set-config mute_emails 1"
 bench_exec "bench --site ${SITE_NAME} set-config server_script_enabled 1"
+# Guest polling/status reads go to the replica when one is configured (see the compose `replica` profile).
+if [ -n "${DB_REPLICA_HOST:-}" ]; then
+  bench_exec "bench --site ${SITE_NAME} set-config replica_host ${DB_REPLICA_HOST}"
+  bench_exec "bench --site ${SITE_NAME} set-config replica_db_port ${DB_REPLICA_PORT:-5432}"
+  bench_exec "bench --site ${SITE_NAME} set-config read_from_replica 1"
+else
+  bench_exec "bench --site ${SITE_NAME} set-config read_from_replica 0"
+fi
 bench_exec "bench --site ${SITE_NAME} clear-cache"
 bench_exec "bench use ${SITE_NAME}"
 
@@ -0,0 +1,18 @@
+#!/bin/sh
+# Hot standby for local testing: clone the primary once with pg_basebackup (-R writes standby.signal), then follow it.
+set -eu
+
+PGDATA="${PGDATA:-/var/lib/postgresql/data}"
+PRIMARY_HOST="${PRIMARY_HOST:-postgres}"
+PRIMARY_PORT="${PRIMARY_PORT:-5432}"
+
+if [ ! -s "${PGDATA}/PG_VERSION" ]; then
+  until pg_isready -h "${PRIMARY_HOST}" -p "${PRIMARY_PORT}" -q; do
+    echo "Waiting for primary at ${PRIMARY_HOST}:${PRIMARY_PORT}..."
+    sleep 2
+  done
+  pg_basebackup -h "${PRIMARY_HOST}" -p "${PRIMARY_PORT}" -D "${PGDATA}" -X stream -R -P
+  chmod 0700 "${PGDATA}"
+fi
+
+exec postgres -D "${PGDATA}" -c hot_standby=on
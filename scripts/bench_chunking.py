@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""Legacy 800-word chunker vs the structure-aware token chunker (services/rag/app/chunking.py) on the KB.
+
+Reports chunk counts and sizes in embedding tokens for the articles as stored and for "FAQ pages" that
+concatenate --page-size articles (question line + answer) like the crawler's category pages. Retrieval is a
+lexical stand-in for the embedding search (TF-IDF over character 4-grams, so no API calls): each English
+article title is the query, and a hit is a top-k chunk that holds the first sentence of that article's
+answer. Prompt tokens are the tokens of the top-k chunks a query puts in the chat prompt.
+  python3 scripts/bench_chunking.py [--articles data/kb/articles] [--top-k 5] [--tokenizer auto]
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import re
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "services" / "rag"))
+
+from app.chunking import MAX_TOKENS, OVERLAP_TOKENS, chunk_text, get_tokenizer  # noqa: E402
+
+_TITLE_SUFFIX = re.compile(r"\s*:\s*BookMyShow Support Centre\s*$", re.IGNORECASE)
+_FIRST_SENTENCE = re.compile(r"^.+?(?:[.!?।](?=\s)|$)")
+
+
+def legacy_chunk_text(text: str, min_words: int = 500, max_words: int = 1000, target_words: int = 800, overlap: int = 80) -> list[str]:
+    # The word-window chunker this replaced, kept verbatim for comparison.
+    words = text.split()
+    if not words:
+        return []
+    if len(words) <= max_words:
+        return [" ".join(words).strip()]
+    chunks: list[str] = []
+    start = 0
+    while start < len(words):
+        end = min(start + target_words, len(words))
+        chunks.append(" ".join(words[start:end]).strip())
+        if end == len(words):
+            break
+        start = max(0, end - overlap)
+    if len(chunks) >= 2:
+        last_words = chunks[-1].split()
+        if len(last_words) < min_words:
+            merged = chunks[-2].split() + last_words
+            if len(merged) <= max_words:
+                chunks[-2] = " ".join(merged).strip()
+                chunks.pop()
+    return [c for c in chunks if c]
+
+
+def _squash(text: str) -> str:
+    return " ".join(text.split())
+
+
+def _grams(text: str) -> Counter:
+    text = _squash(text.lower())
+    return Counter(text[i : i + 4] for i in range(max(len(text) - 3, 1)))
+
+
+class LexicalIndex:
+    def __init__(self, chunks: list[str]):
+        self.chunks = chunks
+        grams = [_grams(chunk) for chunk in chunks]
+        df = Counter(gram for counts in grams for gram in counts)
+        self.idf = {gram: math.log(len(chunks) / n) + 1.0 for gram, n in df.items()}
+        self.vectors = [self._weigh(counts) for counts in grams]
+
+    def _weigh(self, counts: Counter) -> dict[str, float]:
+        vector = {gram: count * self.idf.get(gram, 0.0) for gram, count in counts.items()}
+        norm = math.sqrt(sum(v * v for v in vector.values())) or 1.0
+        return {gram: v / norm for gram, v in vector.items()}
+
+    def search(self, query: str, top_k: int) -> list[int]:
+        q = self._weigh(_grams(query))
+        scores = [sum(weight * vector.get(gram, 0.0) for gram, weight in q.items()) for vector in self.vectors]
+        return sorted(range(len(scores)), key=lambda i: -scores[i])[:top_k]
+
+
+def load_articles(article_dir: Path) -> dict[str, list[dict]]:
+    by_lang: dict[str, list[dict]] = {"en": [], "hi": []}
+    for path in sorted(article_dir.glob("*.json")):
+        doc = json.loads(path.read_text(encoding="utf-8"))
+        if doc.get("body", "").strip() and not doc.get("duplicate_of"):
+            by_lang.setdefault(doc.get("lang", "en"), []).append(doc)
+    return by_lang
+
+
+def question(doc: dict) -> str:
+    return _TITLE_SUFFIX.sub("", doc.get("title") or doc["doc_id"]).strip()
+
+
+def faq_pages(docs: list[dict], page_size: int) -> list[str]:
+    pages = []
+    for start in range(0, len(docs), page_size):
+        pages.append("\n".join(f"{question(doc)}\n{doc['body'].strip()}" for doc in docs[start : start + page_size]))
+    return pages
+
+
+def measure(name: str, chunker, texts: list[str], tokenizer, queries=None, top_k: int = 5) -> None:
+    start = time.perf_counter()
+    chunks = [chunk for text in texts for chunk in chunker(text)]
+    elapsed = time.perf_counter() - start
+    chunk_tokens = [tokenizer.count(chunk) for chunk in chunks]
+    sizes = sorted(chunk_tokens)
+    line = (
+        f"  {name:<8} chunks={len(chunks):5d} tokens/chunk mean={sum(sizes) / len(sizes):6.0f} "
+        f"p95={sizes[int(len(sizes) * 0.95)]:5d} max={sizes[-1]:5d}  {elapsed * 1000:7.1f} ms"
+    )
+    if queries:
+        index = LexicalIndex(chunks)
+        hits_1 = hits_k = prompt = 0
+        for query, answer in queries:
+            top = index.search(query, top_k)
+            hits_1 += answer in _squash(chunks[top[0]])
+            hits_k += any(answer in _squash(chunks[i]) for i in top)
+            prompt += sum(chunk_tokens[i] for i in top)
+        n = len(queries)
+        line += f"\n           hit@1={hits_1 / n:.2f} hit@{top_k}={hits_k / n:.2f} prompt tokens/query={prompt / n:.0f}"
+    print(line)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--articles", default="data/kb/articles")
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--page-size", type=int, default=8, help="Articles per synthetic FAQ page")
+    parser.add_argument("--tokenizer", default="auto", help="auto, tiktoken or estimate")
+    parser.add_argument("--max-tokens", type=int, default=MAX_TOKENS)
+    parser.add_argument("--overlap-tokens", type=int, default=OVERLAP_TOKENS)
+    args = parser.parse_args()
+
+    tokenizer = get_tokenizer(args.tokenizer)
+    by_lang = load_articles(Path(args.articles))
+    if not by_lang["en"]:
+        print(f"No articles in {args.articles} (run make fetch-kb first)")
+        return 1
+
+    def new(text: str) -> list[str]:
+        return chunk_text(text, max_tokens=args.max_tokens, overlap_tokens=args.overlap_tokens, tokenizer=tokenizer)
+
+    queries = [(question(doc), _FIRST_SENTENCE.match(_squash(doc["body"])).group(0)) for doc in by_lang["en"]]
+    print(f"tokenizer={tokenizer.name} max_tokens={args.max_tokens} overlap_tokens={args.overlap_tokens} top_k={args.top_k}")
+    for lang, docs in sorted(by_lang.items()):
+        if not docs:
+            continue
+        for label, texts in (("articles", [doc["body"] for doc in docs]), (f"FAQ pages of {args.page_size}", faq_pages(docs, args.page_size))):
+            print(f"{lang} {label} ({len(texts)} docs)")
+            lang_queries = queries if lang == "en" else None
+            measure("legacy", legacy_chunk_text, texts, tokenizer, lang_queries, args.top_k)
+            measure("tokens", new, texts, tokenizer, lang_queries, args.top_k)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""Throughput of the KB extractor backends over the saved raw pages (data/kb/raw, written by fetch_bms_kb.py).
+
+Every installed backend is first checked against bs4 (the reference) on the same pages, then timed
+in-process and, with --workers > 1, through a ProcessPoolExecutor like the crawler uses.
+  python3 scripts/bench_kb_extract.py [--raw-dir data/kb/raw] [--rounds 3] [--workers 4]
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from kb_extract import available_backends, get_extractor  # noqa: E402
+
+GOLDEN_DIR = Path(__file__).resolve().parent / "tests" / "golden"
+
+
+def extract_all(backend: str, pages: list[str]) -> list[tuple[str, str | None]]:
+    extract = get_extractor(backend)
+    return [(parsed.title, parsed.body) for parsed in (extract(html, True) for html in pages)]
+
+
+def _chunks(pages: list[str], n: int) -> list[list[str]]:
+    size = max(len(pages) // n, 1)
+    return [pages[i : i + size] for i in range(0, len(pages), size)]
+
+
+def bench(backend: str, pages: list[str], rounds: int, workers: int) -> float:
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            # Warm the workers (imports, compiled selectors) before timing.
+            list(pool.map(extract_all, [backend] * workers, _chunks(pages[:workers], workers)))
+            start = time.perf_counter()
+            for _ in range(rounds):
+                list(pool.map(extract_all, [backend] * workers * 4, _chunks(pages, workers * 4)))
+            return time.perf_counter() - start
+    extract_all(backend, pages[:1])
+    start = time.perf_counter()
+    for _ in range(rounds):
+        extract_all(backend, pages)
+    return time.perf_counter() - start
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--raw-dir", default="data/kb/raw")
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=1)
+    args = parser.parse_args()
+
+    paths = sorted(Path(args.raw_dir).glob("*.html"))
+    if not paths:
+        print(f"No raw pages in {args.raw_dir} (run fetch_bms_kb.py first); using the golden test pages")
+        paths = sorted(GOLDEN_DIR.glob("*.html")) * 50
+    pages = [path.read_text(encoding="utf-8", errors="replace") for path in paths]
+    megabytes = sum(len(html.encode("utf-8")) for html in pages) / 1e6
+
+    backends = available_backends()
+    reference = extract_all("bs4", pages)
+    print(f"pages={len(pages)} size={megabytes:.1f} MB rounds={args.rounds} workers={args.workers}")
+    for backend in backends:
+        mismatches = sum(1 for got, want in zip(extract_all(backend, pages), reference) if got != want)
+        elapsed = bench(backend, pages, args.rounds, args.workers)
+        total = len(pages) * args.rounds
+        print(
+            f"{backend:<11} {total / elapsed:9.1f} pages/s {megabytes * args.rounds / elapsed:7.2f} MB/s"
+            f"  mismatches vs bs4: {mismatches}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
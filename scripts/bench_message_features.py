@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""Micro-benchmark: per-helper message heuristics vs the single-pass MessageFeatures analyzer."""
+from __future__ import annotations
+
+import argparse
+import platform
+import re
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "apps" / "ai_powered_css"))
+
+from ai_powered_css.api.escalation import _EN_GREETINGS, _HI_GREETINGS, _normalize  # noqa: E402
+from ai_powered_css.api.message_features import (  # noqa: E402
+    _BOOKING_WORDS,
+    _CLOSING_NEGATIVE_PATTERNS,
+    _CLOSING_PATTERNS_EN,
+    _CLOSING_PATTERNS_HI,
+    _DOMAIN_WORDS,
+    _ENGLISH_HINT_WORDS,
+    _FOLLOWUP_WORDS,
+    _ISSUE_PATTERNS,
+    _PAYMENT_WORDS,
+    _REFUND_WORDS,
+    _ROMAN_HI_FUNCTION_WORDS,
+    _SUPPORT_REQUEST_WORDS,
+    MessageFeatures,
+)
+
+CORPUS = [
+    "Hi",
+    "hello there",
+    "Amount deducted but no confirmation",
+    "My payment was deducted but I did not get any booking confirmation for the movie tonight",
+    "Refund not received yet",
+    "When will my refund for the cancelled show reflect in my account? It has been 7 days",
+    "I was charged twice for the same booking via UPI, booking id BMS12345",
+    "Show cancelled",
+    "wrong amount charged, discount not applied on my card",
+    "I want to talk to a human agent please",
+    "create a ticket",
+    "thanks, that helps",
+    "thank you but the refund is still pending",
+    "what is the weather today",
+    "how long?",
+    "status",
+    "mujhe refund kab milega",
+    "mera paisa kata lekin ticket nahi mila",
+    "bhai payment fail ho gaya par paisa cut gaya",
+    "kya aap madad kar sakte ho",
+    "refund nahi aaya abhi tak, kripya madad kijiye",
+    "ticket bana do",
+    "नमस्ते",
+    "पैसे कट गए लेकिन कन्फर्मेशन नहीं आया",
+    "रिफंड अभी तक नहीं मिला",
+    "शो कैंसिल हुआ है, रिफंड कब तक आएगा?",
+    "गलत अमाउंट कट गया",
+    "धन्यवाद, मदद मिली",
+    "मुझे एजेंट से बात करनी है",
+    "मेरी बुकिंग की स्थिति क्या है",
+]
+
+
+def _legacy_tokenize(text: str) -> list[str]:
+    cleaned = re.sub(r"[^\w\s]", " ", text.lower())
+    return [tok for tok in cleaned.split() if tok]
+
+
+def _legacy_has_any(text: str, words: set[str]) -> bool:
+    return any(tok in words for tok in _legacy_tokenize(text))
+
+
+def _legacy_roman_hindi(text: str) -> str:
+    if not all(ord(ch) < 128 for ch in text):
+        return "en"
+    tokens = _legacy_tokenize(text)
+    if not tokens:
+        return "en"
+    hindi_hits = sum(1 for tok in tokens if tok in _ROMAN_HI_FUNCTION_WORDS)
+    english_hits = sum(1 for tok in tokens if tok in _ENGLISH_HINT_WORDS)
+    if hindi_hits >= 2 and hindi_hits >= english_hits + 1:
+        return "hi"
+    if hindi_hits >= 1 and english_hits <= 1:
+        return "ambiguous"
+    return "en"
+
+
+def _legacy_intent(text: str) -> str | None:
+    if _legacy_has_any(text, _REFUND_WORDS):
+        return "refund"
+    if _legacy_has_any(text, _PAYMENT_WORDS):
+        return "payment"
+    if _legacy_has_any(text, _BOOKING_WORDS):
+        return "booking"
+    return None
+
+
+def _legacy_closing(text: str) -> bool:
+    cleaned = text.strip().lower()
+    if not cleaned or _legacy_has_any(text, _SUPPORT_REQUEST_WORDS) or "?" in text:
+        return False
+    if any(re.search(p, cleaned, flags=re.IGNORECASE) for p in _CLOSING_NEGATIVE_PATTERNS):
+        return False
+    if any(re.search(p, cleaned, flags=re.IGNORECASE) for p in _CLOSING_PATTERNS_EN):
+        return True
+    return any(re.search(p, text, flags=re.IGNORECASE) for p in _CLOSING_PATTERNS_HI)
+
+
+def _legacy_issue(text: str) -> bool:
+    tokens = set(_legacy_tokenize(text))
+    return bool(tokens) and any(p.issubset(tokens) for p in _ISSUE_PATTERNS)
+
+
+def _legacy_off_topic(text: str) -> bool:
+    if _legacy_intent(text) or _legacy_issue(text) or _legacy_has_any(text, _SUPPORT_REQUEST_WORDS):
+        return False
+    return not _legacy_has_any(text, _DOMAIN_WORDS)
+
+
+def _legacy_followup(text: str) -> bool:
+    tokens = set(_legacy_tokenize(text))
+    if not tokens:
+        return False
+    if any(tok in _FOLLOWUP_WORDS for tok in tokens) or any(tok.isdigit() for tok in tokens):
+        return True
+    return len(tokens) <= 3
+
+
+def _legacy_greeting(text: str) -> bool:
+    tokens = _normalize(text)
+    if not tokens:
+        return True
+    greetings = _EN_GREETINGS | _HI_GREETINGS
+    if len(tokens) <= 2 and "".join(tokens) in greetings:
+        return True
+    if len(tokens) > 2 and any(tok not in greetings for tok in tokens):
+        return False
+    return any(tok in greetings for tok in tokens)
+
+
+def legacy_turn(text: str) -> tuple:
+    # Mirrors the helper calls a RAG-bound turn used to make, each re-tokenizing the message.
+    return (
+        _legacy_roman_hindi(text),
+        _legacy_has_any(text, _SUPPORT_REQUEST_WORDS),
+        _legacy_closing(text),
+        _legacy_greeting(text),
+        _legacy_followup(text),
+        _legacy_intent(text),
+        _legacy_intent(text),
+        _legacy_issue(text),
+        _legacy_off_topic(text),
+    )
+
+
+def features_turn(text: str) -> tuple:
+    features = MessageFeatures(text)
+    return (
+        features.roman_hindi_decision,
+        features.explicit_support,
+        features.is_closing,
+        features.is_greeting,
+        features.is_followup,
+        features.intent,
+        features.intent,
+        features.matches_issue_pattern,
+        features.is_off_topic,
+    )
+
+
+def bench(fn, rounds: int) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for text in CORPUS:
+            fn(text)
+    return time.perf_counter() - start
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rounds", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per implementation, alternated")
+    args = parser.parse_args()
+
+    mismatches = [text for text in CORPUS if legacy_turn(text) != features_turn(text)]
+    if mismatches:
+        for text in mismatches:
+            print(f"MISMATCH {text!r}: legacy={legacy_turn(text)} features={features_turn(text)}")
+        return 1
+
+    # Alternate the two so drift in machine load hits both; the speedup varies by CPU, so report median and range.
+    legacy, single = [], []
+    for _ in range(max(args.repeat, 1)):
+        legacy.append(bench(legacy_turn, args.rounds))
+        single.append(bench(features_turn, args.rounds))
+    speedups = sorted(old / new for old, new in zip(legacy, single))
+    turns = args.rounds * len(CORPUS)
+    print(
+        f"python={platform.python_version()} machine={platform.machine()} "
+        f"corpus={len(CORPUS)} messages rounds={args.rounds} repeat={len(speedups)}"
+    )
+    print(f"legacy helpers:   {statistics.median(legacy) * 1e6 / turns:8.2f} us/turn (median)")
+    print(f"MessageFeatures:  {statistics.median(single) * 1e6 / turns:8.2f} us/turn (median)")
+    print(f"speedup:          {statistics.median(speedups):8.2f}x (median; min {speedups[0]:.2f}x, max {speedups[-1]:.2f}x)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
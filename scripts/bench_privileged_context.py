@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""Per-request cost of the old set_user("Administrator") round-trip vs the _privileged_writes() context.
+
+Run inside the frappe container (the repo is mounted at /workspace):
+  cd /home/frappe/frappe-bench/sites && ../env/bin/python /workspace/scripts/bench_privileged_context.py --site helpdesk.localhost
+"""
+from __future__ import annotations
+
+import argparse
+import time
+
+try:
+    import frappe
+except Exception:
+    print("ERROR: Run with the bench virtualenv from frappe-bench/sites (frappe must be importable).")
+    raise
+
+
+def legacy_request() -> None:
+    # What every guest endpoint did before: swap to Administrator and back.
+    previous_ignore = getattr(frappe.flags, "ignore_permissions", False)
+    previous_user = frappe.session.user or "Guest"
+    frappe.flags.ignore_permissions = True
+    frappe.set_user("Administrator")
+    try:
+        # Any permission-aware code on the path re-resolves roles after set_user.
+        frappe.get_roles()
+    finally:
+        frappe.flags.ignore_permissions = previous_ignore
+        frappe.set_user(previous_user)
+        frappe.get_roles()
+
+
+def privileged_request() -> None:
+    from ai_powered_css.api.chat import _privileged_writes
+
+    with _privileged_writes():
+        frappe.get_roles()
+    frappe.get_roles()
+
+
+def bench(fn, rounds: int) -> float:
+    fn()
+    start = time.perf_counter()
+    for _ in range(rounds):
+        fn()
+    return time.perf_counter() - start
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--site", required=True)
+    parser.add_argument("--rounds", type=int, default=2000)
+    args = parser.parse_args()
+
+    frappe.init(site=args.site)
+    frappe.connect()
+    try:
+        frappe.set_user("Guest")
+        legacy = bench(legacy_request, args.rounds)
+        privileged = bench(privileged_request, args.rounds)
+    finally:
+        frappe.destroy()
+
+    print(f"rounds={args.rounds}")
+    print(f"set_user round-trip:  {legacy * 1e6 / args.rounds:9.1f} us/request")
+    print(f"_privileged_writes(): {privileged * 1e6 / args.rounds:9.1f} us/request")
+    print(f"saved per request:    {(legacy - privileged) * 1e6 / args.rounds:9.1f} us")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
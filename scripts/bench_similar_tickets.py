@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""Similar-ticket search on Postgres: the original any-subject-term query vs api/ticket_search.find_similar.
+
+Builds a scratch schema holding a synthetic "tabHD Ticket" with the same generated tsvector column and GIN index
+as patches/v1_0/add_ticket_search_vector.py, then runs EXPLAIN (ANALYZE, BUFFERS) for the subjects of sampled
+tickets. Reports whether the GIN index is used, how many candidate rows are fetched and ranked, buffers and
+execution time (summed over every query find_similar runs for a subject) and how many subjects needed the
+looser query. Needs psycopg2 (installed in the bench virtualenv) and a database where you may create a schema;
+the schema is dropped afterwards unless --keep is given, and --reuse skips rebuilding a kept one:
+  python3 scripts/bench_similar_tickets.py --dsn postgresql://postgres:<password>@localhost:5432/postgres
+"""
+from __future__ import annotations
+
+import argparse
+import io
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "apps" / "ai_powered_css"))
+
+from ai_powered_css.api import ticket_search  # noqa: E402
+
+try:
+    import psycopg2
+except Exception:
+    print("ERROR: psycopg2 is required (python3 -m pip install psycopg2-binary, or use the bench virtualenv).")
+    raise
+
+SCHEMA = "ai_css_bench"
+
+# The query this replaced, kept verbatim for comparison: the first 12 subject lexemes in tsvector (alphabetical)
+# order, ORed together.
+LEGACY_SQL = f"""
+    with q as (
+        select string_agg(quote_literal(lexeme), ' | ')::tsquery as query
+        from (
+            select lexeme
+            from unnest(tsvector_to_array(to_tsvector('english'::regconfig, %(subject)s))) as lexeme
+            limit 12
+        ) terms
+    )
+    select t.name, t.subject, t.status, t.priority, t.creation, t.modified,
+           ts_rank_cd(t.{ticket_search.SEARCH_COLUMN}, q.query, 32) as score
+    from "tabHD Ticket" t, q
+    where q.query is not null
+      and t.{ticket_search.SEARCH_COLUMN} @@ q.query
+      and t.name != %(ticket)s
+      and (%(window_days)s <= 0 or t.creation >= now() - make_interval(days => %(window_days)s))
+    order by score desc, t.modified desc
+    limit %(limit)s
+"""
+
+# Support vocabulary, most frequent first; subjects and descriptions draw from it with Zipf weights, so a few
+# words ("booking", "refund", "payment") appear in a large share of tickets, as they do in the real queue.
+COMMON_WORDS = """
+booking refund payment ticket movie cancel amount deducted received show account money bank card upi confirmation
+seat cinema wallet offer code coupon email sms charged twice failed pending transaction status delayed issue help
+please customer login otp app website event concert match stream rental voucher gift balance cashback points
+reward screen language time date changed venue location parking food beverage combo convenience fee tax invoice
+receipt gst support agent call callback escalate complaint experience problem error crash update password reset
+profile address phone number verification kyc blocked locked suspicious fraud dispute chargeback partial extra
+""".split()
+
+
+def vocabulary(size: int) -> tuple[list[str], list[float]]:
+    words = COMMON_WORDS + [f"term{i}" for i in range(max(size - len(COMMON_WORDS), 0))]
+    return words, [1.0 / (rank + 1) for rank in range(len(words))]
+
+
+def synthetic_rows(count: int, seed: int):
+    rng = random.Random(seed)
+    words, weights = vocabulary(3000)
+    now = datetime.now()
+    for i in range(count):
+        subject = " ".join(rng.choices(words, weights, k=rng.randint(4, 9)))
+        description = " ".join(rng.choices(words, weights, k=rng.randint(20, 80)))
+        created = now - timedelta(days=rng.uniform(0, 400))
+        yield f"T{i:07d}", subject, f"<p>{description}</p>", rng.choice(["Open", "Replied", "Resolved", "Closed"]), created
+
+
+def build_table(conn, count: int, seed: int) -> None:
+    with conn.cursor() as cur:
+        cur.execute(f"drop schema if exists {SCHEMA} cascade")
+        cur.execute(f"create schema {SCHEMA}")
+        cur.execute(f"set search_path to {SCHEMA}")
+        cur.execute(
+            """
+            create table "tabHD Ticket" (
+                name varchar(140) primary key, subject text, description text, status varchar(140),
+                priority varchar(140) default 'Medium', creation timestamp, modified timestamp
+            )
+            """
+        )
+        buffer = io.StringIO()
+        for name, subject, description, status, created in synthetic_rows(count, seed):
+            buffer.write("\t".join([name, subject, description, status, created.isoformat(), created.isoformat()]) + "\n")
+        buffer.seek(0)
+        cur.copy_expert('copy "tabHD Ticket" (name, subject, description, status, creation, modified) from stdin', buffer)
+        # Same column and index as the patch, added after the load like on an existing site.
+        cur.execute(
+            f"""
+            alter table "tabHD Ticket" add column {ticket_search.SEARCH_COLUMN} tsvector
+            generated always as (
+                setweight(to_tsvector('english'::regconfig, coalesce(subject, '')), 'A')
+                || setweight(
+                    to_tsvector(
+                        'english'::regconfig,
+                        left(regexp_replace(coalesce(description, ''), '<[^>]*>', ' ', 'g'), 20000)
+                    ),
+                    'B'
+                )
+            ) stored
+            """
+        )
+        cur.execute(
+            f'create index "tabHD Ticket_{ticket_search.SEARCH_COLUMN}" on "tabHD Ticket" '
+            f"using gin ({ticket_search.SEARCH_COLUMN})"
+        )
+        cur.execute('analyze "tabHD Ticket"')
+    conn.commit()
+
+
+def _nodes(plan: dict):
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from _nodes(child)
+
+
+def explain(cur, sql: str, params: dict) -> dict:
+    cur.execute("explain (analyze, buffers, format json) " + sql, params)
+    result = cur.fetchone()[0][0]
+    nodes = list(_nodes(result["Plan"]))
+    index_scans = [node for node in nodes if node["Node Type"] == "Bitmap Index Scan"]
+    heap = [node for node in nodes if node["Node Type"] in ("Bitmap Heap Scan", "Seq Scan")]
+    top = result["Plan"]
+    return {
+        "ms": result["Execution Time"],
+        "gin": bool(index_scans) and all(node.get("Index Name", "").endswith(ticket_search.SEARCH_COLUMN) for node in index_scans),
+        "candidates": sum(node["Actual Rows"] * node.get("Actual Loops", 1) for node in heap),
+        "index_rows": sum(node["Actual Rows"] for node in index_scans),
+        "buffers": top.get("Shared Hit Blocks", 0) + top.get("Shared Read Blocks", 0),
+    }
+
+
+def find_similar_explained(cur, subject: str, ticket: str, window_days: int) -> tuple[list[dict], list[dict]]:
+    """find_similar's results plus one explain() per query it ran (each query runs once first, to warm it)."""
+    cur.execute(ticket_search.SUBJECT_TERMS_SQL, {"subject": subject, "max_terms": ticket_search.MAX_TERMS})
+    terms = [row[0] for row in cur.fetchall()]
+    runs: list[dict] = []
+
+    def fetch(sql: str, params: dict) -> list[dict]:
+        cur.execute(sql, params)
+        columns = [column.name for column in cur.description]
+        rows = [dict(zip(columns, row)) for row in cur.fetchall()]
+        runs.append(explain(cur, sql, params))
+        return rows
+
+    return ticket_search.find_similar(fetch, terms, ticket, window_days), runs
+
+
+def combined(runs: list[dict]) -> dict:
+    return {
+        "ms": sum(run["ms"] for run in runs),
+        "gin": all(run["gin"] for run in runs),
+        "candidates": sum(run["candidates"] for run in runs),
+        "index_rows": sum(run["index_rows"] for run in runs),
+        "buffers": sum(run["buffers"] for run in runs),
+    }
+
+
+def summarize(name: str, runs: list[dict]) -> None:
+    times = sorted(run["ms"] for run in runs)
+    print(
+        f"  {name:<12} GIN used {sum(run['gin'] for run in runs)}/{len(runs)} | "
+        f"candidates ranked mean={statistics.mean(run['candidates'] for run in runs):8.0f} | "
+        f"buffers mean={statistics.mean(run['buffers'] for run in runs):7.0f} | "
+        f"exec ms median={statistics.median(times):7.2f} p95={times[int(len(times) * 0.95)]:7.2f}"
+    )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dsn", required=True)
+    parser.add_argument("--tickets", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--window-days", type=int, default=365)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--keep", action="store_true", help=f"Keep the {SCHEMA} schema")
+    parser.add_argument("--reuse", action="store_true", help=f"Use an existing {SCHEMA} schema as it is")
+    args = parser.parse_args()
+
+    conn = psycopg2.connect(args.dsn)
+    with conn.cursor() as cur:
+        cur.execute("select 1 from information_schema.schemata where schema_name = %s", (SCHEMA,))
+        reuse = args.reuse and cur.fetchone() is not None
+    if not reuse:
+        started = time.perf_counter()
+        build_table(conn, args.tickets, args.seed)
+        print(f"Built {args.tickets} synthetic tickets in {time.perf_counter() - started:.1f}s")
+    try:
+        with conn.cursor() as cur:
+            cur.execute(f"set search_path to {SCHEMA}")
+            cur.execute("select version()")
+            print(cur.fetchone()[0])
+            cur.execute('select name, subject from "tabHD Ticket" order by md5(name) limit %s', (args.queries,))
+            samples = cur.fetchall()
+            cur.execute('select count(*) from "tabHD Ticket"')
+            print(f"{cur.fetchone()[0]} tickets, {len(samples)} sampled subjects, window_days={args.window_days}")
+            legacy_runs, new_runs, relaxed, short = [], [], 0, 0
+            for ticket, subject in samples:
+                legacy_params = {"subject": subject, "ticket": ticket, "window_days": args.window_days, "limit": 5}
+                cur.execute(LEGACY_SQL, legacy_params)
+                cur.fetchall()
+                legacy_runs.append(explain(cur, LEGACY_SQL, legacy_params))
+                found, runs = find_similar_explained(cur, subject, ticket, args.window_days)
+                if runs:
+                    new_runs.append(combined(runs))
+                relaxed += len(runs) > 1
+                short += len(found) < ticket_search.SIMILAR_TICKETS_LIMIT
+
+            summarize("legacy", legacy_runs)
+            summarize("find_similar", new_runs)
+            print(
+                f"  find_similar ran the looser query for {relaxed} subjects; "
+                f"{short} still had fewer than {ticket_search.SIMILAR_TICKETS_LIMIT} matches"
+            )
+
+            ticket, subject = samples[0]
+            cur.execute(ticket_search.SUBJECT_TERMS_SQL, {"subject": subject, "max_terms": ticket_search.MAX_TERMS})
+            query = ticket_search.similar_tsqueries([row[0] for row in cur.fetchall()])[0]
+            params = {"query": query, "ticket": ticket, "window_days": args.window_days, "limit": 5}
+            print(f"\nEXPLAIN ANALYZE for {subject!r}:")
+            cur.execute("explain (analyze, buffers) " + ticket_search.SIMILAR_TICKETS_SQL, params)
+            print("\n".join(row[0] for row in cur.fetchall()))
+    finally:
+        if not args.keep:
+            with conn.cursor() as cur:
+                cur.execute(f"drop schema if exists {SCHEMA} cascade")
+            conn.commit()
+        conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -2,20 +2,23 @@
 from __future__ import annotations
 
 import argparse
+import asyncio
 import hashlib
 import json
 import os
 import re
 import sys
-import time
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timezone
+from functools import partial
 from pathlib import Path
 from typing import Iterable
 from urllib.parse import urljoin, urlparse, urlunparse
 
 try:
-    import requests
-    from bs4 import BeautifulSoup
+    from kb_crawler import ARTICLE, Crawler, CrawlState, PageOutcome, ValidatorStore
+    from kb_dedupe import DUPLICATES_PATH, dedupe_articles, skip_duplicates
+    from kb_extract import get_extractor
 except Exception as exc:  # pragma: no cover
     print("ERROR: Missing dependencies. Install with: python3 -m pip install -r scripts/requirements.txt")
     raise
@@ -26,10 +29,16 @@ USER_AGENT = (
     "AppleWebKit/537.36 (KHTML, like Gecko) "
     "Chrome/120.0.0.0 Safari/537.36"
 )
-RATE_LIMIT_SECONDS = 1.0
+# Politeness: requests per second per host (token bucket), shared by all workers.
+RATE_PER_HOST = float(os.getenv("KB_RATE_PER_HOST", "2"))
+CONCURRENCY = int(os.getenv("KB_CONCURRENCY", "8"))
+# Parsing is CPU-bound, so it runs in worker processes fed by the fetch workers.
+PARSE_WORKERS = int(os.getenv("KB_PARSE_WORKERS", str(min(os.cpu_count() or 1, 4))))
 
 RAW_DIR = Path("data/kb/raw")
 ARTICLE_DIR = Path("data/kb/articles")
+STATE_PATH = Path("data/kb/sources/crawl_state.json")
+VALIDATORS_PATH = Path("data/kb/sources/validators.json")
 
 
 def normalize_url(url: str) -> str:
@@ -91,131 +100,15 @@ def save_raw(url: str, html: str) -> Path:
     RAW_DIR.mkdir(parents=True, exist_ok=True)
     filename = hashlib.sha256(url.encode("utf-8")).hexdigest() + ".html"
     path = RAW_DIR / filename
-    if not path.exists():
-        path.write_text(html, encoding="utf-8")
+    # Only called for pages whose body changed since the last crawl (see kb_crawler.ValidatorStore).
+    path.write_text(html, encoding="utf-8")
     return path
 
 
-def extract_title(soup: BeautifulSoup) -> str:
-    if soup.title and soup.title.get_text(strip=True):
-        return soup.title.get_text(strip=True)
-    h1 = soup.find("h1")
-    if h1 and h1.get_text(strip=True):
-        return h1.get_text(strip=True)
-    return ""
-
-
-def extract_text(soup: BeautifulSoup) -> str:
-    for tag in soup(
-        ["script", "style", "noscript", "header", "footer", "nav", "form", "button", "input", "svg", "canvas", "iframe"]
-    ):
-        tag.decompose()
-
-    for selector in [
-        ".breadcrumb",
-        ".breadcrumbs",
-        ".related",
-        ".recommended",
-        ".feedback",
-        ".helpful",
-        ".sidebar",
-        ".search",
-        ".article-footer",
-        ".article__footer",
-        ".article__header",
-        ".solution-footer",
-        ".share",
-        ".social",
-        ".print",
-        ".pagination",
-        ".pager",
-    ]:
-        for node in soup.select(selector):
-            node.decompose()
-
-    for selector in [
-        ".article-body",
-        ".article__content",
-        ".article-content",
-        ".content-body",
-        ".kb-article",
-        ".solution-article",
-        ".solutions-article",
-        "article",
-        "main",
-        ".content",
-        ".help-center",
-    ]:
-        for node in soup.select(selector):
-            text = node.get_text("\n", strip=True)
-            if len(text) > 200:
-                return clean_text(text)
-
-    body = soup.body
-    if body:
-        return clean_text(body.get_text("\n", strip=True))
-
-    return clean_text(soup.get_text("\n", strip=True))
-
-
-def clean_text(text: str) -> str:
-    strip_patterns = [
-        r"solution home",
-        r"recommended topics",
-        r"did you find it helpful\??",
-        r"send feedback",
-        r"help us improve.*",
-        r"sorry we couldn.?t be helpful.*",
-        r"modified on:\s*[a-z0-9,\s:]+",
-        r"updated on:\s*[a-z0-9,\s:]+",
-        r"\bprint\b",
-        r"\bfaq'?s?\b",
-        r"powered by freshdesk",
-        r"\bback to top\b",
-        r"\bsubmit a request\b",
-    ]
-    strip_compiled = [re.compile(p, re.IGNORECASE) for p in strip_patterns]
-
-    skip_patterns = [
-        r"^home\s*/",
-        r"^yes$",
-        r"^no$",
-        r"^search$",
-        r"^share$",
-    ]
-    skip_compiled = [re.compile(p, re.IGNORECASE) for p in skip_patterns]
-
-    lines = [line.strip() for line in text.splitlines()]
-    cleaned = []
-    seen = set()
-    for line in lines:
-        if not line or len(line) <= 2:
-            continue
-        for pattern in strip_compiled:
-            line = pattern.sub("", line)
-        line = re.sub(r"\s{2,}", " ", line).strip(" -|")
-        if not line or len(line) <= 2:
-            continue
-        if any(p.search(line) for p in skip_compiled):
-            continue
-        if "BookMyShow Support Centre" in line and len(line) < 60:
-            continue
-        key = line.lower()
-        if key in seen:
-            continue
-        seen.add(key)
-        cleaned.append(line)
-
-    merged = "\n".join(cleaned)
-    merged = re.sub(r"[ \t]+", " ", merged)
-    merged = re.sub(r"\n{3,}", "\n\n", merged)
-    return merged.strip()
-
-
-def discover_links(soup: BeautifulSoup, base_url: str) -> list[str]:
+def discover_links(hrefs: Iterable[str], base_url: str) -> list[str]:
     links: list[str] = []
-    for a in soup.find_all("a", href=True):
-        href = a["href"].strip()
+    for href in hrefs:
+        href = href.strip()
         if href.startswith("mailto:") or href.startswith("tel:"):
             continue
         absolute = normalize_url(urljoin(base_url, href))
@@ -224,26 +117,47 @@ def discover_links(soup: BeautifulSoup, base_url: str) -> list[str]:
     return links
 
 
-def fetch_url(session: requests.Session, url: str, retries: int = 3) -> str:
-    for attempt in range(1, retries + 1):
-        try:
-            resp = session.get(url, timeout=(10, 20))
-            if resp.status_code >= 400:
-                raise RuntimeError(f"HTTP {resp.status_code}")
-            return resp.text
-        except Exception as exc:
-            if attempt == retries:
-                raise
-            time.sleep(1.5 * attempt)
-    return ""
-
-
 def load_seeds(path: Path) -> list[str]:
     data = json.loads(path.read_text(encoding="utf-8"))
     seeds = data.get("seeds", data if isinstance(data, list) else [])
     return [normalize_url(s) for s in seeds]
 
 
+def handle_page(
+    url: str, html: str, kind: str, category: str | None, force: bool = False, extractor: str | None = None
+) -> PageOutcome:
+    """Crawler handler: save raw HTML, collect links and, for article pages, write the article JSON.
+
+    Module-level and picklable so the crawler can run it in a ProcessPoolExecutor.
+    """
+    save_raw(url, html)
+    page = get_extractor(extractor)(html, kind == ARTICLE)
+    title = page.title
+    links = discover_links(page.hrefs, url)
+    if kind != ARTICLE:
+        return PageOutcome(title=title, links=links)
+
+    body = page.body
+    if not body or len(body) < 200:
+        return PageOutcome(title=title, links=links, record={"url": url, "low_quality": True})
+
+    doc_id = stable_doc_id(url, title)
+    doc = {
+        "doc_id": doc_id,
+        "title": title or doc_id,
+        "category": category or "Uncategorized",
+        "tags": [],
+        "lang": "en",
+        "source_url": url,
+        "fetched_at": datetime.now(timezone.utc).isoformat(),
+        "content_hash": content_hash(body),
+        "body": body,
+    }
+    updated = write_article(doc, force=force)
+    print(f"Saved: {doc_id}" if updated else f"Unchanged: {doc_id}")
+    return PageOutcome(title=title, links=links, accepted=True, record={"url": url, "doc_id": doc_id, "updated": updated})
+
+
 def write_article(doc: dict, force: bool) -> bool:
     ARTICLE_DIR.mkdir(parents=True, exist_ok=True)
     doc_path = ARTICLE_DIR / f"{doc['doc_id']}.json"
@@ -264,9 +178,8 @@ def translate_to_hindi(docs: list[dict], top_n_categories: int, force: bool) ->
         print("WARN: KB_TRANSLATE_HI=true but OPENAI_API_KEY is missing; skipping translation")
         return
 
-    from openai import OpenAI
+    from kb_translate import translate_bodies
 
-    client = OpenAI(api_key=api_key)
     model = os.getenv("OPENAI_CHAT_MODEL", "gpt-4o-mini")
 
     category_counts: dict[str, int] = {}
@@ -276,6 +189,7 @@ def translate_to_hindi(docs: list[dict], top_n_categories: int, force: bool) ->
 
     top_categories = {k for k, _ in sorted(category_counts.items(), key=lambda x: x[1], reverse=True)[:top_n_categories]}
 
+    selected = []
     for doc in docs:
         category = doc.get("category") or "Uncategorized"
         if category not in top_categories:
@@ -284,22 +198,10 @@ def translate_to_hindi(docs: list[dict], top_n_categories: int, force: bool) ->
         hi_path = ARTICLE_DIR / f"{doc['doc_id']}.hi.json"
         if hi_path.exists() and not force:
             continue
+        selected.append((doc, hi_path))
 
-        prompt = (
-            "Translate the following support article text to Hindi. "
-            "Do not summarize or add new information. Output only the Hindi translation.\n\n"
-            f"TEXT:\n{doc['body']}"
-        )
-        response = client.chat.completions.create(
-            model=model,
-            messages=[
-                {"role": "system", "content": "You are a professional English-to-Hindi translator."},
-                {"role": "user", "content": prompt},
-            ],
-            temperature=0.0,
-        )
-        translated = response.choices[0].message.content or ""
-
+    translated_bodies, report = translate_bodies([doc["body"] for doc, _ in selected], api_key=api_key, model=model)
+    for (doc, hi_path), translated in zip(selected, translated_bodies):
         hi_doc = {
             **doc,
             "lang": "hi",
@@ -309,6 +211,7 @@ def translate_to_hindi(docs: list[dict], top_n_categories: int, force: bool) ->
             "content_hash": content_hash(translated.strip()),
         }
         hi_path.write_text(json.dumps(hi_doc, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(report)
 
 
 def main() -> int:
@@ -333,106 +236,78 @@ def main() -> int:
         default=int(os.getenv("KB_MAX_DEPTH", "3")),
         help="Max crawl depth",
     )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=CONCURRENCY,
+        help="Concurrent fetch workers (per-host rate limits still apply)",
+    )
+    parser.add_argument(
+        "--rate",
+        type=float,
+        default=RATE_PER_HOST,
+        help="Requests per second per host",
+    )
+    parser.add_argument(
+        "--parse-workers",
+        type=int,
+        default=PARSE_WORKERS,
+        help="Processes used for HTML parsing (1 parses in a thread of the crawler)",
+    )
+    parser.add_argument("--extractor", default=None, help="HTML extractor: auto, selectolax, lxml or bs4 (KB_EXTRACTOR)")
+    parser.add_argument("--state", default=str(STATE_PATH), help="Resumable crawl state file")
+    parser.add_argument("--fresh", action="store_true", help="Ignore a saved crawl state and start from the seeds")
     args = parser.parse_args()
 
-    seeds_path = Path(args.seeds)
-    seeds = load_seeds(seeds_path)
-
-    session = requests.Session()
-    session.headers.update({"User-Agent": USER_AGENT})
-
-    to_visit: list[tuple[str, int]] = [(seed, 0) for seed in seeds]
-    visited: set[str] = set()
-    article_urls: set[str] = set()
-    category_hint: dict[str, str] = {}
-    discovered_urls: list[str] = []
-    blocked_urls: list[dict] = []
-    low_quality = 0
-    saved_count = 0
-    skipped_count = 0
-
-    fetched_pages = 0
-
-    while to_visit:
-        url, depth = to_visit.pop(0)
-        if url in visited:
-            continue
-        visited.add(url)
-        discovered_urls.append(url)
-
-        if args.max_pages and fetched_pages >= args.max_pages:
-            break
-
-        print(f"Fetching: {url}")
-        try:
-            html = fetch_url(session, url)
-        except Exception as exc:
-            reason = str(exc)
-            print(f"WARN: Failed to fetch {url}: {reason}")
-            blocked_urls.append(
-                {
-                    "url": url,
-                    "status": reason,
-                    "fetched_at": datetime.now(timezone.utc).isoformat(),
-                }
-            )
-            continue
-
-        fetched_pages += 1
-        save_raw(url, html)
-        soup = BeautifulSoup(html, "html.parser")
-        title = extract_title(soup)
-        base_category = title.strip() if title else None
-
-        for link in discover_links(soup, url):
-            if link not in visited and depth + 1 <= args.max_depth:
-                to_visit.append((link, depth + 1))
-            if is_article_url(link):
-                article_urls.add(link)
-                if base_category and link not in category_hint:
-                    category_hint[link] = base_category
-
-        time.sleep(RATE_LIMIT_SECONDS)
-
+    state_path = Path(args.state)
+    if state_path.exists() and not args.fresh:
+        state = CrawlState.load(state_path)
+        print(f"Resuming crawl from {state_path} ({len(state.visited)} URLs already visited)")
+    else:
+        state = CrawlState.from_seeds(load_seeds(Path(args.seeds)), is_article_url)
+    validators = ValidatorStore(VALIDATORS_PATH)
+    if args.force:
+        # --force re-parses everything; the store is rebuilt from the fresh responses.
+        validators.entries.clear()
+
+    executor = ProcessPoolExecutor(max_workers=args.parse_workers) if args.parse_workers > 1 else None
+    crawler = Crawler(
+        state,
+        partial(handle_page, force=args.force, extractor=args.extractor),
+        is_article_url,
+        max_pages=args.max_pages,
+        max_articles=args.max_articles,
+        max_depth=args.max_depth,
+        concurrency=args.concurrency,
+        rate_per_host=args.rate,
+        user_agent=USER_AGENT,
+        state_path=state_path,
+        executor=executor,
+        validators=validators,
+    )
+    try:
+        asyncio.run(crawler.run())
+    except KeyboardInterrupt:
+        print(f"Interrupted; crawl state saved to {state_path}. Re-run to resume (--fresh to start over).")
+        return 130
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+
+    article_urls = {url for url in state.category_hint} | {r["url"] for r in state.records}
+    low_quality = sum(1 for r in state.records if r.get("low_quality"))
+    saved_count = sum(1 for r in state.records if r.get("updated"))
+    skipped_count = sum(1 for r in state.records if r.get("doc_id") and not r.get("updated"))
+    # Fold near-duplicate articles into one canonical doc before paying for translation and embeddings.
+    duplicates = dedupe_articles(ARTICLE_DIR)
     docs: list[dict] = []
-    for article_url in sorted(article_urls):
-        if args.max_articles and len(docs) >= args.max_articles:
-            break
-        print(f"Parsing article: {article_url}")
-        try:
-            html = fetch_url(session, article_url)
-        except Exception as exc:
-            print(f"WARN: Failed to fetch article {article_url}: {exc}")
-            continue
-
-        save_raw(article_url, html)
-        soup = BeautifulSoup(html, "html.parser")
-        title = extract_title(soup)
-        body = extract_text(soup)
-        if not body or len(body) < 200:
-            low_quality += 1
-            continue
-
-        doc_id = stable_doc_id(article_url, title)
-        doc = {
-            "doc_id": doc_id,
-            "title": title or doc_id,
-            "category": category_hint.get(article_url) or "Uncategorized",
-            "tags": [],
-            "lang": "en",
-            "source_url": article_url,
-            "fetched_at": datetime.now(timezone.utc).isoformat(),
-            "content_hash": content_hash(body),
-            "body": body,
-        }
-        updated = write_article(doc, force=args.force)
-        if updated:
-            print(f"Saved: {doc_id}")
-            saved_count += 1
-        else:
-            skipped_count += 1
-        docs.append(doc)
-        time.sleep(RATE_LIMIT_SECONDS)
+    for doc_id in sorted({r["doc_id"] for r in state.records if r.get("doc_id")}):
+        doc_path = ARTICLE_DIR / f"{doc_id}.json"
+        if doc_path.exists():
+            docs.append(json.loads(doc_path.read_text(encoding="utf-8")))
+    docs = skip_duplicates(docs, duplicates)
+    discovered_urls = state.discovered
+    blocked_urls = state.blocked
 
     translate_to_hindi(docs, top_n_categories=20, force=args.force)
 
@@ -451,7 +326,18 @@ def main() -> int:
 
     print(f"Completed. Articles discovered: {len(article_urls)}")
     print(f"Saved: {saved_count}, Skipped (unchanged): {skipped_count}, Low quality: {low_quality}")
+    print(f"Near-duplicates skipped: {len(duplicates)} (see {DUPLICATES_PATH})")
     print(f"Total on disk: {en_count} EN, {hi_count} HI")
+    stats = crawler.stats
+    print(
+        f"Downloaded: {stats['downloaded']} ({stats['bytes_downloaded']} bytes), "
+        f"Not modified: {stats['not_modified']}, Unchanged body: {stats['unchanged_body']}"
+    )
+    print(
+        f"Saved {stats['bytes_saved']} bytes and {stats['parse_seconds_saved']:.2f}s of parsing "
+        f"(parsed for {stats['parse_seconds']:.2f}s)"
+    )
+    state_path.unlink(missing_ok=True)
     return 0
 
 
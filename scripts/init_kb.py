@@ -2,19 +2,32 @@
 from __future__ import annotations
 
 import argparse
-import glob
+import asyncio
+import hashlib
 import json
 import os
 import sys
 import time
+from dataclasses import dataclass, field
 from pathlib import Path
+from typing import Iterable
 
 try:
+    import httpx
     import requests
+
+    from kb_bundle import ARTICLE_DIR, article_filename, iter_articles
+    from kb_crawler import AdaptiveTokenBucket
+    from kb_dedupe import load_duplicates
 except Exception:
     print("ERROR: Missing dependencies. Install with: python3 -m pip install -r scripts/requirements.txt")
     raise
 
+CHECKPOINT_PATH = Path("data/kb/sources/ingest_checkpoint.json")
+WORKERS = int(os.getenv("KB_INGEST_WORKERS", "4"))
+# Requests per second to /ingest; halved on 429/503 and recovered gradually.
+RATE = float(os.getenv("KB_INGEST_RATE", "8"))
+
 
 def load_env_file(path: Path) -> dict:
     env = {}
@@ -29,43 +42,179 @@ def load_env_file(path: Path) -> dict:
     return env
 
 
-def main() -> int:
-    parser = argparse.ArgumentParser()
-    parser.add_argument("--env", default="infra/.env")
-    parser.add_argument("--url", default="http://localhost:8001")
-    parser.add_argument("--limit", type=int, default=0)
-    args = parser.parse_args()
+@dataclass
+class IngestJob:
+    doc_id: str
+    lang: str
+    payload: dict
+    digest: str
 
-    env = load_env_file(Path(args.env))
-    rag_key = os.getenv("RAG_API_KEY") or env.get("RAG_API_KEY", "")
-    openai_key = os.getenv("OPENAI_API_KEY") or env.get("OPENAI_API_KEY", "")
 
-    if not openai_key:
-        print("ERROR: OPENAI_API_KEY is required for embeddings/ingest. Update infra/.env.")
-        return 1
-    if not rag_key:
-        print("ERROR: RAG_API_KEY is required for ingest. Update infra/.env.")
-        return 1
+@dataclass
+class IngestResult:
+    done: dict[str, dict] = field(default_factory=dict)
+    failed: dict[str, str] = field(default_factory=dict)
+    resumed: int = 0
 
-    en_files = [f for f in glob.glob("data/kb/articles/*.json") if not f.endswith(".hi.json")]
-    hi_files = [f for f in glob.glob("data/kb/articles/*.hi.json")]
-    files = sorted(en_files + hi_files)
-    if not files:
-        print("ERROR: No KB articles found. Run: make fetch-kb")
-        return 1
 
-    if args.limit:
-        files = files[: args.limit]
+class Checkpoint:
+    """Ingested doc_id -> payload digest and chunk count, so an interrupted or failed run resumes where it stopped."""
 
-    headers = {"Content-Type": "application/json", "x-api-key": rag_key}
-    ingested = 0
-    total_chunks = 0
-    lang_counts: dict[str, int] = {}
-    chunk_counts: dict[str, int] = {}
+    def __init__(self, path: Path | None, url: str, fresh: bool = False):
+        self.path = path
+        self.done: dict[str, dict] = {}
+        if path and path.exists() and not fresh:
+            data = json.loads(path.read_text(encoding="utf-8"))
+            # A checkpoint taken against another RAG service says nothing about this one.
+            if data.get("url") == url:
+                self.done = data.get("done", {})
+        self.url = url
+
+    def is_done(self, job: IngestJob) -> bool:
+        return self.done.get(job.doc_id, {}).get("digest") == job.digest
+
+    def save(self) -> None:
+        if not self.path:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+        tmp.write_text(json.dumps({"url": self.url, "done": self.done}, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, self.path)
+
+
+class Progress:
+    def __init__(self, total: int, interactive: bool):
+        self.total = total
+        self.interactive = interactive
+        self.started = time.monotonic()
+        self.docs = self.chunks = self.failed = 0
+
+    def line(self, rate: float) -> str:
+        elapsed = max(time.monotonic() - self.started, 1e-6)
+        return (
+            f"{self.docs}/{self.total} docs, {self.failed} failed | "
+            f"{self.docs / elapsed:.1f} docs/s, {self.chunks / elapsed:.1f} chunks/s | limit {rate:.1f} req/s"
+        )
+
+    async def report(self, bucket: AdaptiveTokenBucket) -> None:
+        # Redraw in place on a terminal; one line every 10s when piped to a log.
+        interval = 0.5 if self.interactive else 10.0
+        while True:
+            await asyncio.sleep(interval)
+            if self.interactive:
+                print("\r" + self.line(bucket.rate), end="", flush=True)
+            else:
+                print(self.line(bucket.rate), flush=True)
+
+
+def _retry_after(resp: httpx.Response) -> float | None:
+    value = resp.headers.get("Retry-After", "")
+    return min(float(value), 60.0) if value.isdigit() else None
+
+
+async def _ingest_one(
+    client: httpx.AsyncClient, url: str, job: IngestJob, bucket: AdaptiveTokenBucket, retries: int
+) -> int:
+    for attempt in range(1, retries + 1):
+        await bucket.acquire()
+        try:
+            resp = await client.post(f"{url}/ingest", json=job.payload)
+        except httpx.TransportError as exc:
+            if attempt == retries:
+                raise RuntimeError(f"{type(exc).__name__}: {exc}") from exc
+            bucket.throttled()
+            await asyncio.sleep(min(2**attempt, 30))
+            continue
+        if resp.status_code == 200:
+            bucket.succeeded()
+            try:
+                return int(resp.json().get("ingested_chunks", 0))
+            except Exception:
+                return 0
+        # 429/503 (rate limit, embeddings quota) and 5xx are retried with a lower client rate; other 4xx are final.
+        if resp.status_code in (429, 503) or resp.status_code >= 500:
+            retry_after = _retry_after(resp)
+            bucket.throttled(retry_after)
+            if attempt < retries:
+                await asyncio.sleep(min(2**attempt, 30) if retry_after is None else retry_after)
+                continue
+        hint = " (embeddings unavailable: check OPENAI_API_KEY and quota)" if resp.status_code == 503 else ""
+        raise RuntimeError(f"HTTP {resp.status_code}{hint}: {resp.text[:200]}")
+    raise RuntimeError("no attempts left")
+
+
+async def ingest_documents(
+    jobs: list[IngestJob],
+    url: str,
+    headers: dict,
+    *,
+    workers: int = WORKERS,
+    rate: float = RATE,
+    retries: int = 5,
+    timeout: float = 60.0,
+    checkpoint: Checkpoint,
+    checkpoint_every: int = 25,
+    show_progress: bool = True,
+) -> IngestResult:
+    result = IngestResult()
+    queue: asyncio.Queue[IngestJob] = asyncio.Queue()
+    for job in jobs:
+        if checkpoint.is_done(job):
+            result.done[job.doc_id] = checkpoint.done[job.doc_id]
+            result.resumed += 1
+        else:
+            queue.put_nowait(job)
+
+    bucket = AdaptiveTokenBucket(rate, burst=max(workers, 1))
+    progress = Progress(queue.qsize(), interactive=sys.stdout.isatty())
+    completed = 0
+
+    async def worker(client: httpx.AsyncClient) -> None:
+        nonlocal completed
+        while True:
+            try:
+                job = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            try:
+                chunks = await _ingest_one(client, url, job, bucket, retries)
+            except Exception as exc:
+                result.failed[job.doc_id] = str(exc)
+                progress.failed += 1
+                continue
+            entry = {"digest": job.digest, "chunks": chunks, "lang": job.lang}
+            result.done[job.doc_id] = checkpoint.done[job.doc_id] = entry
+            progress.docs += 1
+            progress.chunks += chunks
+            completed += 1
+            if checkpoint_every and completed % checkpoint_every == 0:
+                checkpoint.save()
+
+    reporter = None
+    limits = httpx.Limits(max_connections=max(workers, 1), max_keepalive_connections=max(workers, 1))
+    try:
+        async with httpx.AsyncClient(headers=headers, timeout=timeout, limits=limits) as client:
+            if show_progress:
+                reporter = asyncio.create_task(progress.report(bucket))
+            await asyncio.gather(*(worker(client) for _ in range(max(workers, 1))))
+    finally:
+        if reporter:
+            reporter.cancel()
+        checkpoint.save()
+    if show_progress:
+        print(("\r" if progress.interactive else "") + progress.line(bucket.rate))
+    return result
 
-    for path in files:
-        with open(path, "r", encoding="utf-8") as f:
-            doc = json.load(f)
+
+def build_jobs(docs: Iterable[dict], duplicates: dict[str, str] | None = None) -> tuple[list[IngestJob], str]:
+    # The KB revision covers every article in file-name order (same for files and bundle), whether or not this
+    # run re-sends it.
+    jobs = []
+    revision = hashlib.sha256()
+    for doc in sorted(docs, key=article_filename):
+        # Near-duplicates (both languages) are served by their canonical article.
+        if duplicates and doc["doc_id"] in duplicates:
+            continue
 
         body = doc.get("body", "").strip()
         if len(body) < 200:
@@ -84,32 +233,140 @@ def main() -> int:
             "lang": lang,
             "source_url": doc.get("source_url"),
         }
+        encoded = json.dumps(payload, sort_keys=True, ensure_ascii=False).encode("utf-8")
+        revision.update(encoded)
+        jobs.append(IngestJob(ingest_doc_id, lang, payload, hashlib.sha256(encoded).hexdigest()))
+    return jobs, revision.hexdigest()[:12]
 
-        resp = requests.post(f"{args.url}/ingest", headers=headers, json=payload, timeout=30)
-        if resp.status_code != 200:
-            print(f"ERROR: /ingest failed for {doc['doc_id']} (HTTP {resp.status_code})")
-            print(resp.text)
-            if resp.status_code == 503:
-                print("Hint: Embeddings unavailable. Check OPENAI_API_KEY and account quota.")
-            return 1
 
+def duplicate_doc_ids(duplicates: dict[str, str]) -> list[str]:
+    # Both languages of each near-duplicate, under the ids build_jobs would have ingested them with.
+    return sorted(ingest_id for doc_id in duplicates for ingest_id in (doc_id, f"{doc_id}:hi"))
+
+
+def delete_documents(url: str, headers: dict, doc_ids: list[str], timeout: float = 60.0) -> None:
+    resp = httpx.post(f"{url}/delete", json={"doc_ids": doc_ids}, headers=headers, timeout=timeout)
+    if resp.status_code != 200:
+        raise RuntimeError(f"HTTP {resp.status_code}: {resp.text[:200]}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--env", default="infra/.env")
+    parser.add_argument("--url", default="http://localhost:8001")
+    parser.add_argument("--limit", type=int, default=0)
+    parser.add_argument("--helpdesk-url", default="")
+    parser.add_argument("--no-warm", action="store_true", help="Skip rebuilding the quick-reply answer store")
+    parser.add_argument("--workers", type=int, default=WORKERS, help="Concurrent /ingest requests")
+    parser.add_argument("--rate", type=float, default=RATE, help="Max /ingest requests per second (adapts to 429/503)")
+    parser.add_argument("--retries", type=int, default=5)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--checkpoint", default=str(CHECKPOINT_PATH), help="Resume file for interrupted runs")
+    parser.add_argument("--fresh", action="store_true", help="Ignore the checkpoint and re-ingest every article")
+    parser.add_argument("--bundle", default=os.getenv("KB_BUNDLE", ""), help="Read articles from a kb_bundle.py pack")
+    args = parser.parse_args()
+
+    env = load_env_file(Path(args.env))
+    rag_key = os.getenv("RAG_API_KEY") or env.get("RAG_API_KEY", "")
+    openai_key = os.getenv("OPENAI_API_KEY") or env.get("OPENAI_API_KEY", "")
+
+    if not openai_key:
+        print("ERROR: OPENAI_API_KEY is required for embeddings/ingest. Update infra/.env.")
+        return 1
+    if not rag_key:
+        print("ERROR: RAG_API_KEY is required for ingest. Update infra/.env.")
+        return 1
+
+    docs = sorted(iter_articles(ARTICLE_DIR, args.bundle or None), key=article_filename)
+    if not docs:
+        print("ERROR: No KB articles found. Run: make fetch-kb")
+        return 1
+
+    if args.limit:
+        docs = docs[: args.limit]
+
+    headers = {"Content-Type": "application/json", "x-api-key": rag_key}
+    duplicates = load_duplicates()
+    jobs, kb_revision = build_jobs(docs, duplicates)
+    checkpoint = Checkpoint(Path(args.checkpoint), args.url, fresh=args.fresh)
+    if duplicates:
+        print(f"Skipping {len(duplicates)} near-duplicate articles (data/kb/sources/duplicates.json)")
+        # Articles folded since an earlier ingest still have points in Qdrant; retrieval would keep returning them.
+        stale = duplicate_doc_ids(duplicates)
         try:
-            ingested_chunks = resp.json().get("ingested_chunks", 0)
-        except Exception:
-            ingested_chunks = 0
-
-        ingested += 1
-        total_chunks += ingested_chunks
-        lang_counts[lang] = lang_counts.get(lang, 0) + 1
-        chunk_counts[lang] = chunk_counts.get(lang, 0) + ingested_chunks
-        time.sleep(0.2)
-
-    print(f"Ingested {ingested} documents.")
-    print(f"Total chunks: {total_chunks}")
+            delete_documents(args.url, headers, stale, timeout=args.timeout)
+        except Exception as exc:
+            print(f"ERROR: Could not remove near-duplicate articles from the index: {exc}")
+            return 1
+        for doc_id in stale:
+            checkpoint.done.pop(doc_id, None)
+    try:
+        result = asyncio.run(
+            ingest_documents(
+                jobs,
+                args.url,
+                headers,
+                workers=args.workers,
+                rate=args.rate,
+                retries=args.retries,
+                timeout=args.timeout,
+                checkpoint=checkpoint,
+            )
+        )
+    except KeyboardInterrupt:
+        print(f"\nInterrupted; progress saved to {args.checkpoint}. Re-run to resume (--fresh to start over).")
+        return 130
+
+    lang_counts: dict[str, int] = {}
+    chunk_counts: dict[str, int] = {}
+    for entry in result.done.values():
+        lang_counts[entry["lang"]] = lang_counts.get(entry["lang"], 0) + 1
+        chunk_counts[entry["lang"]] = chunk_counts.get(entry["lang"], 0) + entry["chunks"]
+
+    print(f"Ingested {len(result.done)} documents ({result.resumed} already done in a previous run).")
+    print(f"Total chunks: {sum(chunk_counts.values())}")
     for lang, count in sorted(lang_counts.items()):
         print(f"{lang}: {count} docs, {chunk_counts.get(lang, 0)} chunks")
+    if result.failed:
+        print(f"ERROR: {len(result.failed)} documents failed; re-run to retry them:")
+        for doc_id, error in sorted(result.failed.items())[:20]:
+            print(f"  {doc_id}: {error}")
+        return 1
+    Path(args.checkpoint).unlink(missing_ok=True)
+
+    print(f"KB revision: {kb_revision}")
+    if not args.no_warm:
+        helpdesk_url = args.helpdesk_url or os.getenv("HELPDESK_URL") or env.get("HELPDESK_URL") or "http://localhost:8000"
+        admin_password = os.getenv("HELP_DESK_ADMIN_PASSWORD") or env.get("HELP_DESK_ADMIN_PASSWORD") or "admin"
+        warm_quick_replies(helpdesk_url.rstrip("/"), admin_password, kb_revision)
     return 0
 
 
+def warm_quick_replies(helpdesk_url: str, admin_password: str, kb_revision: str) -> None:
+    # Precompute quick-reply answers for this KB revision; chat falls back to live RAG if this fails.
+    session = requests.Session()
+    try:
+        login = session.post(
+            f"{helpdesk_url}/api/method/login",
+            json={"usr": "Administrator", "pwd": admin_password},
+            timeout=15,
+        )
+        login.raise_for_status()
+        resp = session.post(
+            f"{helpdesk_url}/api/method/ai_powered_css.api.chat.warm_quick_reply_answers",
+            json={"kb_revision": kb_revision},
+            timeout=15,
+        )
+        resp.raise_for_status()
+    except Exception as exc:
+        print(f"WARN: quick-reply warm-up not queued ({exc}).")
+        print(
+            "Hint: bench --site <site> execute ai_powered_css.api.chat.build_quick_reply_answers "
+            f"--kwargs \"{{'kb_revision': '{kb_revision}'}}\""
+        )
+        return
+    print(f"Queued quick-reply answer warm-up for KB revision {kb_revision}.")
+
+
 if __name__ == "__main__":
     raise SystemExit(main())
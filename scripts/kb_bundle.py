@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""Packed KB bundle: every article in one file, plus a sidecar offset index.
+
+Layout of `kb.bundle`: a header (b"KBB1", a codec id, and a length-prefixed zstd dictionary trained on the
+records, empty for zlib), then one record per article, each a 4-byte big-endian length followed by the
+compressed JSON record. English records are written before their Hindi
+variant. A Hindi record holds only the fields that differ from the English doc (`_base` names it), so metadata
+is not stored twice. `kb.bundle.idx` maps doc_id/lang to (offset, length) for mmap random access; streaming
+iteration reads the bundle front to back and needs no index.
+
+  python3 scripts/kb_bundle.py pack   [--articles data/kb/articles] [--bundle data/kb/kb.bundle]
+  python3 scripts/kb_bundle.py unpack [--bundle data/kb/kb.bundle] [--articles data/kb/articles]
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import mmap
+import os
+import struct
+import zlib
+from pathlib import Path
+from typing import Iterable, Iterator
+
+ARTICLE_DIR = Path("data/kb/articles")
+BUNDLE_PATH = Path("data/kb/kb.bundle")
+MAGIC = b"KBB1"
+_LENGTH = struct.Struct(">I")
+_CODEC_IDS = {"zlib": 1, "zstd": 2}
+DICT_SIZE = 16384
+
+
+def _zstd():
+    import zstandard
+
+    return zstandard
+
+
+def default_codec() -> str:
+    try:
+        _zstd()
+    except ImportError:
+        return "zlib"
+    return "zstd"
+
+
+def _train_dictionary(codec: str, samples: list[bytes]) -> bytes:
+    # Records are compressed one by one for random access; a shared dictionary wins back the cross-record context.
+    if codec != "zstd":
+        return b""
+    try:
+        return _zstd().train_dictionary(DICT_SIZE, samples).as_bytes()
+    except Exception:
+        # Too few or too small samples to train on.
+        return b""
+
+
+def _compressor(codec: str, dictionary: bytes = b""):
+    if codec == "zstd":
+        zstd = _zstd()
+        dict_data = zstd.ZstdCompressionDict(dictionary) if dictionary else None
+        return zstd.ZstdCompressor(level=10, dict_data=dict_data).compress
+    return lambda data: zlib.compress(data, 9)
+
+
+def _decompressor(codec: str, dictionary: bytes = b""):
+    if codec == "zstd":
+        zstd = _zstd()
+        dict_data = zstd.ZstdCompressionDict(dictionary) if dictionary else None
+        return zstd.ZstdDecompressor(dict_data=dict_data).decompress
+    return zlib.decompress
+
+
+def article_filename(doc: dict) -> str:
+    return f"{doc['doc_id']}.hi.json" if doc.get("lang") == "hi" else f"{doc['doc_id']}.json"
+
+
+def iter_article_files(article_dir: Path = ARTICLE_DIR) -> Iterator[dict]:
+    """Per-file layout, in file-name order."""
+    for path in sorted(article_dir.glob("*.json")):
+        yield json.loads(path.read_text(encoding="utf-8"))
+
+
+def iter_articles(article_dir: Path = ARTICLE_DIR, bundle: Path | str | None = None) -> Iterator[dict]:
+    """Articles from a bundle when one is given, otherwise from the per-file layout."""
+    if bundle:
+        with KBBundle(Path(bundle)) as reader:
+            yield from reader
+    else:
+        yield from iter_article_files(article_dir)
+
+
+def _delta(doc: dict, base: dict) -> dict:
+    record = {"_base": base["doc_id"], **{key: value for key, value in doc.items() if base.get(key, object()) != value}}
+    missing = [key for key in base if key not in doc]
+    if missing:
+        record["_drop"] = missing
+    if list(_apply_delta(record, base)) != list(doc):
+        record["_keys"] = list(doc)
+    return record
+
+
+def _apply_delta(record: dict, base: dict) -> dict:
+    merged = {**base, **{key: value for key, value in record.items() if not key.startswith("_")}}
+    for key in record.get("_drop", ()):
+        merged.pop(key, None)
+    if "_keys" in record:
+        return {key: merged[key] for key in record["_keys"]}
+    return merged
+
+
+def write_bundle(docs: Iterable[dict], path: Path = BUNDLE_PATH, codec: str | None = None) -> dict[str, int]:
+    """Write docs (any order) as a bundle plus its index; returns record counts by lang."""
+    codec = codec or default_codec()
+    by_id: dict[str, dict[str, dict]] = {}
+    for doc in docs:
+        by_id.setdefault(doc["doc_id"], {})[doc.get("lang", "en")] = doc
+
+    records: list[tuple[str, str, bytes]] = []
+    for doc_id in sorted(by_id):
+        variants = by_id[doc_id]
+        base = variants.get("en")
+        # English first so a streaming reader always has the base before the Hindi delta.
+        for lang in sorted(variants, key=lambda lang: (lang != "en", lang)):
+            doc = variants[lang]
+            record = _delta(doc, base) if base is not None and lang != "en" else doc
+            records.append((doc_id, lang, json.dumps(record, ensure_ascii=False, separators=(",", ":")).encode("utf-8")))
+    dictionary = _train_dictionary(codec, [raw for _, _, raw in records])
+    compress = _compressor(codec, dictionary)
+
+    index: dict[str, dict[str, list[int]]] = {}
+    counts: dict[str, int] = {}
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    with tmp.open("wb") as out:
+        out.write(MAGIC + bytes([_CODEC_IDS[codec]]) + _LENGTH.pack(len(dictionary)) + dictionary)
+        for doc_id, lang, raw in records:
+            payload = compress(raw)
+            index.setdefault(doc_id, {})[lang] = [out.tell(), _LENGTH.size + len(payload)]
+            out.write(_LENGTH.pack(len(payload)))
+            out.write(payload)
+            counts[lang] = counts.get(lang, 0) + 1
+        size = out.tell()
+    os.replace(tmp, path)
+    index_path = path.with_suffix(path.suffix + ".idx")
+    index_path.write_text(
+        json.dumps({"version": 1, "codec": codec, "bundle_size": size, "records": index}, separators=(",", ":")),
+        encoding="utf-8",
+    )
+    return counts
+
+
+class KBBundle:
+    """Read access to a bundle: `get(doc_id, lang)` through the mmap and index, or stream with iteration."""
+
+    def __init__(self, path: Path = BUNDLE_PATH):
+        self.path = path
+        self._file = path.open("rb")
+        header = self._file.read(len(MAGIC) + 1 + _LENGTH.size)
+        if header[: len(MAGIC)] != MAGIC:
+            self._file.close()
+            raise ValueError(f"{path} is not a KB bundle")
+        self.codec = {value: key for key, value in _CODEC_IDS.items()}[header[len(MAGIC)]]
+        (dict_length,) = _LENGTH.unpack(header[len(MAGIC) + 1 :])
+        self._decompress = _decompressor(self.codec, self._file.read(dict_length))
+        self._records_start = len(header) + dict_length
+        self._mmap: mmap.mmap | None = None
+        self._index: dict[str, dict[str, list[int]]] | None = None
+
+    def __enter__(self) -> KBBundle:
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        if self._mmap is not None:
+            self._mmap.close()
+        self._file.close()
+
+    @property
+    def index(self) -> dict[str, dict[str, list[int]]]:
+        if self._index is None:
+            data = json.loads(self.path.with_suffix(self.path.suffix + ".idx").read_text(encoding="utf-8"))
+            if data.get("bundle_size") != self.path.stat().st_size:
+                raise ValueError(f"{self.path}.idx does not match the bundle; re-run kb_bundle.py pack")
+            self._index = data["records"]
+        return self._index
+
+    def _record(self, offset: int, length: int) -> dict:
+        if self._mmap is None:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        return json.loads(self._decompress(self._mmap[offset + _LENGTH.size : offset + length]))
+
+    def get(self, doc_id: str, lang: str = "en") -> dict | None:
+        location = self.index.get(doc_id, {}).get(lang)
+        if location is None:
+            return None
+        record = self._record(*location)
+        if "_base" in record:
+            return _apply_delta(record, self._record(*self.index[record["_base"]]["en"]))
+        return record
+
+    def __len__(self) -> int:
+        return sum(len(variants) for variants in self.index.values())
+
+    def __iter__(self) -> Iterator[dict]:
+        # Sequential read with a fresh handle, so iteration does not disturb get() or need the index.
+        with self.path.open("rb") as stream:
+            stream.seek(self._records_start)
+            base: dict | None = None
+            while header := stream.read(_LENGTH.size):
+                (length,) = _LENGTH.unpack(header)
+                record = json.loads(self._decompress(stream.read(length)))
+                if "_base" in record:
+                    yield _apply_delta(record, base if base and base["doc_id"] == record["_base"] else self.get(record["_base"]))
+                else:
+                    base = record
+                    yield record
+
+
+def pack(article_dir: Path = ARTICLE_DIR, path: Path = BUNDLE_PATH, codec: str | None = None) -> dict[str, int]:
+    return write_bundle(iter_article_files(article_dir), path, codec)
+
+
+def unpack(path: Path = BUNDLE_PATH, article_dir: Path = ARTICLE_DIR) -> int:
+    # Same formatting as fetch_bms_kb.write_article, so a pack/unpack round trip leaves git clean.
+    article_dir.mkdir(parents=True, exist_ok=True)
+    count = 0
+    with KBBundle(path) as reader:
+        for doc in reader:
+            (article_dir / article_filename(doc)).write_text(json.dumps(doc, ensure_ascii=False, indent=2), encoding="utf-8")
+            count += 1
+    return count
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("command", choices=["pack", "unpack"])
+    parser.add_argument("--articles", default=str(ARTICLE_DIR))
+    parser.add_argument("--bundle", default=str(BUNDLE_PATH))
+    parser.add_argument("--codec", choices=sorted(_CODEC_IDS), default=None, help="Default: zstd when installed, else zlib")
+    args = parser.parse_args()
+
+    bundle = Path(args.bundle)
+    if args.command == "pack":
+        counts = pack(Path(args.articles), bundle, args.codec)
+        files_size = sum(p.stat().st_size for p in Path(args.articles).glob("*.json"))
+        print(f"Packed {sum(counts.values())} articles ({', '.join(f'{k}: {v}' for k, v in sorted(counts.items()))})")
+        print(f"{files_size} bytes in per-file layout -> {bundle.stat().st_size} bytes in {bundle}")
+    else:
+        print(f"Unpacked {unpack(bundle, Path(args.articles))} articles into {args.articles}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
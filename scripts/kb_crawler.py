@@ -0,0 +1,440 @@
+"""Async crawl engine for the KB scripts: bounded worker pool, per-host token buckets, resumable state.
+
+The crawler only fetches and schedules. What a page means (links, category, article body) is decided by the
+`handler` callable, which runs in an executor so parsing never blocks the event loop.
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import os
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable
+from urllib.parse import urlparse
+
+import httpx
+
+PAGE = "page"
+ARTICLE = "article"
+
+
+@dataclass
+class PageOutcome:
+    title: str = ""
+    links: list[str] = field(default_factory=list)
+    # Articles only: whether it counts towards max_articles, and an optional JSON record kept in the crawl state.
+    accepted: bool = False
+    record: dict[str, Any] | None = None
+
+
+# handler(url, html, kind, category_hint) -> PageOutcome
+Handler = Callable[[str, str, str, "str | None"], PageOutcome]
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: float = 1.0, clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.capacity = max(burst, 1.0)
+        self._tokens = self.capacity
+        self._clock = clock
+        self._updated = clock()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        if self.rate <= 0:
+            return
+        async with self._lock:
+            while True:
+                now = self._clock()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return
+                await asyncio.sleep((1.0 - self._tokens) / self.rate)
+
+
+class AdaptiveTokenBucket(TokenBucket):
+    """Token bucket that halves its rate on 429/503 (pausing for Retry-After) and creeps back while requests succeed."""
+
+    def __init__(
+        self, rate: float, min_rate: float = 0.5, burst: float = 1.0, clock: Callable[[], float] = time.monotonic
+    ):
+        super().__init__(rate, burst, clock)
+        self.max_rate = rate
+        self.min_rate = min(min_rate, rate)
+        self.step = max(rate / 20, 0.05)
+        self._paused_until = 0.0
+
+    def throttled(self, retry_after: float | None = None) -> None:
+        self.rate = max(self.min_rate, self.rate / 2)
+        if retry_after:
+            self._paused_until = max(self._paused_until, self._clock() + retry_after)
+
+    def succeeded(self) -> None:
+        self.rate = min(self.max_rate, self.rate + self.step)
+
+    async def acquire(self) -> None:
+        delay = self._paused_until - self._clock()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        await super().acquire()
+
+
+@dataclass
+class CrawlState:
+    pages: deque = field(default_factory=deque)
+    articles: deque = field(default_factory=deque)
+    visited: set = field(default_factory=set)
+    category_hint: dict = field(default_factory=dict)
+    discovered: list = field(default_factory=list)
+    blocked: list = field(default_factory=list)
+    records: list = field(default_factory=list)
+    fetched_pages: int = 0
+    accepted_articles: int = 0
+
+    @classmethod
+    def from_seeds(cls, seeds: list[str], is_article: Callable[[str], bool]) -> CrawlState:
+        state = cls()
+        for seed in seeds:
+            (state.articles if is_article(seed) else state.pages).append((seed, 0))
+        return state
+
+    @classmethod
+    def load(cls, path: Path) -> CrawlState:
+        data = json.loads(path.read_text(encoding="utf-8"))
+        return cls(
+            pages=deque(tuple(item) for item in data.get("pages", [])),
+            articles=deque(tuple(item) for item in data.get("articles", [])),
+            visited=set(data.get("visited", [])),
+            category_hint=dict(data.get("category_hint", {})),
+            discovered=list(data.get("discovered", [])),
+            blocked=list(data.get("blocked", [])),
+            records=list(data.get("records", [])),
+            fetched_pages=int(data.get("fetched_pages", 0)),
+            accepted_articles=int(data.get("accepted_articles", 0)),
+        )
+
+    def save(self, path: Path, in_flight: dict[str, tuple[str, int]] | None = None) -> None:
+        pages = list(self.pages)
+        articles = list(self.articles)
+        visited = set(self.visited)
+        fetched_pages = self.fetched_pages
+        # Work that was mid-fetch is put back at the front so a resumed crawl picks it up first.
+        for url, (kind, depth) in (in_flight or {}).items():
+            (articles if kind == ARTICLE else pages).insert(0, (url, depth))
+            visited.discard(url)
+            if kind == PAGE:
+                fetched_pages -= 1
+        data = {
+            "saved_at": datetime.now(timezone.utc).isoformat(),
+            "pages": pages,
+            "articles": articles,
+            "visited": sorted(visited),
+            "category_hint": self.category_hint,
+            "discovered": self.discovered,
+            "blocked": self.blocked,
+            "records": self.records,
+            "fetched_pages": fetched_pages,
+            "accepted_articles": self.accepted_articles,
+        }
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(path.suffix + ".tmp")
+        tmp.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, path)
+
+
+class ValidatorStore:
+    """Per-URL HTTP validators plus the outcome they produced, so unchanged pages skip download and parsing."""
+
+    def __init__(self, path: Path | None = None):
+        self.path = path
+        self.entries: dict[str, dict[str, Any]] = {}
+        if path and path.exists():
+            self.entries = json.loads(path.read_text(encoding="utf-8"))
+
+    def conditional_headers(self, url: str) -> dict[str, str]:
+        entry = self.entries.get(url) or {}
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def cached_outcome(self, url: str, body_hash: str | None = None) -> tuple[dict[str, Any], PageOutcome] | None:
+        # body_hash given: only reuse when the downloaded body is byte-identical to the one that was parsed.
+        entry = self.entries.get(url)
+        if not entry or "outcome" not in entry or (body_hash and entry.get("body_hash") != body_hash):
+            return None
+        cached = entry["outcome"]
+        record = cached.get("record")
+        if record is not None and "updated" in record:
+            record = {**record, "updated": False}
+        return entry, PageOutcome(
+            title=cached.get("title", ""), links=list(cached.get("links", [])), accepted=cached.get("accepted", False), record=record
+        )
+
+    def update(
+        self, url: str, *, etag: str | None, last_modified: str | None, body_hash: str, size: int, parse_seconds: float,
+        outcome: PageOutcome,
+    ) -> None:
+        self.entries[url] = {
+            "etag": etag,
+            "last_modified": last_modified,
+            "body_hash": body_hash,
+            "size": size,
+            "parse_seconds": round(parse_seconds, 6),
+            "outcome": {"title": outcome.title, "links": outcome.links, "accepted": outcome.accepted, "record": outcome.record},
+        }
+
+    def save(self) -> None:
+        if not self.path:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+        tmp.write_text(json.dumps(self.entries, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, self.path)
+
+
+class Crawler:
+    def __init__(
+        self,
+        state: CrawlState,
+        handler: Handler,
+        is_article: Callable[[str], bool],
+        *,
+        max_pages: int = 0,
+        max_articles: int = 0,
+        max_depth: int = 3,
+        concurrency: int = 8,
+        rate_per_host: float = 2.0,
+        burst: float = 2.0,
+        retries: int = 3,
+        user_agent: str | None = None,
+        timeout: float = 20.0,
+        state_path: Path | None = None,
+        checkpoint_every: int = 25,
+        executor=None,
+        validators: ValidatorStore | None = None,
+        log: Callable[[str], None] = print,
+    ):
+        self.state = state
+        self.handler = handler
+        self.is_article = is_article
+        self.max_pages = max_pages
+        self.max_articles = max_articles
+        self.max_depth = max_depth
+        self.concurrency = max(concurrency, 1)
+        self.rate_per_host = rate_per_host
+        self.burst = burst
+        self.retries = retries
+        self.user_agent = user_agent
+        self.timeout = timeout
+        self.state_path = state_path
+        self.checkpoint_every = checkpoint_every
+        self.executor = executor
+        self.validators = validators
+        self.log = log
+        self.stats = {
+            "downloaded": 0,
+            "not_modified": 0,
+            "unchanged_body": 0,
+            "bytes_downloaded": 0,
+            "bytes_saved": 0,
+            "parse_seconds": 0.0,
+            "parse_seconds_saved": 0.0,
+        }
+        self._buckets: dict[str, TokenBucket] = {}
+        # Everything ever queued, so links repeated across pages enter the frontier once.
+        self._queued: set[str] = set(state.visited) | {url for url, _ in state.pages} | {url for url, _ in state.articles}
+        self._in_flight: dict[str, tuple[str, int]] = {}
+        self._reserved_articles = 0
+        self._completed = 0
+        self._cond: asyncio.Condition | None = None
+
+    def _bucket(self, url: str) -> TokenBucket:
+        host = urlparse(url).netloc.lower()
+        bucket = self._buckets.get(host)
+        if bucket is None:
+            bucket = self._buckets[host] = TokenBucket(self.rate_per_host, self.burst)
+        return bucket
+
+    def _next_item(self) -> tuple[str, str, int] | None:
+        # Articles first, so results stream out while discovery is still running.
+        state = self.state
+        while state.articles:
+            if self.max_articles and state.accepted_articles + self._reserved_articles >= self.max_articles:
+                break
+            url, depth = state.articles.popleft()
+            if url not in state.visited:
+                self._reserved_articles += 1
+                return ARTICLE, url, depth
+        while state.pages:
+            if self.max_pages and state.fetched_pages >= self.max_pages:
+                break
+            url, depth = state.pages.popleft()
+            if url not in state.visited:
+                state.fetched_pages += 1
+                return PAGE, url, depth
+        return None
+
+    def _schedule(self, links: list[str], depth: int, category: str | None) -> None:
+        state = self.state
+        for link in links:
+            if self.is_article(link):
+                if category and link not in state.category_hint:
+                    state.category_hint[link] = category
+                if link not in self._queued:
+                    self._queued.add(link)
+                    state.articles.append((link, depth + 1))
+            elif link not in self._queued and depth + 1 <= self.max_depth:
+                self._queued.add(link)
+                state.pages.append((link, depth + 1))
+
+    def _block(self, url: str, status: str) -> None:
+        self.state.blocked.append({"url": url, "status": status, "fetched_at": datetime.now(timezone.utc).isoformat()})
+
+    async def _fetch(self, client: httpx.AsyncClient, url: str) -> httpx.Response:
+        headers = self.validators.conditional_headers(url) if self.validators else None
+        for attempt in range(1, self.retries + 1):
+            await self._bucket(url).acquire()
+            try:
+                resp = await client.get(url, headers=headers)
+                if resp.status_code in (429, 503) and attempt < self.retries:
+                    retry_after = resp.headers.get("Retry-After", "")
+                    await asyncio.sleep(min(float(retry_after), 30.0) if retry_after.isdigit() else 1.5 * attempt)
+                    continue
+                if resp.status_code >= 400:
+                    raise RuntimeError(f"HTTP {resp.status_code}")
+                return resp
+            except Exception:
+                if attempt == self.retries:
+                    raise
+                await asyncio.sleep(1.5 * attempt)
+        raise RuntimeError("no response")
+
+    def _fetch_failed(self, kind: str, url: str, exc: Exception) -> None:
+        self.log(f"WARN: Failed to fetch {url}: {exc}")
+        self._block(url, str(exc))
+        if kind == PAGE:
+            # Give the max_pages slot back; only pages that were actually fetched count.
+            self.state.fetched_pages -= 1
+
+    def _reuse(self, entry: dict[str, Any], counter: str, size_saved: int) -> None:
+        self.stats[counter] += 1
+        self.stats["bytes_saved"] += size_saved
+        self.stats["parse_seconds_saved"] += entry.get("parse_seconds") or 0.0
+
+    async def _process(self, client: httpx.AsyncClient, kind: str, url: str, depth: int) -> None:
+        state = self.state
+        try:
+            resp = await self._fetch(client, url)
+        except Exception as exc:
+            self._fetch_failed(kind, url, exc)
+            return
+
+        cached = None
+        if self.validators is not None:
+            if resp.status_code == 304:
+                cached = self.validators.cached_outcome(url)
+                if cached:
+                    self._reuse(cached[0], "not_modified", cached[0].get("size") or 0)
+            else:
+                self.stats["downloaded"] += 1
+                self.stats["bytes_downloaded"] += len(resp.content)
+                body_hash = hashlib.sha256(resp.content).hexdigest()
+                # Servers without validators: an identical body still skips parsing.
+                cached = self.validators.cached_outcome(url, body_hash)
+                if cached:
+                    self._reuse(cached[0], "unchanged_body", 0)
+
+        if cached:
+            outcome = cached[1]
+        else:
+            if resp.status_code == 304:
+                # 304 without a stored outcome (validators kept, outcome lost): fetch the full page once more.
+                self.validators.entries.pop(url, None)
+                try:
+                    resp = await self._fetch(client, url)
+                except Exception as exc:
+                    self._fetch_failed(kind, url, exc)
+                    return
+            loop = asyncio.get_running_loop()
+            started = time.perf_counter()
+            try:
+                outcome = await loop.run_in_executor(
+                    self.executor, self.handler, url, resp.text, kind, state.category_hint.get(url)
+                )
+            except Exception as exc:
+                self.log(f"WARN: Failed to parse {url}: {exc}")
+                self._block(url, f"parse: {exc}")
+                return
+            parse_seconds = time.perf_counter() - started
+            self.stats["parse_seconds"] += parse_seconds
+            if self.validators is not None:
+                self.validators.update(
+                    url,
+                    etag=resp.headers.get("ETag"),
+                    last_modified=resp.headers.get("Last-Modified"),
+                    body_hash=hashlib.sha256(resp.content).hexdigest(),
+                    size=len(resp.content),
+                    parse_seconds=parse_seconds,
+                    outcome=outcome,
+                )
+        if kind == ARTICLE and outcome.accepted:
+            state.accepted_articles += 1
+            if outcome.record is not None:
+                state.records.append(outcome.record)
+        self._schedule(outcome.links, depth, outcome.title.strip() or None)
+
+    async def _worker(self, client: httpx.AsyncClient) -> None:
+        assert self._cond is not None
+        while True:
+            async with self._cond:
+                while True:
+                    item = self._next_item()
+                    if item is not None or not self._in_flight:
+                        break
+                    await self._cond.wait()
+                if item is None:
+                    self._cond.notify_all()
+                    return
+                kind, url, depth = item
+                self.state.visited.add(url)
+                self.state.discovered.append(url)
+                self._in_flight[url] = (kind, depth)
+            self.log(f"Fetching {kind}: {url}")
+            # On cancellation the URL stays in _in_flight, so the final checkpoint re-queues it.
+            await self._process(client, kind, url, depth)
+            async with self._cond:
+                self._in_flight.pop(url, None)
+                if kind == ARTICLE:
+                    self._reserved_articles -= 1
+                self._completed += 1
+                if self.state_path and self.checkpoint_every and self._completed % self.checkpoint_every == 0:
+                    self.state.save(self.state_path, self._in_flight)
+                    if self.validators is not None:
+                        self.validators.save()
+                self._cond.notify_all()
+
+    async def run(self) -> CrawlState:
+        self._cond = asyncio.Condition()
+        headers = {"User-Agent": self.user_agent} if self.user_agent else None
+        limits = httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency)
+        try:
+            async with httpx.AsyncClient(
+                headers=headers, timeout=self.timeout, limits=limits, follow_redirects=True
+            ) as client:
+                await asyncio.gather(*(self._worker(client) for _ in range(self.concurrency)))
+        finally:
+            if self.state_path:
+                self.state.save(self.state_path, self._in_flight)
+            if self.validators is not None:
+                self.validators.save()
+        return self.state
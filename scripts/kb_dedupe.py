@@ -0,0 +1,162 @@
+"""Near-duplicate detection for KB articles (MinHash + LSH over character shingles, exact Jaccard to confirm).
+
+fetch_bms_kb.py runs it after a crawl. It picks one canonical article per cluster, records the others' ids and
+source URLs on it (`aliases`, `alias_urls`), marks the others with `duplicate_of`, and writes
+data/kb/sources/duplicates.json. translate_kb_hi.py and init_kb.py skip every doc_id listed there.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import re
+import zlib
+from pathlib import Path
+from typing import Iterable
+
+DUPLICATES_PATH = Path("data/kb/sources/duplicates.json")
+# Character shingles survive typos and small rewordings that break word n-grams on short FAQ answers.
+SHINGLE = 5
+NUM_PERM = 64
+BANDS = 16  # 16 bands x 4 rows: pairs above ~0.5 Jaccard become candidates, then the exact check applies.
+THRESHOLD = 0.8
+# Republished copies often keep the question and reword the answer (e.g. the two "Can BMS Cash be encashed?").
+SAME_TITLE_THRESHOLD = 0.5
+
+_rng = random.Random(20240128)
+_MASKS = [_rng.getrandbits(32) for _ in range(NUM_PERM)]
+_WORD = re.compile(r"\w+")
+
+
+def normalize(text: str) -> str:
+    return " ".join(_WORD.findall(text.lower()))
+
+
+def shingles(text: str, size: int = SHINGLE) -> set[str]:
+    text = normalize(text)
+    return {text[i : i + size] for i in range(max(len(text) - size + 1, 1))}
+
+
+def minhash(features: set[str]) -> tuple[int, ...]:
+    # crc32 is stable across runs (unlike hash()); XOR with random masks stands in for 64 permutations.
+    hashes = [zlib.crc32(feature.encode("utf-8")) for feature in features]
+    return tuple(min([h ^ mask for h in hashes]) for mask in _MASKS)
+
+
+def jaccard(a: set[str], b: set[str]) -> float:
+    return len(a & b) / len(a | b) if a or b else 1.0
+
+
+def find_clusters(
+    docs: dict[str, tuple[str, str]], threshold: float = THRESHOLD, same_title_threshold: float = SAME_TITLE_THRESHOLD
+) -> list[list[str]]:
+    """Group doc ids by body similarity; docs: doc_id -> (title, body). Returns clusters of two or more ids."""
+    features = {doc_id: shingles(body) for doc_id, (_, body) in docs.items()}
+    titles = {doc_id: normalize(title) for doc_id, (title, _) in docs.items()}
+    rows = NUM_PERM // BANDS
+    buckets: dict[tuple, list[str]] = {}
+    for doc_id in sorted(features):
+        signature = minhash(features[doc_id])
+        for band in range(BANDS):
+            buckets.setdefault((band, signature[band * rows : (band + 1) * rows]), []).append(doc_id)
+        if titles[doc_id]:
+            buckets.setdefault(("title", titles[doc_id]), []).append(doc_id)
+
+    parent = {doc_id: doc_id for doc_id in features}
+
+    def find(doc_id: str) -> str:
+        while parent[doc_id] != doc_id:
+            parent[doc_id] = parent[parent[doc_id]]
+            doc_id = parent[doc_id]
+        return doc_id
+
+    checked: set[tuple[str, str]] = set()
+    for members in buckets.values():
+        for i, left in enumerate(members):
+            for right in members[i + 1 :]:
+                if (left, right) in checked:
+                    continue
+                checked.add((left, right))
+                similarity = jaccard(features[left], features[right])
+                same_title = bool(titles[left]) and titles[left] == titles[right]
+                if similarity >= threshold or (same_title and similarity >= same_title_threshold):
+                    parent[find(right)] = find(left)
+
+    clusters: dict[str, list[str]] = {}
+    for doc_id in sorted(features):
+        clusters.setdefault(find(doc_id), []).append(doc_id)
+    return [members for members in clusters.values() if len(members) > 1]
+
+
+def pick_canonical(cluster: list[str], docs: dict[str, dict]) -> str:
+    # Longest body keeps the most information; doc_id breaks ties so reruns agree.
+    return min(cluster, key=lambda doc_id: (-len(docs[doc_id].get("body", "")), doc_id))
+
+
+def load_duplicates(path: Path = DUPLICATES_PATH) -> dict[str, str]:
+    """duplicate doc_id -> canonical doc_id ({} when dedupe has not run)."""
+    if not path.exists():
+        return {}
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def dedupe_articles(
+    article_dir: Path, path: Path = DUPLICATES_PATH, threshold: float = THRESHOLD
+) -> dict[str, str]:
+    """Cluster the English articles in article_dir, annotate them in place and write the duplicates map."""
+    docs: dict[str, dict] = {}
+    files: dict[str, Path] = {}
+    for file in sorted(article_dir.glob("*.json")):
+        if file.name.endswith(".hi.json"):
+            continue
+        doc = json.loads(file.read_text(encoding="utf-8"))
+        docs[doc["doc_id"]] = doc
+        files[doc["doc_id"]] = file
+
+    duplicates: dict[str, str] = {}
+    canonical_of: dict[str, list[str]] = {}
+    bodies = {doc_id: (doc.get("title", ""), doc.get("body", "")) for doc_id, doc in docs.items()}
+    for cluster in find_clusters(bodies, threshold):
+        canonical = pick_canonical(cluster, docs)
+        canonical_of[canonical] = [doc_id for doc_id in cluster if doc_id != canonical]
+        duplicates.update({doc_id: canonical for doc_id in canonical_of[canonical]})
+
+    for doc_id, doc in docs.items():
+        updated = dict(doc)
+        for key in ("aliases", "alias_urls", "duplicate_of"):
+            updated.pop(key, None)
+        if doc_id in canonical_of:
+            aliases = canonical_of[doc_id]
+            updated["aliases"] = aliases
+            updated["alias_urls"] = sorted({docs[alias]["source_url"] for alias in aliases if docs[alias].get("source_url")})
+        elif doc_id in duplicates:
+            updated["duplicate_of"] = duplicates[doc_id]
+        if updated != doc:
+            files[doc_id].write_text(json.dumps(updated, ensure_ascii=False, indent=2), encoding="utf-8")
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(duplicates, ensure_ascii=False, indent=2, sort_keys=True), encoding="utf-8")
+    return duplicates
+
+
+def skip_duplicates(docs: Iterable[dict], duplicates: dict[str, str]) -> list[dict]:
+    # Translations share the English doc_id, so one lookup covers both languages.
+    return [doc for doc in docs if doc.get("doc_id") not in duplicates]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--articles", default="data/kb/articles")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD)
+    args = parser.parse_args()
+
+    duplicates = dedupe_articles(Path(args.articles), threshold=args.threshold)
+    canonical = sorted(set(duplicates.values()))
+    print(f"Near-duplicates: {len(duplicates)} articles folded into {len(canonical)} canonical articles")
+    for doc_id in canonical:
+        print(f"  {doc_id} <- {', '.join(sorted(k for k, v in duplicates.items() if v == doc_id))}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,260 @@
+"""HTML extraction backends for the KB crawler: title, links and cleaned article body.
+
+`bs4` (html.parser) is the reference implementation; `lxml` and `selectolax` are optional and produce the
+same output on the KB pages (see scripts/tests/test_kb_extract.py). Pick one with KB_EXTRACTOR, or leave it
+on `auto` to use the fastest backend that is installed.
+"""
+from __future__ import annotations
+
+import os
+import re
+from dataclasses import dataclass, field
+from typing import Callable
+
+DROP_TAGS = ("script", "style", "noscript", "header", "footer", "nav", "form", "button", "input", "svg", "canvas", "iframe")
+NOISE_SELECTORS = (
+    ".breadcrumb",
+    ".breadcrumbs",
+    ".related",
+    ".recommended",
+    ".feedback",
+    ".helpful",
+    ".sidebar",
+    ".search",
+    ".article-footer",
+    ".article__footer",
+    ".article__header",
+    ".solution-footer",
+    ".share",
+    ".social",
+    ".print",
+    ".pagination",
+    ".pager",
+)
+# Checked in order; the first node with more than MIN_CONTENT_CHARS of text wins.
+CONTENT_SELECTORS = (
+    ".article-body",
+    ".article__content",
+    ".article-content",
+    ".content-body",
+    ".kb-article",
+    ".solution-article",
+    ".solutions-article",
+    "article",
+    "main",
+    ".content",
+    ".help-center",
+)
+MIN_CONTENT_CHARS = 200
+
+_DROP_SELECTOR = ", ".join((*DROP_TAGS, *NOISE_SELECTORS))
+_STRIP_PATTERNS = [
+    re.compile(p, re.IGNORECASE)
+    for p in (
+        r"solution home",
+        r"recommended topics",
+        r"did you find it helpful\??",
+        r"send feedback",
+        r"help us improve.*",
+        r"sorry we couldn.?t be helpful.*",
+        r"modified on:\s*[a-z0-9,\s:]+",
+        r"updated on:\s*[a-z0-9,\s:]+",
+        r"\bprint\b",
+        r"\bfaq'?s?\b",
+        r"powered by freshdesk",
+        r"\bback to top\b",
+        r"\bsubmit a request\b",
+    )
+]
+_SKIP_LINE = re.compile(r"^home\s*/|^yes$|^no$|^search$|^share$", re.IGNORECASE)
+_MULTI_SPACE = re.compile(r"\s{2,}")
+_INLINE_SPACE = re.compile(r"[ \t]+")
+_MULTI_NEWLINE = re.compile(r"\n{3,}")
+
+
+def clean_text(text: str) -> str:
+    cleaned = []
+    seen = set()
+    for line in text.splitlines():
+        line = line.strip()
+        if len(line) <= 2:
+            continue
+        for pattern in _STRIP_PATTERNS:
+            line = pattern.sub("", line)
+        line = _MULTI_SPACE.sub(" ", line).strip(" -|")
+        if len(line) <= 2 or _SKIP_LINE.search(line):
+            continue
+        if "BookMyShow Support Centre" in line and len(line) < 60:
+            continue
+        key = line.lower()
+        if key in seen:
+            continue
+        seen.add(key)
+        cleaned.append(line)
+
+    merged = _INLINE_SPACE.sub(" ", "\n".join(cleaned))
+    return _MULTI_NEWLINE.sub("\n\n", merged).strip()
+
+
+def _join_strings(strings) -> str:
+    # Same as BeautifulSoup's get_text("\n", strip=True): stripped, non-empty text nodes on their own lines.
+    return "\n".join(s for s in (raw.strip() for raw in strings) if s)
+
+
+@dataclass
+class ParsedPage:
+    title: str
+    hrefs: list[str] = field(default_factory=list)
+    # None when the body was not requested (category pages).
+    body: str | None = None
+
+
+def _extract_bs4(html: str, want_body: bool) -> ParsedPage:
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, "html.parser")
+    title = ""
+    if soup.title and soup.title.get_text(strip=True):
+        title = soup.title.get_text(strip=True)
+    else:
+        h1 = soup.find("h1")
+        if h1 and h1.get_text(strip=True):
+            title = h1.get_text(strip=True)
+    # Links before the body: dropping nav/footer nodes would lose them.
+    page = ParsedPage(title=title, hrefs=[a["href"] for a in soup.find_all("a", href=True)])
+    if not want_body:
+        return page
+
+    for node in soup.select(_DROP_SELECTOR):
+        node.decompose()
+    for selector in CONTENT_SELECTORS:
+        for node in soup.select(selector):
+            text = node.get_text("\n", strip=True)
+            if len(text) > MIN_CONTENT_CHARS:
+                page.body = clean_text(text)
+                return page
+    page.body = clean_text((soup.body or soup).get_text("\n", strip=True))
+    return page
+
+
+def _css_to_xpath(selector: str) -> str:
+    if selector.startswith("."):
+        return f"//*[contains(concat(' ', normalize-space(@class), ' '), ' {selector[1:]} ')]"
+    return f"//{selector}"
+
+
+def _lxml_backend() -> Callable[[str, bool], ParsedPage]:
+    import lxml.html
+    from lxml import etree
+
+    # Compiled once per process; lxml has no built-in CSS engine without cssselect, so translate to XPath.
+    drop = etree.XPath(" | ".join(_css_to_xpath(s) for s in (*DROP_TAGS, *NOISE_SELECTORS)))
+    content = [etree.XPath(_css_to_xpath(s)) for s in CONTENT_SELECTORS]
+    text_nodes = etree.XPath(".//text()")
+    first_title = etree.XPath("(//title)[1]")
+    first_h1 = etree.XPath("(//h1)[1]")
+    hrefs = etree.XPath("//a[@href]/@href")
+    body_xpath = etree.XPath("//body")
+
+    def text_of(node) -> str:
+        return _join_strings(text_nodes(node))
+
+    def extract(html: str, want_body: bool) -> ParsedPage:
+        root = lxml.html.document_fromstring(html)
+        title = ""
+        for finder in (first_title, first_h1):
+            found = finder(root)
+            if found and (title := "".join(s.strip() for s in text_nodes(found[0]))):
+                break
+        page = ParsedPage(title=title, hrefs=[str(href) for href in hrefs(root)])
+        if not want_body:
+            return page
+
+        for node in drop(root):
+            node.drop_tree()
+        for finder in content:
+            for node in finder(root):
+                text = text_of(node)
+                if len(text) > MIN_CONTENT_CHARS:
+                    page.body = clean_text(text)
+                    return page
+        body = body_xpath(root)
+        page.body = clean_text(text_of(body[0] if body else root))
+        return page
+
+    return extract
+
+
+def _selectolax_backend() -> Callable[[str, bool], ParsedPage]:
+    try:
+        from selectolax.lexbor import LexborHTMLParser as HTMLParser
+    except ImportError:
+        from selectolax.parser import HTMLParser
+
+    def strings(node):
+        # Text nodes only (comments are "_comment"), like the XPath text() walk in the lxml backend.
+        return (n.text(deep=False) for n in node.traverse(include_text=True) if n.tag == "-text")
+
+    def text_of(node) -> str:
+        return _join_strings(strings(node))
+
+    def extract(html: str, want_body: bool) -> ParsedPage:
+        tree = HTMLParser(html)
+        title = ""
+        for selector in ("title", "h1"):
+            found = tree.css_first(selector)
+            if found is not None and (title := "".join(s.strip() for s in strings(found))):
+                break
+        page = ParsedPage(title=title, hrefs=[node.attributes.get("href") or "" for node in tree.css("a[href]")])
+        if not want_body:
+            return page
+
+        for node in tree.css(_DROP_SELECTOR):
+            node.decompose()
+        for selector in CONTENT_SELECTORS:
+            for node in tree.css(selector):
+                text = text_of(node)
+                if len(text) > MIN_CONTENT_CHARS:
+                    page.body = clean_text(text)
+                    return page
+        page.body = clean_text(text_of(tree.body or tree.root))
+        return page
+
+    return extract
+
+
+_BACKEND_FACTORIES: dict[str, Callable[[], Callable[[str, bool], ParsedPage]]] = {
+    "selectolax": _selectolax_backend,
+    "lxml": _lxml_backend,
+    "bs4": lambda: _extract_bs4,
+}
+# Fastest first; "auto" picks the first one that imports.
+AUTO_ORDER = ("selectolax", "lxml", "bs4")
+_loaded: dict[str, Callable[[str, bool], ParsedPage]] = {}
+
+
+def available_backends() -> list[str]:
+    names = []
+    for name in AUTO_ORDER:
+        try:
+            get_extractor(name)
+        except ImportError:
+            continue
+        names.append(name)
+    return names
+
+
+def get_extractor(name: str | None = None) -> Callable[[str, bool], ParsedPage]:
+    """Return `extract(html, want_body) -> ParsedPage` for the named backend (cached per process)."""
+    name = (name or os.getenv("KB_EXTRACTOR") or "auto").strip().lower()
+    if name == "auto":
+        for candidate in AUTO_ORDER:
+            try:
+                return get_extractor(candidate)
+            except ImportError:
+                continue
+    if name not in _BACKEND_FACTORIES:
+        raise ValueError(f"Unknown KB extractor {name!r}; expected one of: auto, {', '.join(AUTO_ORDER)}")
+    if name not in _loaded:
+        _loaded[name] = _BACKEND_FACTORIES[name]()
+    return _loaded[name]
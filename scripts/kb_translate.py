@@ -0,0 +1,285 @@
+"""Paragraph-level EN->HI translation with a SQLite translation memory.
+
+Article bodies are split into paragraphs (one per line, as written by clean_text). Each paragraph is keyed by
+model + normalized text. Only paragraphs the memory has not seen are sent to the model, packed into JSON
+batches that run concurrently under a shared rate limit. Articles are then reassembled in their original order.
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import unicodedata
+from collections import Counter
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any
+
+from openai import AsyncOpenAI
+
+from kb_crawler import AdaptiveTokenBucket
+
+MEMORY_PATH = Path("data/kb/sources/translation_memory.sqlite")
+CONCURRENCY = int(os.getenv("KB_TRANSLATE_CONCURRENCY", "4"))
+# Chat completion requests per second; halved on 429/5xx and recovered gradually.
+RATE = float(os.getenv("KB_TRANSLATE_RATE", "2"))
+SYSTEM_PROMPT = "You are a professional English-to-Hindi translator."
+BATCH_PROMPT = (
+    "Translate every item of the JSON array `paragraphs` from a support article to Hindi. "
+    "Do not summarize or add any information; keep URLs, numbers, codes and brand names as they are. "
+    'Reply with a JSON object {"translations": [...]} holding exactly one Hindi string per item, in the same order.'
+)
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_paragraph(text: str) -> str:
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFC", text)).strip()
+
+
+def paragraph_key(model: str, text: str) -> str:
+    return hashlib.sha256(f"{model}\x00{normalize_paragraph(text)}".encode("utf-8")).hexdigest()
+
+
+def split_paragraphs(body: str) -> list[str]:
+    return body.strip().split("\n")
+
+
+class TranslationMemory:
+    def __init__(self, path: Path | str = MEMORY_PATH):
+        if str(path) != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(path))
+        self.conn.execute(
+            """
+            create table if not exists translation_memory (
+                key text primary key,
+                model text not null,
+                source text not null,
+                target text not null,
+                tokens integer not null default 0,
+                created_at text not null
+            )
+            """
+        )
+
+    def lookup(self, keys: list[str]) -> dict[str, tuple[str, int]]:
+        found: dict[str, tuple[str, int]] = {}
+        # Stay well under SQLite's bound-parameter limit.
+        for start in range(0, len(keys), 500):
+            chunk = keys[start : start + 500]
+            rows = self.conn.execute(
+                f"select key, target, tokens from translation_memory where key in ({','.join('?' * len(chunk))})", chunk
+            )
+            found.update({key: (target, tokens) for key, target, tokens in rows})
+        return found
+
+    def store(self, model: str, entries: list[tuple[str, str, str, int]]) -> None:
+        # entries: (key, source, target, tokens)
+        now = datetime.now(timezone.utc).isoformat()
+        with self.conn:
+            self.conn.executemany(
+                "insert or replace into translation_memory (key, model, source, target, tokens, created_at) "
+                "values (?, ?, ?, ?, ?, ?)",
+                [(key, model, source, target, tokens, now) for key, source, target, tokens in entries],
+            )
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+class BatchMismatch(ValueError):
+    pass
+
+
+class ParagraphTranslator:
+    def __init__(
+        self,
+        client: Any,
+        model: str,
+        memory: TranslationMemory,
+        *,
+        concurrency: int = 4,
+        rate: float = 2.0,
+        max_batch_chars: int = 6000,
+        max_batch_items: int = 40,
+        retries: int = 4,
+    ):
+        self.client = client
+        self.model = model
+        self.memory = memory
+        self.concurrency = max(concurrency, 1)
+        self.bucket = AdaptiveTokenBucket(rate, min_rate=min(rate, 0.2), burst=self.concurrency)
+        self.max_batch_chars = max_batch_chars
+        self.max_batch_items = max_batch_items
+        self.retries = retries
+        self.stats = {
+            "paragraphs": 0,
+            "unique": 0,
+            "memory_hits": 0,
+            "repeated_in_run": 0,
+            "translated": 0,
+            "requests": 0,
+            "prompt_tokens": 0,
+            "completion_tokens": 0,
+            "tokens_saved": 0,
+        }
+
+    def _pack(self, items: list[tuple[str, str]]) -> list[list[tuple[str, str]]]:
+        batches: list[list[tuple[str, str]]] = []
+        current: list[tuple[str, str]] = []
+        size = 0
+        for item in items:
+            if current and (size + len(item[1]) > self.max_batch_chars or len(current) >= self.max_batch_items):
+                batches.append(current)
+                current, size = [], 0
+            current.append(item)
+            size += len(item[1])
+        if current:
+            batches.append(current)
+        return batches
+
+    async def _request(self, texts: list[str], plain: bool = False) -> tuple[list[str], int]:
+        if plain:
+            # Last resort for a single paragraph the model keeps mangling in JSON mode.
+            content = (
+                "Translate the following support article text to Hindi. "
+                f"Do not summarize or add any information. Output only the Hindi translation.\n\nTEXT:\n{texts[0]}"
+            )
+            options: dict[str, Any] = {}
+        else:
+            content = f"{BATCH_PROMPT}\n\n{json.dumps({'paragraphs': texts}, ensure_ascii=False)}"
+            options = {"response_format": {"type": "json_object"}}
+        for attempt in range(1, self.retries + 1):
+            await self.bucket.acquire()
+            try:
+                response = await self.client.chat.completions.create(
+                    model=self.model,
+                    messages=[{"role": "system", "content": SYSTEM_PROMPT}, {"role": "user", "content": content}],
+                    temperature=0.0,
+                    **options,
+                )
+            except Exception as exc:
+                # openai raises RateLimitError / APIStatusError with a status_code; back off on 429/5xx only.
+                status = getattr(exc, "status_code", None)
+                if attempt == self.retries or (status is not None and status != 429 and status < 500):
+                    raise
+                self.bucket.throttled()
+                await asyncio.sleep(min(2**attempt, 30))
+                continue
+            self.bucket.succeeded()
+            self.stats["requests"] += 1
+            usage = getattr(response, "usage", None)
+            prompt_tokens = getattr(usage, "prompt_tokens", 0) or 0
+            completion_tokens = getattr(usage, "completion_tokens", 0) or 0
+            self.stats["prompt_tokens"] += prompt_tokens
+            self.stats["completion_tokens"] += completion_tokens
+            text = response.choices[0].message.content or ""
+            if plain:
+                return [text.strip()], prompt_tokens + completion_tokens
+            try:
+                translations = json.loads(text or "{}").get("translations")
+            except (json.JSONDecodeError, AttributeError):
+                translations = None
+            if not isinstance(translations, list) or len(translations) != len(texts):
+                raise BatchMismatch(f"expected {len(texts)} translations")
+            return [str(t).strip() for t in translations], prompt_tokens + completion_tokens
+        raise RuntimeError("no attempts left")
+
+    async def _translate_batch(
+        self, batch: list[tuple[str, str]], semaphore: asyncio.Semaphore
+    ) -> dict[str, tuple[str, int]]:
+        async with semaphore:
+            try:
+                translations, tokens = await self._request([text for _, text in batch])
+            except BatchMismatch:
+                translations = None
+                if len(batch) == 1:
+                    translations, tokens = await self._request([batch[0][1]], plain=True)
+        if translations is None:
+            # The model merged or dropped items: split the batch and try the halves.
+            middle = len(batch) // 2
+            halves = await asyncio.gather(
+                self._translate_batch(batch[:middle], semaphore), self._translate_batch(batch[middle:], semaphore)
+            )
+            return {**halves[0], **halves[1]}
+
+        # Batch usage is shared out by source length so the memory knows roughly what each paragraph cost.
+        total_chars = sum(len(text) for _, text in batch) or 1
+        entries = [
+            (key, text, target, round(tokens * len(text) / total_chars)) for (key, text), target in zip(batch, translations)
+        ]
+        # Stored straight away so an interrupted run keeps what it already paid for.
+        self.memory.store(self.model, entries)
+        self.stats["translated"] += len(batch)
+        return {key: (target, cost) for key, _, target, cost in entries}
+
+    async def translate_bodies(self, bodies: list[str]) -> list[str]:
+        """Translate article bodies paragraph by paragraph; returns bodies in the same order."""
+        split = [split_paragraphs(body) for body in bodies]
+        keys = [[paragraph_key(self.model, p) if p.strip() else "" for p in paragraphs] for paragraphs in split]
+        occurrences = Counter(key for paragraph_keys in keys for key in paragraph_keys if key)
+        sources: dict[str, str] = {}
+        for paragraphs, paragraph_keys in zip(split, keys):
+            for paragraph, key in zip(paragraphs, paragraph_keys):
+                if key:
+                    sources.setdefault(key, normalize_paragraph(paragraph))
+
+        known = self.memory.lookup(list(sources))
+        pending = [(key, text) for key, text in sources.items() if key not in known]
+        semaphore = asyncio.Semaphore(self.concurrency)
+        fresh: dict[str, tuple[str, int]] = {}
+        for result in await asyncio.gather(*(self._translate_batch(b, semaphore) for b in self._pack(pending))):
+            fresh.update(result)
+
+        # Memory hits save every occurrence; new paragraphs are paid once and reused for their repeats.
+        self.stats["paragraphs"] += sum(occurrences.values())
+        self.stats["unique"] += len(sources)
+        self.stats["memory_hits"] += sum(occurrences[key] for key in known)
+        self.stats["repeated_in_run"] += sum(occurrences[key] - 1 for key in fresh)
+        self.stats["tokens_saved"] += sum(tokens * occurrences[key] for key, (_, tokens) in known.items())
+        self.stats["tokens_saved"] += sum(tokens * (occurrences[key] - 1) for key, (_, tokens) in fresh.items())
+
+        translated = {key: target for key, (target, _) in {**known, **fresh}.items()}
+        return [
+            "\n".join(translated[key] if key else paragraph for paragraph, key in zip(paragraphs, paragraph_keys))
+            for paragraphs, paragraph_keys in zip(split, keys)
+        ]
+
+    def report(self) -> str:
+        stats = self.stats
+        used = stats["prompt_tokens"] + stats["completion_tokens"]
+        return (
+            f"Paragraphs: {stats['paragraphs']} ({stats['unique']} unique), "
+            f"from memory: {stats['memory_hits']}, repeated in run: {stats['repeated_in_run']}, "
+            f"sent to model: {stats['translated']} in {stats['requests']} requests\n"
+            f"Tokens used: {used} ({stats['prompt_tokens']} prompt, {stats['completion_tokens']} completion), "
+            f"tokens saved: ~{stats['tokens_saved']}"
+        )
+
+
+def translate_bodies(
+    bodies: list[str],
+    *,
+    api_key: str,
+    model: str,
+    memory_path: Path = MEMORY_PATH,
+    concurrency: int = CONCURRENCY,
+    rate: float = RATE,
+) -> tuple[list[str], str]:
+    """Translate bodies to Hindi through the translation memory; returns (bodies, report)."""
+    memory = TranslationMemory(memory_path)
+
+    async def run() -> tuple[list[str], ParagraphTranslator]:
+        async with AsyncOpenAI(api_key=api_key) as client:
+            translator = ParagraphTranslator(client, model, memory, concurrency=concurrency, rate=rate)
+            return await translator.translate_bodies(bodies), translator
+
+    try:
+        translated, translator = asyncio.run(run())
+    finally:
+        memory.close()
+    return translated, translator.report()
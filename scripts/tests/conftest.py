@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# The KB scripts are run as plain files (python3 scripts/...), so import them the same way.
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
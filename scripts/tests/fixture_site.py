@@ -0,0 +1,142 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ARTICLE_BODY = "This paragraph explains refunds for cancelled shows in detail. " * 6
+
+
+def _page(title: str, links: list[str], body: str = "") -> str:
+    anchors = "".join(f'<a href="{href}">{href}</a>' for href in links)
+    return f"<html><head><title>{title}</title></head><body><nav>{anchors}</nav><article>{body}</article></body></html>"
+
+
+# Two category pages that cross-link, six articles (one linked from both), one broken link.
+PAGES = {
+    "/support/solutions": _page("Home", ["/support/solutions/folders/1", "/support/solutions/folders/2"]),
+    "/support/solutions/folders/1": _page(
+        "Refunds",
+        ["/support/solutions/folders/2", *(f"/support/solutions/articles/{i}" for i in (1, 2, 3)), "/support/solutions/missing"],
+    ),
+    "/support/solutions/folders/2": _page(
+        "Payments", ["/support/solutions/folders/1", *(f"/support/solutions/articles/{i}" for i in (3, 4, 5, 6))]
+    ),
+    **{
+        f"/support/solutions/articles/{i}": _page(f"Article {i}", ["/support/solutions/folders/1"], ARTICLE_BODY)
+        for i in range(1, 7)
+    },
+}
+
+
+class FixtureSite:
+    """Small KB site on 127.0.0.1 that counts requests per path (and 304s when validators are enabled)."""
+
+    def __init__(self, pages: dict[str, str] | None = None, validators: bool = False, delay: float = 0.0):
+        self.pages = dict(pages or PAGES)
+        self.validators = validators
+        self.delay = delay
+        self.hits: Counter = Counter()
+        self.not_modified: Counter = Counter()
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                site.hits[self.path] += 1
+                if site.delay:
+                    time.sleep(site.delay)
+                html = site.pages.get(self.path)
+                if html is None:
+                    self.send_error(404)
+                    return
+                payload = html.encode("utf-8")
+                etag = f'"{hashlib.sha1(payload).hexdigest()}"'
+                if site.validators and self.headers.get("If-None-Match") == etag:
+                    site.not_modified[self.path] += 1
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                if site.validators:
+                    self.send_header("ETag", etag)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self) -> FixtureSite:
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class FakeIngestService:
+    """Stand-in for the RAG /ingest endpoint: 429 once for `throttle_once`, 400 for `reject`, else 2 chunks.
+
+    POST /delete records its doc_ids in `deleted`.
+    """
+
+    def __init__(self, throttle_once: set[str] | None = None, reject: set[str] | None = None):
+        self.throttle_once = set(throttle_once or ())
+        self.reject = set(reject or ())
+        self.received: Counter = Counter()
+        self.throttled: Counter = Counter()
+        self.deleted: list[str] = []
+        service = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                if self.path == "/delete":
+                    service.deleted.extend(payload["doc_ids"])
+                    self._reply(200, {"doc_ids": payload["doc_ids"]})
+                    return
+                doc_id = payload["doc_id"]
+                if doc_id in service.throttle_once and not service.throttled[doc_id]:
+                    service.throttled[doc_id] += 1
+                    self._reply(429, {"detail": "slow down"}, {"Retry-After": "0"})
+                    return
+                service.received[doc_id] += 1
+                if doc_id in service.reject:
+                    self._reply(400, {"detail": "bad document"})
+                    return
+                self._reply(200, {"ingested_chunks": 2, "doc_id": doc_id})
+
+            def _reply(self, status, body, headers=None):
+                payload = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self) -> FakeIngestService:
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,73 @@
+import asyncio
+
+from fixture_site import FakeIngestService
+from kb_crawler import AdaptiveTokenBucket
+
+import init_kb
+
+
+def make_articles(count):
+    return [{"doc_id": f"doc-{i}", "title": f"Doc {i}", "body": "refund policy " * 20} for i in range(count)]
+
+
+def run(service, jobs, checkpoint, **overrides):
+    options = {"workers": 4, "rate": 0, "retries": 3, "checkpoint": checkpoint, "show_progress": False}
+    options.update(overrides)
+    return asyncio.run(init_kb.ingest_documents(jobs, service.base_url, {"x-api-key": "k"}, **options))
+
+
+def test_ingest_retries_throttled_docs_and_keeps_going_after_failures(tmp_path):
+    jobs, _ = init_kb.build_jobs(make_articles(12))
+    checkpoint = init_kb.Checkpoint(tmp_path / "ckpt.json", "rag")
+    with FakeIngestService(throttle_once={"doc-1", "doc-5"}, reject={"doc-7"}) as service:
+        result = run(service, jobs, checkpoint)
+
+    assert set(result.failed) == {"doc-7"}
+    assert len(result.done) == 11 and all(entry["chunks"] == 2 for entry in result.done.values())
+    assert service.throttled == {"doc-1": 1, "doc-5": 1}
+    assert all(count == 1 for count in service.received.values())
+
+
+def test_rerun_resumes_from_checkpoint(tmp_path):
+    docs = make_articles(10)
+    jobs, revision = init_kb.build_jobs(docs)
+    checkpoint_path = tmp_path / "ckpt.json"
+    with FakeIngestService(reject={"doc-3"}) as service:
+        run(service, jobs, init_kb.Checkpoint(checkpoint_path, "rag"))
+    with FakeIngestService() as service:
+        result = run(service, jobs, init_kb.Checkpoint(checkpoint_path, "rag"))
+        assert list(service.received) == ["doc-3"]
+    assert result.resumed == 9 and not result.failed and len(result.done) == 10
+
+    # Edited articles are re-sent; the KB revision still covers every article.
+    docs[0]["body"] = "updated " * 40
+    edited, edited_revision = init_kb.build_jobs(docs)
+    with FakeIngestService() as service:
+        run(service, edited, init_kb.Checkpoint(checkpoint_path, "rag"))
+        assert list(service.received) == ["doc-0"]
+    assert edited_revision != revision
+    # A checkpoint from another RAG service is ignored.
+    assert init_kb.Checkpoint(checkpoint_path, "other").done == {}
+
+
+def test_duplicates_are_skipped_and_removed_from_the_index():
+    docs = make_articles(3) + [{"doc_id": "doc-2", "lang": "hi", "title": "Doc 2", "body": "वापसी नीति " * 30}]
+    duplicates = {"doc-2": "doc-0"}
+    jobs, _ = init_kb.build_jobs(docs, duplicates)
+    assert [job.doc_id for job in jobs] == ["doc-0", "doc-1"]
+    with FakeIngestService() as service:
+        init_kb.delete_documents(service.base_url, {"x-api-key": "k"}, init_kb.duplicate_doc_ids(duplicates))
+    assert service.deleted == ["doc-2", "doc-2:hi"]
+
+
+def test_adaptive_bucket_backs_off_and_recovers():
+    now = [0.0]
+    bucket = AdaptiveTokenBucket(8.0, min_rate=1.0, clock=lambda: now[0])
+    bucket.throttled()
+    bucket.throttled()
+    bucket.throttled()
+    bucket.throttled()
+    assert bucket.rate == 1.0
+    for _ in range(200):
+        bucket.succeeded()
+    assert bucket.rate == 8.0
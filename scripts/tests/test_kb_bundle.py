@@ -0,0 +1,67 @@
+import json
+
+import pytest
+
+import init_kb
+import kb_bundle
+
+
+def make_docs():
+    docs = []
+    for i in range(6):
+        en = {"doc_id": f"kb-{i}", "title": f"Refunds {i}", "lang": "en", "tags": ["refund"], "body": f"Refund rule {i}. " * 30}
+        docs.append(en)
+        if i % 2 == 0:
+            # Hindi variants carry extra keys and drop one, so the delta has to restore key order too.
+            hi = {key: value for key, value in en.items() if key != "tags"}
+            hi.update({"lang": "hi", "translated_from": en["doc_id"], "body": f"रिफंड नियम {i}. " * 30})
+            docs.append(hi)
+    return docs
+
+
+@pytest.mark.parametrize("codec", ["zlib", "zstd"])
+def test_bundle_round_trips_per_file_layout(tmp_path, codec):
+    if codec == "zstd":
+        pytest.importorskip("zstandard")
+    articles = tmp_path / "articles"
+    articles.mkdir()
+    for doc in make_docs():
+        (articles / kb_bundle.article_filename(doc)).write_text(json.dumps(doc, ensure_ascii=False, indent=2), encoding="utf-8")
+
+    bundle = tmp_path / "kb.bundle"
+    assert kb_bundle.pack(articles, bundle, codec) == {"en": 6, "hi": 3}
+    restored = tmp_path / "restored"
+    assert kb_bundle.unpack(bundle, restored) == 9
+    for path in articles.glob("*.json"):
+        assert (restored / path.name).read_bytes() == path.read_bytes()
+
+
+def test_bundle_random_access_and_streaming(tmp_path):
+    docs = make_docs()
+    bundle = tmp_path / "kb.bundle"
+    kb_bundle.write_bundle(reversed(docs), bundle, "zlib")
+
+    with kb_bundle.KBBundle(bundle) as reader:
+        assert len(reader) == 9
+        assert reader.get("kb-2", "hi") == docs[4]
+        assert list(reader.get("kb-2", "hi")) == list(docs[4])
+        assert reader.get("kb-1", "hi") is None and reader.get("missing") is None
+        streamed = list(reader)
+    assert sorted(streamed, key=kb_bundle.article_filename) == sorted(docs, key=kb_bundle.article_filename)
+
+    # Ingest sees the same articles, and the same KB revision, from either layout.
+    articles = tmp_path / "articles"
+    kb_bundle.unpack(bundle, articles)
+    from_files = init_kb.build_jobs(kb_bundle.iter_articles(articles))
+    from_bundle = init_kb.build_jobs(kb_bundle.iter_articles(articles, bundle))
+    assert from_files[1] == from_bundle[1]
+    assert [job.payload for job in from_files[0]] == [job.payload for job in from_bundle[0]]
+
+
+def test_stale_index_is_rejected(tmp_path):
+    bundle = tmp_path / "kb.bundle"
+    kb_bundle.write_bundle(make_docs(), bundle, "zlib")
+    with bundle.open("ab") as f:
+        f.write(b"\0")
+    with kb_bundle.KBBundle(bundle) as reader, pytest.raises(ValueError):
+        reader.get("kb-0")
@@ -0,0 +1,195 @@
+import asyncio
+import time
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import urljoin, urlparse
+
+from fixture_site import FixtureSite
+from kb_crawler import ARTICLE, Crawler, CrawlState, PageOutcome, TokenBucket, ValidatorStore
+
+import fetch_bms_kb
+
+
+def is_article(url: str) -> bool:
+    return "/articles/" in urlparse(url).path
+
+
+def handler(url: str, html: str, kind: str, category):
+    # Minimal link extraction; the real handler (fetch_bms_kb.handle_page) is exercised separately.
+    links = [urljoin(url, part.split('"', 1)[0]) for part in html.split('href="')[1:]]
+    title = html.split("<title>", 1)[1].split("</title>", 1)[0]
+    record = {"url": url, "category": category} if kind == ARTICLE else None
+    return PageOutcome(title=title, links=links, accepted=kind == ARTICLE, record=record)
+
+
+def make_crawler(site, state, **overrides):
+    options = {"max_depth": 3, "concurrency": 4, "rate_per_host": 0, "retries": 1, "log": lambda _: None}
+    options.update(overrides)
+    return Crawler(state, handler, is_article, **options)
+
+
+def seed_state(site):
+    return CrawlState.from_seeds([f"{site.base_url}/support/solutions"], is_article)
+
+
+def test_crawl_fetches_every_url_once():
+    with FixtureSite() as site:
+        state = asyncio.run(make_crawler(site, seed_state(site)).run())
+
+    articles = {record["url"].rsplit("/", 1)[1] for record in state.records}
+    assert articles == {"1", "2", "3", "4", "5", "6"}
+    assert state.accepted_articles == 6
+    assert all(count == 1 for count in site.hits.values())
+    assert [entry["url"].endswith("/missing") for entry in state.blocked] == [True]
+    # Category comes from the first page that linked the article.
+    categories = {record["url"].rsplit("/", 1)[1]: record["category"] for record in state.records}
+    assert categories["1"] == "Refunds" and categories["6"] == "Payments"
+
+
+def test_limits_are_respected():
+    with FixtureSite() as site:
+        state = asyncio.run(make_crawler(site, seed_state(site), max_articles=2, max_depth=1).run())
+    assert state.accepted_articles == 2
+    assert len(state.records) == 2
+
+
+def test_interrupted_crawl_resumes_from_state_file(tmp_path):
+    state_path = tmp_path / "crawl_state.json"
+    # Slow responses so the cancel always lands mid-crawl.
+    with FixtureSite(delay=0.05) as site:
+
+        async def interrupted():
+            crawler = make_crawler(site, seed_state(site), concurrency=1, state_path=state_path, checkpoint_every=1)
+            task = asyncio.create_task(crawler.run())
+            while sum(site.hits.values()) < 4:
+                await asyncio.sleep(0.005)
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+        asyncio.run(interrupted())
+        partial = CrawlState.load(state_path)
+        assert 0 < len(partial.visited) < len(site.pages) + 1
+
+        resumed = asyncio.run(make_crawler(site, partial, state_path=state_path).run())
+
+    assert resumed.accepted_articles == 6
+    assert len({record["url"] for record in resumed.records}) == 6
+    # At most the single in-flight URL is fetched twice across the interruption.
+    assert sum(site.hits.values()) <= len(site.hits) + 1
+
+
+def test_handler_runs_in_process_pool():
+    with FixtureSite() as site, ProcessPoolExecutor(max_workers=2) as executor:
+        state = asyncio.run(make_crawler(site, seed_state(site), executor=executor).run())
+    assert state.accepted_articles == 6
+    assert all(count == 1 for count in site.hits.values())
+
+
+def test_token_bucket_spaces_requests():
+    async def take(bucket, n):
+        for _ in range(n):
+            await bucket.acquire()
+
+    bucket = TokenBucket(rate=50.0, burst=1.0)
+    start = time.monotonic()
+    asyncio.run(take(bucket, 6))
+    # First token is free (burst), the next five wait 1/50 s each.
+    assert time.monotonic() - start >= 0.09
+
+
+def test_per_host_rate_limit_applies_across_workers():
+    with FixtureSite() as site:
+        start = time.monotonic()
+        asyncio.run(make_crawler(site, seed_state(site), concurrency=8, rate_per_host=40.0, burst=1.0).run())
+        elapsed = time.monotonic() - start
+    requests = sum(site.hits.values())
+    assert elapsed >= (requests - 1) / 40.0 * 0.9
+
+
+def crawl_with_validators(site, store_path):
+    parsed = []
+
+    def counting_handler(url, html, kind, category):
+        parsed.append(url)
+        return handler(url, html, kind, category)
+
+    crawler = make_crawler(site, seed_state(site), validators=ValidatorStore(store_path))
+    crawler.handler = counting_handler
+    state = asyncio.run(crawler.run())
+    return state, crawler.stats, parsed
+
+
+def test_recrawl_skips_parsing_on_304(tmp_path):
+    store_path = tmp_path / "validators.json"
+    with FixtureSite(validators=True) as site:
+        first, first_stats, first_parsed = crawl_with_validators(site, store_path)
+        second, stats, parsed = crawl_with_validators(site, store_path)
+
+        article = "/support/solutions/articles/4"
+        site.pages[article] = site.pages[article].replace("Article 4", "Article 4 (revised)")
+        _, _, third_parsed = crawl_with_validators(site, store_path)
+
+    assert len(first_parsed) == 9 and first_stats["not_modified"] == 0
+    assert parsed == []
+    assert stats["not_modified"] == 9 and stats["downloaded"] == 0
+    assert stats["bytes_saved"] == first_stats["bytes_downloaded"] and stats["parse_seconds_saved"] > 0
+    # Links and records come from the stored outcome, so the crawl reaches the same articles.
+    assert sorted(r["url"] for r in second.records) == sorted(r["url"] for r in first.records)
+    assert [url.rsplit("/", 2)[1:] for url in third_parsed] == [["articles", "4"]]
+
+
+def test_recrawl_skips_parsing_identical_body_without_validators(tmp_path):
+    store_path = tmp_path / "validators.json"
+    with FixtureSite() as site:
+        crawl_with_validators(site, store_path)
+        second, stats, parsed = crawl_with_validators(site, store_path)
+    assert parsed == []
+    assert stats["unchanged_body"] == 9 and stats["not_modified"] == 0
+    assert second.accepted_articles == 6
+
+
+def test_failed_refetch_after_304_releases_the_page(tmp_path):
+    class FailingRefetch(Crawler):
+        # The full re-fetch after a 304 without a stored outcome fails.
+        async def _fetch(self, client, url):
+            if url in seen_304:
+                raise RuntimeError("HTTP 503")
+            resp = await super()._fetch(client, url)
+            if resp.status_code == 304:
+                seen_304.add(url)
+            return resp
+
+    seen_304 = set()
+    store_path = tmp_path / "validators.json"
+    with FixtureSite(validators=True) as site:
+        crawl_with_validators(site, store_path)
+        validators = ValidatorStore(store_path)
+        for entry in validators.entries.values():
+            entry.pop("outcome")
+        crawler = FailingRefetch(
+            seed_state(site), handler, is_article, rate_per_host=0, retries=1, validators=validators, log=lambda _: None
+        )
+        state = asyncio.run(crawler.run())
+
+    assert len(seen_304) == 1 and len(state.blocked) == 1
+    assert state.fetched_pages == 0
+
+
+def test_handle_page_writes_article(tmp_path, monkeypatch):
+    monkeypatch.setattr(fetch_bms_kb, "RAW_DIR", tmp_path / "raw")
+    monkeypatch.setattr(fetch_bms_kb, "ARTICLE_DIR", tmp_path / "articles")
+    monkeypatch.setattr(fetch_bms_kb, "ALLOWED_DOMAINS", {"support.bookmyshow.com"})
+    url = "https://support.bookmyshow.com/support/solutions/articles/42"
+    html = (
+        "<html><head><title>Refund timeline</title></head><body>"
+        '<nav><a href="/support/solutions/folders/7">Refunds</a></nav>'
+        f"<article>{'Refunds reach the original payment method within 5-7 working days. ' * 5}</article>"
+        "</body></html>"
+    )
+    outcome = fetch_bms_kb.handle_page(url, html, ARTICLE, "Refunds")
+    assert outcome.accepted and outcome.record["updated"]
+    assert outcome.links == ["https://support.bookmyshow.com/support/solutions/folders/7"]
+    assert (tmp_path / "articles" / f"{outcome.record['doc_id']}.json").exists()
+    assert not fetch_bms_kb.handle_page(url, html, ARTICLE, "Refunds").record["updated"]
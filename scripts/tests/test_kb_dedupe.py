@@ -0,0 +1,47 @@
+import json
+
+import init_kb
+import kb_dedupe
+from kb_bundle import iter_article_files
+
+ENCASH = (
+    "We wish that was possible. BMS Cash cannot be encashed. Furthermore, you wouldn't be able to transfer it "
+    "to an alternate BookMyShow account, bank, wallets or other users."
+)
+ENCASH_REWORDED = (
+    "We wish that was ppossible. BMS Cash cannot be encashed. Also, you wouldn't be able to transfer it "
+    "to the bank, wallets or other users' BookMyShow account."
+)
+AIRPLAY = "To watch on your TV with AirPlay, connect your iPhone and Apple TV to the same Wi-Fi and tap the AirPlay icon."
+CHROMECAST = "To watch on your TV with Chromecast, connect your phone and Chromecast to the same Wi-Fi and tap the Cast icon."
+
+
+def test_clusters_copies_and_same_question_rewordings_only():
+    docs = {
+        "cast-a": ("Can I cast the stream on my TV?", AIRPLAY + " Casting works for rented titles."),
+        "cast-b": ("Can I cast the stream on my TV?", AIRPLAY + " Casting works for rented titles."),
+        "encash-a": ("Can BMS Cash be encashed?", ENCASH),
+        "encash-b": ("Can BMS Cash be encashed?", ENCASH_REWORDED),
+        "airplay": ("How do I use AirPlay?", AIRPLAY),
+        "chromecast": ("How do I use Chromecast?", CHROMECAST),
+    }
+    assert kb_dedupe.find_clusters(docs) == [["cast-a", "cast-b"], ["encash-a", "encash-b"]]
+
+
+def test_dedupe_annotates_articles_and_ingest_skips_duplicates(tmp_path):
+    articles = tmp_path / "articles"
+    articles.mkdir()
+    body = ENCASH + " " + "Refund and wallet rules apply as listed in the terms. " * 4
+    for doc_id, extra, lang in (("a", " Extra line.", "en"), ("b", "", "en"), ("b", "", "hi")):
+        suffix = ".hi.json" if lang == "hi" else ".json"
+        doc = {"doc_id": doc_id, "title": "Can BMS Cash be encashed?", "lang": lang, "source_url": f"https://kb/{doc_id}", "body": body + extra}
+        (articles / f"{doc_id}{suffix}").write_text(json.dumps(doc))
+
+    duplicates = kb_dedupe.dedupe_articles(articles, path=tmp_path / "duplicates.json")
+
+    assert duplicates == {"b": "a"} == kb_dedupe.load_duplicates(tmp_path / "duplicates.json")
+    canonical = json.loads((articles / "a.json").read_text())
+    assert canonical["aliases"] == ["b"] and canonical["alias_urls"] == ["https://kb/b"]
+    assert json.loads((articles / "b.json").read_text())["duplicate_of"] == "a"
+    jobs, _ = init_kb.build_jobs(iter_article_files(articles), duplicates)
+    assert [job.doc_id for job in jobs] == ["a"]
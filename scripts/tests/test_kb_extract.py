@@ -0,0 +1,36 @@
+import json
+from pathlib import Path
+
+import pytest
+
+import fetch_bms_kb
+import kb_extract
+
+GOLDEN_DIR = Path(__file__).parent / "golden"
+# Expected outputs were produced by the original BeautifulSoup extract_title/extract_text/discover_links.
+GOLDEN_PAGES = sorted(GOLDEN_DIR.glob("*.html"))
+
+
+@pytest.mark.parametrize("backend", kb_extract.AUTO_ORDER)
+@pytest.mark.parametrize("page", GOLDEN_PAGES, ids=lambda path: path.stem)
+def test_backends_match_golden_output(backend, page, monkeypatch):
+    if backend not in kb_extract.available_backends():
+        pytest.skip(f"{backend} is not installed")
+    monkeypatch.setattr(fetch_bms_kb, "ALLOWED_DOMAINS", {"support.bookmyshow.com"})
+    expected = json.loads(page.with_suffix(".json").read_text(encoding="utf-8"))
+
+    parsed = kb_extract.get_extractor(backend)(page.read_text(encoding="utf-8"), True)
+
+    assert parsed.title == expected["title"]
+    assert parsed.body == expected["body"]
+    assert fetch_bms_kb.discover_links(parsed.hrefs, expected["url"]) == expected["links"]
+
+
+def test_category_pages_skip_body_extraction():
+    parsed = kb_extract.get_extractor("bs4")((GOLDEN_DIR / "freshdesk_article.html").read_text(encoding="utf-8"), False)
+    assert parsed.body is None and parsed.hrefs
+
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError):
+        kb_extract.get_extractor("regex")
@@ -0,0 +1,74 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+from kb_translate import ParagraphTranslator, TranslationMemory, paragraph_key
+
+BOILERPLATE = "Do you have unresolved queries? Write to us."
+
+
+class FakeCompletions:
+    """Returns "HI:<text>" per paragraph with 10 prompt + 5 completion tokens per item."""
+
+    def __init__(self, drop_from_batches_over: int = 0):
+        self.calls: list[list[str]] = []
+        self.drop_from_batches_over = drop_from_batches_over
+
+    async def create(self, model, messages, temperature, response_format=None):
+        content = messages[-1]["content"]
+        if response_format is None:
+            texts = [content.split("TEXT:\n", 1)[1]]
+            reply = f"HI:{texts[0]}"
+        else:
+            texts = json.loads(content.rsplit("\n\n", 1)[1])["paragraphs"]
+            translations = [f"HI:{text}" for text in texts]
+            if self.drop_from_batches_over and len(texts) > self.drop_from_batches_over:
+                translations = translations[:-1]
+            reply = json.dumps({"translations": translations}, ensure_ascii=False)
+        self.calls.append(texts)
+        usage = SimpleNamespace(prompt_tokens=10 * len(texts), completion_tokens=5 * len(texts))
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=reply))], usage=usage)
+
+
+def make_translator(memory, completions, **overrides):
+    client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    options = {"concurrency": 3, "rate": 0, "max_batch_items": 2}
+    options.update(overrides)
+    return ParagraphTranslator(client, "gpt-test", memory, **options)
+
+
+def test_only_unseen_paragraphs_are_sent_and_order_is_kept(tmp_path):
+    memory = TranslationMemory(tmp_path / "tm.sqlite")
+    bodies = [f"Refund timeline\n{BOILERPLATE}", f"Cancel a booking\n\n{BOILERPLATE}\nConvenience fee"]
+    completions = FakeCompletions()
+    translator = make_translator(memory, completions)
+
+    out = asyncio.run(translator.translate_bodies(bodies))
+
+    assert out == [f"HI:Refund timeline\nHI:{BOILERPLATE}", f"HI:Cancel a booking\n\nHI:{BOILERPLATE}\nHI:Convenience fee"]
+    sent = [text for call in completions.calls for text in call]
+    assert sorted(sent) == sorted(["Refund timeline", BOILERPLATE, "Cancel a booking", "Convenience fee"])
+    assert max(len(call) for call in completions.calls) == 2
+    # Batch usage is shared out by length; the repeat saves whatever the boilerplate was charged.
+    costs = {key: tokens for key, (_, tokens) in memory.lookup([paragraph_key("gpt-test", BOILERPLATE), paragraph_key("gpt-test", "Refund timeline")]).items()}
+    assert translator.stats["repeated_in_run"] == 1
+    assert translator.stats["tokens_saved"] == costs[paragraph_key("gpt-test", BOILERPLATE)] > 0
+
+    # Second run (new process, same memory file): nothing new is sent, whitespace differences still hit.
+    memory.close()
+    memory = TranslationMemory(tmp_path / "tm.sqlite")
+    again = FakeCompletions()
+    translator = make_translator(memory, again)
+    assert asyncio.run(translator.translate_bodies([f"{BOILERPLATE}  \nRefund   timeline"])) == [
+        f"HI:{BOILERPLATE}\nHI:Refund timeline"
+    ]
+    assert again.calls == []
+    assert translator.stats["memory_hits"] == 2 and translator.stats["tokens_saved"] == sum(costs.values())
+
+
+def test_batch_with_missing_items_is_split(tmp_path):
+    completions = FakeCompletions(drop_from_batches_over=1)
+    translator = make_translator(TranslationMemory(tmp_path / "tm.sqlite"), completions, max_batch_items=4)
+    out = asyncio.run(translator.translate_bodies(["one para\ntwo para\nthree para\nfour para"]))
+    assert out == ["HI:one para\nHI:two para\nHI:three para\nHI:four para"]
+    assert translator.stats["translated"] == 4
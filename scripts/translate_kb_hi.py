@@ -2,7 +2,6 @@
 from __future__ import annotations
 
 import argparse
-import glob
 import json
 import os
 import sys
@@ -10,7 +9,9 @@ from datetime import datetime, timezone
 from pathlib import Path
 
 try:
-    from openai import OpenAI
+    from kb_bundle import ARTICLE_DIR, article_filename, iter_articles, write_bundle
+    from kb_dedupe import load_duplicates
+    from kb_translate import translate_bodies
 except Exception:
     print("ERROR: Missing dependencies. Install with: python3 -m pip install -r scripts/requirements.txt")
     raise
@@ -32,6 +33,7 @@ def load_env_file(path: Path) -> dict:
 def main() -> int:
     parser = argparse.ArgumentParser()
     parser.add_argument("--env", default="infra/.env")
+    parser.add_argument("--bundle", default=os.getenv("KB_BUNDLE", ""), help="Read and update a kb_bundle.py pack")
     args = parser.parse_args()
 
     env = load_env_file(Path(args.env))
@@ -53,47 +55,40 @@ def main() -> int:
     allowed_categories = {c.strip() for c in categories_filter.split(",") if c.strip()}
 
     model = get_env("OPENAI_CHAT_MODEL", "gpt-4o-mini")
-    client = OpenAI(api_key=api_key)
 
-    files = [f for f in glob.glob("data/kb/articles/*.json") if not f.endswith(".hi.json")]
-    if not files:
+    articles = sorted(iter_articles(ARTICLE_DIR, args.bundle or None), key=article_filename)
+    english = [doc for doc in articles if doc.get("lang", "en") != "hi"]
+    if not english:
         print("ERROR: No KB articles found. Run: make fetch-kb")
         return 1
 
-    translated = 0
-    for path in sorted(files):
-        if translated >= max_items:
+    duplicates = load_duplicates()
+    have_hindi = {doc["doc_id"] for doc in articles if doc.get("lang") == "hi"}
+    selected = []
+    for doc in english:
+        if len(selected) >= max_items:
             break
 
-        with open(path, "r", encoding="utf-8") as f:
-            doc = json.load(f)
-
         if allowed_categories and doc.get("category") not in allowed_categories:
             continue
-
-        hi_path = Path("data/kb/articles") / f"{doc['doc_id']}.hi.json"
-        if hi_path.exists():
+        if doc["doc_id"] in duplicates or doc["doc_id"] in have_hindi:
             continue
 
         body = doc.get("body", "").strip()
         if len(body) < 200:
             continue
-
-        prompt = (
-            "Translate the following support article text to Hindi. "
-            "Do not summarize or add any information. Output only the Hindi translation.\n\n"
-            f"TEXT:\n{body}"
-        )
-        response = client.chat.completions.create(
-            model=model,
-            messages=[
-                {"role": "system", "content": "You are a professional English-to-Hindi translator."},
-                {"role": "user", "content": prompt},
-            ],
-            temperature=0.0,
-        )
-        translated_body = (response.choices[0].message.content or "").strip()
-
+        selected.append((doc, ARTICLE_DIR / article_filename({"doc_id": doc["doc_id"], "lang": "hi"}), body))
+
+    translated_bodies, report = translate_bodies(
+        [body for _, _, body in selected],
+        api_key=api_key,
+        model=model,
+        concurrency=int(get_env("KB_TRANSLATE_CONCURRENCY", "4")),
+        rate=float(get_env("KB_TRANSLATE_RATE", "2")),
+    )
+    translated = 0
+    new_docs = []
+    for (doc, hi_path, _), translated_body in zip(selected, translated_bodies):
         hi_doc = {
             **doc,
             "lang": "hi",
@@ -102,10 +97,16 @@ def main() -> int:
             "translation_at": datetime.now(timezone.utc).isoformat(),
             "body": translated_body,
         }
-        hi_path.write_text(json.dumps(hi_doc, ensure_ascii=False, indent=2), encoding="utf-8")
+        if args.bundle:
+            new_docs.append(hi_doc)
+        else:
+            hi_path.write_text(json.dumps(hi_doc, ensure_ascii=False, indent=2), encoding="utf-8")
         translated += 1
+    if new_docs:
+        write_bundle(articles + new_docs, Path(args.bundle))
 
     print(f"Translated {translated} articles to Hindi.")
+    print(report)
     return 0
 
 
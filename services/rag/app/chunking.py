@@ -1,47 +1,238 @@
 from __future__ import annotations
 
-from typing import Iterable
+import logging
+import math
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Protocol
 
+logger = logging.getLogger("rag.chunking")
 
-# Word-based chunking as a token approximation. In practice, ~1 word ~= 1 token
-# for English/Hindi mixed text, so we target 800 words with overlap to keep
-# chunks within ~500-1000 tokens.
+# Sized in embedding-model tokens, not words: Devanagari runs several tokens per word, so a word budget that
+# fits English overshoots on Hindi. Articles are cut at headings and question lines first, then at sentence
+# ends (including the danda), and only an over-long sentence is cut between words.
+MAX_TOKENS = 400
+OVERLAP_TOKENS = 40
+
+_SENTENCE_END = re.compile(r"(?<=[.!?।॥])\s+")
+_QUESTION = re.compile(r"^(?:q(?:uestion)?\s*\d*\s*[:.)-]|.{3,200}\?$)", re.IGNORECASE)
+# Markdown headings, "Label:" lines and short capitalised title lines ("Refund against Cancelled booking").
+_HEADING = re.compile(r"^(?:#{1,6}\s+\S.*|[^.!?।]{1,80}:|[A-Z][^.!?।,;:]{0,60}[^\s.!?।,;:])$")
+_MAX_TITLE_WORDS = 8
+
+
+class Tokenizer(Protocol):
+    name: str
+
+    def count(self, text: str) -> int: ...
+
+
+class TiktokenTokenizer:
+    def __init__(self, model: str):
+        import tiktoken
+
+        try:
+            self._encoding = tiktoken.encoding_for_model(model)
+        except KeyError:
+            self._encoding = tiktoken.get_encoding("cl100k_base")
+        self.name = f"tiktoken:{self._encoding.name}"
+
+    def count(self, text: str) -> int:
+        return len(self._encoding.encode(text, disallowed_special=()))
+
+
+class EstimatingTokenizer:
+    """Offline estimate of cl100k token counts, calibrated on the KB to overshoot by ~15% in both languages.
+
+    Latin words cost one token per six letters, digits one per three, Devanagari 1.3 per character (the
+    KB's Hindi runs ~4.9 tokens per word), and any other character or newline one; spaces are free.
+    """
+
+    name = "estimate"
+    _PIECES = re.compile(r"[A-Za-z]+|\d+|[\u0900-\u097f]+|\n|\S")
+
+    def count(self, text: str) -> int:
+        total = 0
+        for piece in self._PIECES.findall(text):
+            first = piece[0]
+            if first.isascii() and first.isalpha():
+                total += math.ceil(len(piece) / 6)
+            elif first.isascii() and first.isdigit():
+                total += math.ceil(len(piece) / 3)
+            elif "\u0900" <= first <= "\u097f":
+                total += math.ceil(len(piece) * 1.3)
+            else:
+                total += 1
+        return total
+
+
+@lru_cache(maxsize=8)
+def get_tokenizer(name: str = "auto", model: str = "text-embedding-3-small") -> Tokenizer:
+    """`tiktoken` (exact), `estimate`, or `auto`: tiktoken when it and its encoding file load, else estimate."""
+    name = (name or "auto").strip().lower()
+    if name == "estimate":
+        return EstimatingTokenizer()
+    if name not in ("auto", "tiktoken"):
+        raise ValueError(f"Unknown chunk tokenizer {name!r}; expected auto, tiktoken or estimate")
+    try:
+        return TiktokenTokenizer(model)
+    except Exception as exc:
+        # tiktoken downloads its encoding on first use; offline images end up here.
+        if name == "tiktoken":
+            raise
+        logger.warning("tiktoken unavailable (%s); estimating chunk token counts", exc)
+        return EstimatingTokenizer()
+
+
+@dataclass
+class _Piece:
+    text: str
+    tokens: int
+    # Separator placed before the piece when it does not start a chunk.
+    sep: str
 
-def chunk_text(
-    text: str,
-    min_words: int = 500,
-    max_words: int = 1000,
-    target_words: int = 800,
-    overlap: int = 80,
-) -> list[str]:
-    words = text.split()
-    if not words:
-        return []
 
-    if len(words) <= max_words:
-        return [" ".join(words).strip()]
+def _piece(text: str, sep: str, tokenizer: Tokenizer) -> _Piece:
+    # A leading space merges into the next token; a newline is a token of its own.
+    return _Piece(text, tokenizer.count(text) + (sep == "\n"), sep)
 
-    chunks: list[str] = []
+
+@dataclass
+class _Section:
+    heading: _Piece | None
+    pieces: list[_Piece]
+
+    @property
+    def tokens(self) -> int:
+        return sum(piece.tokens for piece in self.all_pieces)
+
+    @property
+    def all_pieces(self) -> list[_Piece]:
+        return [self.heading, *self.pieces] if self.heading else self.pieces
+
+
+def _is_section_start(line: str, previous: str) -> bool:
+    if _QUESTION.match(line):
+        return True
+    if not _HEADING.match(line):
+        return False
+    if line.endswith(":") or line.startswith("#"):
+        return True
+    # Title lines are short and follow a finished line; otherwise it is a sentence wrapped mid-way.
+    return len(line.split()) <= _MAX_TITLE_WORDS and (not previous or previous[-1] in ".!?।॥:")
+
+
+def _sections(text: str, tokenizer: Tokenizer) -> list[_Section]:
+    sections: list[_Section] = []
+    current = _Section(heading=None, pieces=[])
+    previous = ""
+    for raw_line in text.splitlines():
+        line = " ".join(raw_line.replace("\u200b", " ").replace("\ufeff", " ").split())
+        if not line:
+            continue
+        start = _is_section_start(line, previous)
+        previous = line
+        # A heading straight after a heading ("How do I book?" then "Steps:") belongs to the first one's answer.
+        if start and (current.pieces or not current.heading):
+            if current.heading or current.pieces:
+                sections.append(current)
+            current = _Section(heading=_piece(line, "\n", tokenizer), pieces=[])
+            continue
+        for index, sentence in enumerate(_SENTENCE_END.split(line)):
+            current.pieces.append(_piece(sentence, "\n" if index == 0 else " ", tokenizer))
+    if current.heading or current.pieces:
+        sections.append(current)
+    return sections
+
+
+def _split_words(piece: _Piece, max_tokens: int, overlap_tokens: int, tokenizer: Tokenizer) -> list[_Piece]:
+    # Last resort for a single sentence longer than a chunk.
+    # Counted with their leading space, the way they appear once joined.
+    words = [(word, tokenizer.count(" " + word)) for word in piece.text.split()]
+    parts: list[_Piece] = []
     start = 0
     while start < len(words):
-        end = min(start + target_words, len(words))
-        chunk_words = words[start:end]
-        chunks.append(" ".join(chunk_words).strip())
+        end, size = start, 0
+        while end < len(words) and (end == start or size + words[end][1] <= max_tokens):
+            size += words[end][1]
+            end += 1
+        sep = piece.sep if not parts else " "
+        parts.append(_Piece(" ".join(word for word, _ in words[start:end]), size + (sep == "\n"), sep))
         if end == len(words):
             break
-        start = max(0, end - overlap)
-
-    # Merge a tiny trailing chunk into the previous one (keep <= max_words).
-    if len(chunks) >= 2:
-        last_words = chunks[-1].split()
-        if len(last_words) < min_words:
-            prev_words = chunks[-2].split()
-            merged = prev_words + last_words
-            if len(merged) <= max_words:
-                chunks[-2] = " ".join(merged).strip()
-                chunks.pop()
-
-    return [c for c in chunks if c]
+        back, carried = end, 0
+        while back - 1 > start and carried + words[back - 1][1] <= overlap_tokens:
+            back -= 1
+            carried += words[back][1]
+        start = back
+    return parts
+
+
+def _join(pieces: list[_Piece]) -> str:
+    return "".join(piece.text if index == 0 else piece.sep + piece.text for index, piece in enumerate(pieces)).strip()
+
+
+def _split_section(section: _Section, max_tokens: int, overlap_tokens: int, tokenizer: Tokenizer) -> list[list[_Piece]]:
+    heading = section.heading
+    # One token on top of the heading for the newline after it.
+    budget = max_tokens - (heading.tokens + 1 if heading else 0)
+    if budget < max_tokens // 2:
+        # A heading that eats half the budget is not worth repeating on every part.
+        heading, budget = None, max_tokens
+    pieces: list[_Piece] = []
+    for piece in section.pieces if heading else section.all_pieces:
+        pieces.extend(_split_words(piece, budget, overlap_tokens, tokenizer) if piece.tokens > budget else [piece])
+
+    chunks: list[list[_Piece]] = []
+    current: list[_Piece] = []
+    size = 0
+    for piece in pieces:
+        if current and size + piece.tokens > budget:
+            chunks.append(current)
+            # Carry whole trailing sentences, up to overlap_tokens, into the next part.
+            carried: list[_Piece] = []
+            carried_size = 0
+            for previous in reversed(current):
+                if carried_size + previous.tokens > overlap_tokens or carried_size + previous.tokens + piece.tokens > budget:
+                    break
+                carried.insert(0, previous)
+                carried_size += previous.tokens
+            current, size = carried, carried_size
+        current.append(piece)
+        size += piece.tokens
+    if current:
+        chunks.append(current)
+    # Each part repeats the section's heading or question so it still says what it answers.
+    if not heading:
+        return chunks
+    return [[heading, _Piece(chunk[0].text, chunk[0].tokens, "\n"), *chunk[1:]] for chunk in chunks]
+
+
+def chunk_text(
+    text: str,
+    max_tokens: int = MAX_TOKENS,
+    overlap_tokens: int = OVERLAP_TOKENS,
+    tokenizer: Tokenizer | None = None,
+) -> list[str]:
+    """Split text into chunks of at most max_tokens, keeping each heading or question with its answer."""
+    tokenizer = tokenizer or get_tokenizer()
+    chunks: list[list[_Piece]] = []
+    current: list[_Piece] = []
+    size = 0
+    for section in _sections(text, tokenizer):
+        # Whole sections are packed together while they fit; only a section larger than a chunk is split.
+        if current and size + section.tokens > max_tokens:
+            chunks.append(current)
+            current, size = [], 0
+        if section.tokens > max_tokens:
+            chunks.extend(_split_section(section, max_tokens, overlap_tokens, tokenizer))
+            continue
+        current.extend(section.all_pieces)
+        size += section.tokens
+    if current:
+        chunks.append(current)
+    return [joined for joined in (_join(chunk) for chunk in chunks) if joined]
 
 
 def count_words(text: str) -> int:
@@ -24,6 +24,12 @@ class Settings:
     top_k: int
     conf_threshold: float
     max_query_chars: int
+    session_cache_ttl: float
+    session_cache_similarity: float
+    session_cache_size: int
+    chunk_tokenizer: str
+    chunk_max_tokens: int
+    chunk_overlap_tokens: int
 
 
 def load_settings() -> Settings:
@@ -37,4 +43,10 @@ def load_settings() -> Settings:
         top_k=int(_get_env("TOP_K", "5")),
         conf_threshold=float(_get_env("CONF_THRESHOLD", "0.7")),
         max_query_chars=int(_get_env("MAX_QUERY_CHARS", "4000")),
+        session_cache_ttl=float(_get_env("RAG_SESSION_CACHE_TTL", "600")),
+        session_cache_similarity=float(_get_env("RAG_SESSION_CACHE_SIMILARITY", "0.9")),
+        session_cache_size=int(_get_env("RAG_SESSION_CACHE_SIZE", "2048")),
+        chunk_tokenizer=_get_env("RAG_CHUNK_TOKENIZER", "auto"),
+        chunk_max_tokens=int(_get_env("RAG_CHUNK_MAX_TOKENS", "400")),
+        chunk_overlap_tokens=int(_get_env("RAG_CHUNK_OVERLAP_TOKENS", "40")),
     )
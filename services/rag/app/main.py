@@ -8,12 +8,13 @@ from uuid import uuid4
 from fastapi import Depends, FastAPI, Header, HTTPException, Request
 from pydantic import BaseModel, Field
 
-from .chunking import chunk_text
+from .chunking import chunk_text, get_tokenizer
 from .config import Settings, load_settings
 from .confidence import compute_confidence
 from .openai_client import EmbeddingUnavailable, OpenAIClient
 from .qdrant_store import QdrantStore, VectorStoreUnavailable, build_point
 from .rag import build_system_prompt, build_user_prompt, detect_language, detect_roman_hindi, fallback_answer
+from .retrieval_cache import SessionRetrievalCache
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s %(message)s")
 logger = logging.getLogger("rag")
@@ -35,6 +36,14 @@ class IngestResponse(BaseModel):
     doc_id: str
 
 
+class DeleteRequest(BaseModel):
+    doc_ids: list[str]
+
+
+class DeleteResponse(BaseModel):
+    doc_ids: list[str]
+
+
 class QueryRequest(BaseModel):
     session_id: str
     user_query: str
@@ -49,6 +58,8 @@ class QueryResponse(BaseModel):
     language: Literal["en", "hi"]
     sources: list[dict]
     retrieved_k: int
+    # True when the chunks came from the session's previous retrieval instead of Qdrant.
+    retrieval_cached: bool = False
 
 
 def safe_query_response(language: str) -> QueryResponse:
@@ -75,7 +86,14 @@ def on_startup() -> None:
         embed_model=settings.openai_embed_model,
     )
     app.state.qdrant = QdrantStore(url=settings.qdrant_url, collection=settings.qdrant_collection)
-    logger.info("RAG service started")
+    app.state.retrieval_cache = SessionRetrievalCache(
+        ttl_seconds=settings.session_cache_ttl,
+        min_similarity=settings.session_cache_similarity,
+        max_sessions=settings.session_cache_size,
+    )
+    # Loaded up front: tiktoken may fetch its encoding file, and falls back to an estimate if it cannot.
+    tokenizer = get_tokenizer(settings.chunk_tokenizer, settings.openai_embed_model)
+    logger.info("RAG service started (chunk tokenizer: %s)", tokenizer.name)
 
 
 def get_settings(request: Request) -> Settings:
@@ -90,6 +108,10 @@ def get_qdrant(request: Request) -> QdrantStore:
     return request.app.state.qdrant
 
 
+def get_retrieval_cache(request: Request) -> SessionRetrievalCache:
+    return request.app.state.retrieval_cache
+
+
 def require_api_key(
     settings: Settings = Depends(get_settings),
     x_api_key: str | None = Header(default=None, alias="x-api-key"),
@@ -118,8 +140,8 @@ async def add_request_id(request: Request, call_next):
 
 
 @app.get("/health")
-def health():
-    return {"status": "ok"}
+def health(retrieval_cache: SessionRetrievalCache = Depends(get_retrieval_cache)):
+    return {"status": "ok", "retrieval_cache": retrieval_cache.stats()}
 
 
 @app.post("/ingest", response_model=IngestResponse, dependencies=[Depends(require_api_key)])
@@ -128,8 +150,14 @@ def ingest(
     settings: Settings = Depends(get_settings),
     client: OpenAIClient = Depends(get_openai),
     store: QdrantStore = Depends(get_qdrant),
+    retrieval_cache: SessionRetrievalCache = Depends(get_retrieval_cache),
 ):
-    chunks = chunk_text(payload.text)
+    chunks = chunk_text(
+        payload.text,
+        max_tokens=settings.chunk_max_tokens,
+        overlap_tokens=settings.chunk_overlap_tokens,
+        tokenizer=get_tokenizer(settings.chunk_tokenizer, settings.openai_embed_model),
+    )
     if not chunks:
         raise HTTPException(status_code=400, detail="Empty document")
 
@@ -158,17 +186,34 @@ def ingest(
 
     try:
         store.upsert_chunks(points)
+        store.delete_stale_chunks(payload.doc_id, [point.id for point in points])
     except VectorStoreUnavailable:
         raise HTTPException(status_code=503, detail="Vector store unavailable")
+    retrieval_cache.clear()
     return IngestResponse(ingested_chunks=len(points), doc_id=payload.doc_id)
 
 
+@app.post("/delete", response_model=DeleteResponse, dependencies=[Depends(require_api_key)])
+def delete(
+    payload: DeleteRequest,
+    store: QdrantStore = Depends(get_qdrant),
+    retrieval_cache: SessionRetrievalCache = Depends(get_retrieval_cache),
+):
+    try:
+        store.delete_documents(payload.doc_ids)
+    except VectorStoreUnavailable:
+        raise HTTPException(status_code=503, detail="Vector store unavailable")
+    retrieval_cache.clear()
+    return DeleteResponse(doc_ids=payload.doc_ids)
+
+
 @app.post("/query", response_model=QueryResponse, dependencies=[Depends(require_api_key)])
 def query(
     payload: QueryRequest,
     settings: Settings = Depends(get_settings),
     client: OpenAIClient = Depends(get_openai),
     store: QdrantStore = Depends(get_qdrant),
+    retrieval_cache: SessionRetrievalCache = Depends(get_retrieval_cache),
 ):
     user_query = payload.user_query.strip()
     if not user_query:
@@ -213,18 +258,26 @@ def query(
         return safe_query_response(language)
 
     top_k = payload.top_k or settings.top_k
-    try:
-        best_results: list[dict] = []
-        best_score = -1.0
-        for vector in vectors:
-            results = store.search(query_vector=vector, top_k=top_k)
-            score = results[0]["score"] if results else 0.0
-            if score > best_score:
-                best_score = score
-                best_results = results
-        results = best_results
-    except VectorStoreUnavailable:
-        return safe_query_response(language)
+    # Follow-ups that embed close to the session's last query reuse its chunks and skip Qdrant.
+    cached_results = retrieval_cache.lookup(payload.session_id, vectors, top_k)
+    if cached_results is not None:
+        results = cached_results
+    else:
+        try:
+            best_results: list[dict] = []
+            best_score = -1.0
+            best_vector = vectors[0]
+            for vector in vectors:
+                results = store.search(query_vector=vector, top_k=top_k)
+                score = results[0]["score"] if results else 0.0
+                if score > best_score:
+                    best_score = score
+                    best_results = results
+                    best_vector = vector
+            results = best_results
+        except VectorStoreUnavailable:
+            return safe_query_response(language)
+        retrieval_cache.store(payload.session_id, best_vector, results, top_k)
 
     system_prompt = build_system_prompt(language)
     user_prompt = build_user_prompt(user_query_for_prompt, results, payload.history or [])
@@ -256,4 +309,5 @@ def query(
         language=language,
         sources=sources,
         retrieved_k=len(results),
+        retrieval_cached=cached_results is not None,
     )
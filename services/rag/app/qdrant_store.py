@@ -2,10 +2,20 @@ from __future__ import annotations
 
 import logging
 from datetime import datetime
-from typing import Any
+from typing import Any, Iterator, Sequence
 
 from qdrant_client import QdrantClient
-from qdrant_client.models import Distance, PointStruct, VectorParams
+from qdrant_client.models import (
+    Distance,
+    FieldCondition,
+    Filter,
+    FilterSelector,
+    HasIdCondition,
+    MatchAny,
+    MatchValue,
+    PointStruct,
+    VectorParams,
+)
 
 logger = logging.getLogger("rag.qdrant")
 
@@ -47,6 +57,42 @@ class QdrantStore:
             logger.warning("Qdrant create collection failed: %s", exc)
             raise VectorStoreUnavailable("Vector store unavailable") from exc
 
+    def delete_stale_chunks(self, doc_id: str, keep_ids: list[Any]) -> None:
+        """Drop a document's points that a re-ingest did not rewrite (it now has fewer chunks)."""
+        selector = FilterSelector(
+            filter=Filter(
+                must=[FieldCondition(key="doc_id", match=MatchValue(value=doc_id))],
+                must_not=[HasIdCondition(has_id=keep_ids)],
+            )
+        )
+        try:
+            self.client.delete(collection_name=self.collection, points_selector=selector)
+        except Exception as exc:
+            logger.warning("Qdrant delete failed: %s", exc)
+            raise VectorStoreUnavailable("Vector store unavailable") from exc
+
+    def delete_documents(self, doc_ids: Sequence[str]) -> None:
+        """Drop every point of the given documents; a collection that does not exist yet has nothing to drop."""
+        if not doc_ids:
+            return
+        selector = FilterSelector(filter=Filter(must=[FieldCondition(key="doc_id", match=MatchAny(any=list(doc_ids)))]))
+        try:
+            if not self.client.collection_exists(self.collection):
+                return
+            self.client.delete(collection_name=self.collection, points_selector=selector)
+        except Exception as exc:
+            logger.warning("Qdrant delete failed: %s", exc)
+            raise VectorStoreUnavailable("Vector store unavailable") from exc
+
+    def recreate_collection(self, vector_size: int) -> None:
+        try:
+            self.client.delete_collection(collection_name=self.collection)
+        except Exception as exc:
+            logger.warning("Qdrant delete collection failed: %s", exc)
+            raise VectorStoreUnavailable("Vector store unavailable") from exc
+        self._collection_ready = False
+        self.ensure_collection(vector_size)
+
     def upsert_chunks(self, points: list[PointStruct]) -> None:
         if not points:
             return
@@ -56,6 +102,42 @@ class QdrantStore:
             logger.warning("Qdrant upsert failed: %s", exc)
             raise VectorStoreUnavailable("Vector store unavailable") from exc
 
+    def scroll_points(self, batch_size: int = 256) -> Iterator[Any]:
+        """Every point in the collection, with payload and vector."""
+        offset = None
+        while True:
+            try:
+                records, offset = self.client.scroll(
+                    collection_name=self.collection,
+                    limit=batch_size,
+                    offset=offset,
+                    with_payload=True,
+                    with_vectors=True,
+                )
+            except Exception as exc:
+                logger.warning("Qdrant scroll failed: %s", exc)
+                raise VectorStoreUnavailable("Vector store unavailable") from exc
+            yield from records
+            if offset is None:
+                return
+
+    def upload_points(
+        self, ids: Sequence[str], vectors: Any, payloads: Sequence[dict[str, Any]], batch_size: int = 256
+    ) -> None:
+        # upload_collection batches a whole matrix without building PointStructs one by one.
+        try:
+            self.client.upload_collection(
+                collection_name=self.collection,
+                vectors=vectors,
+                payload=payloads,
+                ids=ids,
+                batch_size=batch_size,
+                wait=True,
+            )
+        except Exception as exc:
+            logger.warning("Qdrant upload failed: %s", exc)
+            raise VectorStoreUnavailable("Vector store unavailable") from exc
+
     def search(self, query_vector: list[float], top_k: int) -> list[dict[str, Any]]:
         try:
             response = self.client.query_points(
@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+import math
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any
+
+
+def cosine_similarity(a: list[float], b: list[float]) -> float:
+    if len(a) != len(b) or not a:
+        return 0.0
+    dot = sum(x * y for x, y in zip(a, b))
+    norm_a = math.sqrt(sum(x * x for x in a))
+    norm_b = math.sqrt(sum(y * y for y in b))
+    if not norm_a or not norm_b:
+        return 0.0
+    return dot / (norm_a * norm_b)
+
+
+@dataclass
+class _Entry:
+    vector: list[float]
+    results: list[dict[str, Any]]
+    top_k: int
+    stored_at: float
+
+
+class SessionRetrievalCache:
+    """Last retrieval per session, reused when a follow-up query embeds close to the previous one."""
+
+    def __init__(self, ttl_seconds: float, min_similarity: float, max_sessions: int, clock=time.monotonic):
+        self.ttl_seconds = ttl_seconds
+        self.min_similarity = min_similarity
+        self.max_sessions = max_sessions
+        self._clock = clock
+        self._entries: OrderedDict[str, _Entry] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_seconds > 0 and self.max_sessions > 0
+
+    def lookup(self, session_id: str, vectors: list[list[float]], top_k: int) -> list[dict[str, Any]] | None:
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is not None and self._clock() - entry.stored_at > self.ttl_seconds:
+                del self._entries[session_id]
+                entry = None
+            if entry is None or entry.top_k < top_k:
+                self.misses += 1
+                return None
+            if max(cosine_similarity(vector, entry.vector) for vector in vectors) < self.min_similarity:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(session_id)
+            self.hits += 1
+            return entry.results[:top_k]
+
+    def store(self, session_id: str, vector: list[float], results: list[dict[str, Any]], top_k: int) -> None:
+        if not self.enabled or not results:
+            return
+        with self._lock:
+            self._entries[session_id] = _Entry(vector=vector, results=results, top_k=top_k, stored_at=self._clock())
+            self._entries.move_to_end(session_id)
+            while len(self._entries) > self.max_sessions:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "sessions": len(self._entries)}
+
+    def clear(self) -> None:
+        # Called on ingest: cached chunks may no longer match the collection.
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,190 @@
+"""Embedding snapshots: export every Qdrant point once, restore it without calling the embeddings API again.
+
+A snapshot is a directory with three files:
+  vectors.npy      float32 matrix, one row per point
+  payloads.jsonl   one {"id", "payload"} line per point, in row order (payload carries chunk_id, doc_id, text...)
+  manifest.json    embed model, dimension, count and the sha256 of the two files above
+
+Run from services/rag (Qdrant is published on localhost:6333 by infra/docker-compose.yml):
+  python -m app.snapshot export ../../data/kb/snapshot
+  python -m app.snapshot restore ../../data/kb/snapshot [--recreate]
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+from .qdrant_store import QdrantStore
+
+logger = logging.getLogger("rag.snapshot")
+
+FORMAT_VERSION = 1
+VECTORS_FILE = "vectors.npy"
+PAYLOADS_FILE = "payloads.jsonl"
+MANIFEST_FILE = "manifest.json"
+
+
+class SnapshotError(Exception):
+    pass
+
+
+def _sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+@dataclass
+class Snapshot:
+    manifest: dict[str, Any]
+    ids: list[str]
+    vectors: np.ndarray
+    payloads: list[dict[str, Any]]
+
+    @property
+    def embed_model(self) -> str:
+        return self.manifest["embed_model"]
+
+    def search(self, query_vector: list[float], top_k: int) -> list[dict[str, Any]]:
+        """Exact cosine search over the snapshot, same result shape as QdrantStore.search."""
+        if not self.ids:
+            return []
+        query = np.asarray(query_vector, dtype=np.float32)
+        norms = np.linalg.norm(self.vectors, axis=1) * (np.linalg.norm(query) or 1.0)
+        scores = self.vectors @ query / np.where(norms == 0, 1.0, norms)
+        top = np.argsort(-scores)[:top_k]
+        return [{"id": self.ids[i], "score": float(scores[i]), "payload": self.payloads[i]} for i in top]
+
+
+def export_snapshot(store: QdrantStore, directory: Path, embed_model: str, batch_size: int = 256) -> dict[str, Any]:
+    """Write every point of the store's collection to directory; returns the manifest."""
+    ids: list[str] = []
+    vectors: list[list[float]] = []
+    payloads: list[dict[str, Any]] = []
+    for record in store.scroll_points(batch_size=batch_size):
+        ids.append(str(record.id))
+        vectors.append(record.vector)
+        payloads.append(record.payload or {})
+    if not ids:
+        raise SnapshotError(f"Collection '{store.collection}' has no points to export")
+    matrix = np.asarray(vectors, dtype=np.float32)
+
+    directory.mkdir(parents=True, exist_ok=True)
+    np.save(directory / VECTORS_FILE, matrix)
+    with (directory / PAYLOADS_FILE).open("w", encoding="utf-8") as f:
+        for point_id, payload in zip(ids, payloads):
+            f.write(json.dumps({"id": point_id, "payload": payload}, ensure_ascii=False) + "\n")
+
+    manifest = {
+        "version": FORMAT_VERSION,
+        "collection": store.collection,
+        "embed_model": embed_model,
+        "dimension": int(matrix.shape[1]),
+        "count": len(ids),
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "sha256": {name: _sha256(directory / name) for name in (VECTORS_FILE, PAYLOADS_FILE)},
+    }
+    # Written last: a directory without a manifest is an unfinished export.
+    (directory / MANIFEST_FILE).write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+    return manifest
+
+
+def load_snapshot(directory: Path) -> Snapshot:
+    """Read a snapshot, checking the file checksums and the matrix shape against the manifest."""
+    manifest_path = directory / MANIFEST_FILE
+    if not manifest_path.exists():
+        raise SnapshotError(f"{manifest_path} not found (missing or unfinished export)")
+    manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+    if manifest.get("version") != FORMAT_VERSION:
+        raise SnapshotError(f"Unsupported snapshot version {manifest.get('version')}")
+    for name, expected in manifest["sha256"].items():
+        if _sha256(directory / name) != expected:
+            raise SnapshotError(f"Checksum mismatch for {directory / name}")
+
+    vectors = np.load(directory / VECTORS_FILE)
+    ids: list[str] = []
+    payloads: list[dict[str, Any]] = []
+    with (directory / PAYLOADS_FILE).open("r", encoding="utf-8") as f:
+        for line in f:
+            row = json.loads(line)
+            ids.append(row["id"])
+            payloads.append(row["payload"])
+    if vectors.shape != (manifest["count"], manifest["dimension"]) or len(ids) != manifest["count"]:
+        raise SnapshotError(f"Snapshot in {directory} does not match its manifest")
+    return Snapshot(manifest=manifest, ids=ids, vectors=vectors, payloads=payloads)
+
+
+def restore_snapshot(
+    store: QdrantStore,
+    snapshot: Snapshot,
+    embed_model: str,
+    *,
+    recreate: bool = False,
+    batch_size: int = 256,
+) -> int:
+    """Bulk-load a snapshot into the store's collection; returns the number of points written."""
+    # Vectors from another model would load fine and then never match a query embedding.
+    if snapshot.embed_model != embed_model:
+        raise SnapshotError(
+            f"Snapshot was embedded with '{snapshot.embed_model}' but the service uses '{embed_model}'"
+        )
+    dimension = snapshot.manifest["dimension"]
+    if recreate:
+        store.recreate_collection(dimension)
+    else:
+        store.ensure_collection(dimension)
+    store.upload_points(snapshot.ids, snapshot.vectors, snapshot.payloads, batch_size=batch_size)
+    return len(snapshot.ids)
+
+
+def main() -> int:
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s %(message)s")
+    parser = argparse.ArgumentParser(description="Export or restore the KB embeddings without re-embedding.")
+    parser.add_argument("command", choices=["export", "restore"])
+    parser.add_argument("directory")
+    parser.add_argument("--qdrant-url", default="http://localhost:6333")
+    parser.add_argument("--collection", default=os.getenv("QDRANT_COLLECTION") or "ai_powered_css_kb")
+    parser.add_argument("--embed-model", default=os.getenv("OPENAI_EMBED_MODEL") or "text-embedding-3-small")
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--recreate", action="store_true", help="Drop the collection before restoring")
+    args = parser.parse_args()
+
+    store = QdrantStore(url=args.qdrant_url, collection=args.collection)
+    directory = Path(args.directory)
+    start = time.perf_counter()
+    try:
+        if args.command == "export":
+            manifest = export_snapshot(store, directory, args.embed_model, batch_size=args.batch_size)
+            logger.info(
+                "Exported %s points (dim=%s, model=%s) to %s in %.1fs",
+                manifest["count"],
+                manifest["dimension"],
+                manifest["embed_model"],
+                directory,
+                time.perf_counter() - start,
+            )
+        else:
+            count = restore_snapshot(
+                store, load_snapshot(directory), args.embed_model, recreate=args.recreate, batch_size=args.batch_size
+            )
+            logger.info("Restored %s points into '%s' in %.1fs", count, args.collection, time.perf_counter() - start)
+    except SnapshotError as exc:
+        logger.error("%s", exc)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
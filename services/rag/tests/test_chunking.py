@@ -1,12 +1,74 @@
-from app.chunking import chunk_text, count_words
+import pytest
 
+from app import chunking
+from app.chunking import EstimatingTokenizer, chunk_text, count_words, get_tokenizer
 
-def test_chunking_sizes():
+TOKENIZER = EstimatingTokenizer()
+
+FAQ = """How long does a refund take?
+Refunds reach the original payment method within 5-7 working days. UPI refunds are usually faster.
+Can I cancel a booking?
+Yes, if the cinema allows cancellation. Open Your Orders and tap Cancel. The refund follows the policy above.
+Steps to reach us:
+Start a live chat from the Help section. Our team replies within a day."""
+
+HINDI_SENTENCE = "बुकिंग रद्द होने के बाद धनवापसी आपके मूल भुगतान माध्यम में पाँच से सात कार्य दिवसों के भीतर जमा हो जाएगी।"
+
+
+def test_chunks_stay_within_token_budget_with_overlap():
     text = "word " * 2200
-    chunks = chunk_text(text)
+    chunks = chunk_text(text, max_tokens=400, overlap_tokens=40, tokenizer=TOKENIZER)
     assert len(chunks) >= 2
+    assert all(TOKENIZER.count(chunk) <= 400 for chunk in chunks)
+    for previous, current in zip(chunks, chunks[1:]):
+        assert previous.split()[-40:] == current.split()[:40]
+    assert sum(count_words(chunk) for chunk in chunks) - 40 * (len(chunks) - 1) == 2200
+
+
+def test_short_and_empty_text():
+    assert chunk_text("  \n ", tokenizer=TOKENIZER) == []
+    assert chunk_text(FAQ, tokenizer=TOKENIZER) == [FAQ]
+
+
+def test_questions_stay_with_their_answers():
+    chunks = chunk_text(FAQ, max_tokens=45, overlap_tokens=0, tokenizer=TOKENIZER)
+    assert chunks[0].startswith("How long does a refund take?\nRefunds reach")
+    assert chunks[1].startswith("Can I cancel a booking?\nYes, if the cinema")
+    assert chunks[-1] == "Steps to reach us:\nStart a live chat from the Help section. Our team replies within a day."
+    assert not any(chunk.endswith("?") for chunk in chunks)
+
+
+def test_long_section_repeats_its_question_and_carries_overlap():
+    answer = " ".join(f"Step {i} of the refund process is described here." for i in range(12))
+    chunks = chunk_text(f"How do refunds work?\n{answer}", max_tokens=60, overlap_tokens=15, tokenizer=TOKENIZER)
+    assert len(chunks) > 2
+    assert all(chunk.startswith("How do refunds work?\n") for chunk in chunks)
+    assert all(chunk.endswith("described here.") for chunk in chunks)
+    # The last sentence of each part opens the next one.
+    for previous, current in zip(chunks, chunks[1:]):
+        assert previous.rsplit(". ", 1)[-1] in current
+
+
+def test_hindi_is_sized_by_tokens_and_split_on_danda():
+    text = " ".join([HINDI_SENTENCE] * 30)
+    assert TOKENIZER.count(HINDI_SENTENCE) > 3 * count_words(HINDI_SENTENCE)
+    chunks = chunk_text(text, max_tokens=400, overlap_tokens=0, tokenizer=TOKENIZER)
+    # A word budget of 800 would have kept all ~600 words in one chunk.
+    assert len(chunks) > 3
+    assert all(chunk.endswith("।") and TOKENIZER.count(chunk) <= 400 for chunk in chunks)
+
+
+def test_get_tokenizer_falls_back_to_estimate(monkeypatch):
+    def unavailable(model):
+        raise OSError("encoding download failed")
 
-    sizes = [count_words(c) for c in chunks]
-    for size in sizes[:-1]:
-        assert 500 <= size <= 1000
-    assert sizes[-1] <= 1000
+    get_tokenizer.cache_clear()
+    monkeypatch.setattr(chunking, "TiktokenTokenizer", unavailable)
+    try:
+        assert get_tokenizer("auto").name == "estimate"
+        with pytest.raises(OSError):
+            get_tokenizer("tiktoken")
+        with pytest.raises(ValueError):
+            get_tokenizer("words")
+    finally:
+        get_tokenizer.cache_clear()
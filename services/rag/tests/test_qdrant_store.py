@@ -37,3 +37,30 @@ def test_ensure_collection_creates():
     store.ensure_collection(vector_size=1536)
     assert fake.created is True
     assert fake.vector_size == 1536
+
+
+def test_reingest_with_fewer_chunks_drops_stale_points():
+    from qdrant_client import QdrantClient
+
+    from app.qdrant_store import build_point
+
+    store = QdrantStore(url="", collection="test", client=QdrantClient(":memory:"))
+    store.ensure_collection(vector_size=2)
+
+    def ingest(doc_id, count):
+        points = [
+            build_point(chunk_id=f"{doc_id}#{i}", vector=[1.0, float(i)], doc_id=doc_id, title="t", tags=[], lang="en", chunk_text="x")
+            for i in range(count)
+        ]
+        store.upsert_chunks(points)
+        store.delete_stale_chunks(doc_id, [point.id for point in points])
+
+    ingest("a", 3)
+    ingest("b", 2)
+    ingest("a", 1)
+    assert sorted(record.payload["chunk_id"] for record in store.scroll_points()) == ["a#0", "b#0", "b#1"]
+
+    ingest("b:hi", 2)
+    store.delete_documents(["b", "b:hi", "never-ingested"])
+    assert [record.payload["chunk_id"] for record in store.scroll_points()] == ["a#0"]
+    QdrantStore(url="", collection="missing", client=QdrantClient(":memory:")).delete_documents(["a"])
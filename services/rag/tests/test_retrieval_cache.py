@@ -0,0 +1,69 @@
+from app.retrieval_cache import SessionRetrievalCache, cosine_similarity
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+RESULTS = [{"id": "a", "score": 0.82, "payload": {"chunk_id": "doc#0"}}, {"id": "b", "score": 0.7, "payload": {}}]
+
+
+def make_cache(clock=None, **overrides):
+    options = {"ttl_seconds": 600, "min_similarity": 0.9, "max_sessions": 2}
+    options.update(overrides)
+    return SessionRetrievalCache(clock=clock or FakeClock(), **options)
+
+
+def test_cosine_similarity():
+    assert cosine_similarity([1.0, 0.0], [1.0, 0.0]) == 1.0
+    assert cosine_similarity([1.0, 0.0], [0.0, 1.0]) == 0.0
+    assert cosine_similarity([0.0, 0.0], [1.0, 0.0]) == 0.0
+
+
+def test_followup_close_embedding_reuses_results():
+    cache = make_cache()
+    cache.store("s1", [1.0, 0.0, 0.0], RESULTS, top_k=5)
+    assert cache.lookup("s1", [[0.98, 0.1, 0.0]], top_k=5) == RESULTS
+    assert cache.lookup("s1", [[0.0, 1.0, 0.0]], top_k=5) is None
+    assert cache.lookup("s2", [[1.0, 0.0, 0.0]], top_k=5) is None
+    assert cache.stats() == {"hits": 1, "misses": 2, "sessions": 1}
+
+
+def test_any_candidate_vector_can_match():
+    cache = make_cache()
+    cache.store("s1", [1.0, 0.0], RESULTS, top_k=5)
+    assert cache.lookup("s1", [[0.0, 1.0], [1.0, 0.05]], top_k=5) == RESULTS
+
+
+def test_larger_top_k_misses_and_smaller_is_trimmed():
+    cache = make_cache()
+    cache.store("s1", [1.0, 0.0], RESULTS, top_k=2)
+    assert cache.lookup("s1", [[1.0, 0.0]], top_k=3) is None
+    assert cache.lookup("s1", [[1.0, 0.0]], top_k=1) == RESULTS[:1]
+
+
+def test_entries_expire_and_evict():
+    clock = FakeClock()
+    cache = make_cache(clock=clock)
+    cache.store("s1", [1.0, 0.0], RESULTS, top_k=5)
+    clock.now = 601
+    assert cache.lookup("s1", [[1.0, 0.0]], top_k=5) is None
+
+    cache.store("s1", [1.0, 0.0], RESULTS, top_k=5)
+    cache.store("s2", [1.0, 0.0], RESULTS, top_k=5)
+    cache.store("s3", [1.0, 0.0], RESULTS, top_k=5)
+    assert cache.lookup("s1", [[1.0, 0.0]], top_k=5) is None
+    assert cache.lookup("s3", [[1.0, 0.0]], top_k=5) == RESULTS
+
+    cache.clear()
+    assert cache.lookup("s3", [[1.0, 0.0]], top_k=5) is None
+
+
+def test_disabled_cache_never_stores():
+    cache = make_cache(ttl_seconds=0)
+    cache.store("s1", [1.0, 0.0], RESULTS, top_k=5)
+    assert cache.lookup("s1", [[1.0, 0.0]], top_k=5) is None
@@ -0,0 +1,81 @@
+import json
+
+import numpy as np
+import pytest
+from qdrant_client import QdrantClient
+
+from app.qdrant_store import QdrantStore, build_point
+from app.snapshot import SnapshotError, export_snapshot, load_snapshot, restore_snapshot
+
+MODEL = "text-embedding-3-small"
+
+
+def make_store(collection="kb", points=0, dim=8):
+    store = QdrantStore(url="", collection=collection, client=QdrantClient(":memory:"))
+    if points:
+        rng = np.random.default_rng(7)
+        store.ensure_collection(vector_size=dim)
+        store.upsert_chunks(
+            [
+                build_point(
+                    chunk_id=f"doc-{i // 3}#{i % 3}",
+                    vector=rng.normal(size=dim).astype(np.float32).tolist(),
+                    doc_id=f"doc-{i // 3}",
+                    title=f"Refunds {i}",
+                    tags=["refund"],
+                    lang="hi" if i % 2 else "en",
+                    chunk_text=f"रिफंड chunk {i}",
+                )
+                for i in range(points)
+            ]
+        )
+    return store
+
+
+def test_export_restore_round_trip_without_reembedding(tmp_path):
+    source = make_store(points=300)
+    manifest = export_snapshot(source, tmp_path / "snap", MODEL, batch_size=64)
+    assert (manifest["count"], manifest["dimension"], manifest["embed_model"]) == (300, 8, MODEL)
+
+    snapshot = load_snapshot(tmp_path / "snap")
+    target = make_store(collection="kb_restored")
+    assert restore_snapshot(target, snapshot, MODEL, batch_size=64) == 300
+    # Restoring again over the same collection replaces, rather than duplicates, the points.
+    assert restore_snapshot(target, snapshot, MODEL, recreate=True) == 300
+
+    original = {str(r.id): r for r in source.scroll_points()}
+    restored = {str(r.id): r for r in target.scroll_points()}
+    assert restored.keys() == original.keys()
+    for point_id, record in original.items():
+        assert restored[point_id].payload == record.payload
+        assert np.allclose(restored[point_id].vector, record.vector)
+
+    # The snapshot doubles as a local index that ranks like the collection.
+    query = snapshot.vectors[42].tolist()
+    local = snapshot.search(query, top_k=5)
+    remote = target.search(query, top_k=5)
+    assert [hit["id"] for hit in local] == [hit["id"] for hit in remote]
+    assert local[0]["payload"]["chunk_id"] == snapshot.payloads[42]["chunk_id"]
+
+
+def test_restore_rejects_corrupt_files_and_other_models(tmp_path):
+    export_snapshot(make_store(points=10), tmp_path / "snap", MODEL)
+    snapshot = load_snapshot(tmp_path / "snap")
+    with pytest.raises(SnapshotError):
+        restore_snapshot(make_store(), snapshot, "text-embedding-3-large")
+
+    payloads = tmp_path / "snap" / "payloads.jsonl"
+    rows = payloads.read_text(encoding="utf-8").splitlines()
+    row = json.loads(rows[0])
+    row["payload"]["chunk_text"] = "tampered"
+    payloads.write_text("\n".join([json.dumps(row), *rows[1:]]) + "\n", encoding="utf-8")
+    with pytest.raises(SnapshotError, match="Checksum"):
+        load_snapshot(tmp_path / "snap")
+
+
+def test_empty_collection_is_not_exported(tmp_path):
+    store = make_store()
+    store.ensure_collection(vector_size=8)
+    with pytest.raises(SnapshotError):
+        export_snapshot(store, tmp_path / "snap", MODEL)
+    assert not (tmp_path / "snap" / "manifest.json").exists()